@@ -2,6 +2,7 @@ import bpy
 from .operators import *
 from .config.settings import VRoidSettings
 from .ui import VRoidBonesPanel
+from .utils import weights
 
 bl_info = {
     "name": "VRoid Bones",
@@ -14,10 +15,16 @@ bl_info = {
 }
 
 classes = [
-    #VRoidSettings,
+    VRoidSettings,
     VRoidCleanerOperator,
     VRoidFixChainsOperator,
     VRoidIKOperator,
+    VRoidFullSetupOperator,
+    VRoidPruneOperator,
+    VRoidDecimateOperator,
+    VRoidCleanerModalOperator,
+    VRoidFixChainsModalOperator,
+    VRoidBakeIKOperator,
     VRoidBonesPanel
 ]
 
@@ -25,8 +32,12 @@ classes = [
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
+    bpy.types.Scene.vroid_settings = bpy.props.PointerProperty(type=VRoidSettings)
+    weights.register_handlers()
 
 def unregister():
+    weights.unregister_handlers()
+    del bpy.types.Scene.vroid_settings
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
 
@@ -0,0 +1,100 @@
+'''Fan VRoid exports out over a pool of background Blender workers.
+
+    python batch/driver.py --blender /path/to/blender -j 8 \
+        --output-dir out --report report.json models/
+
+Directories are searched for .vrm and .glb files. Each worker process
+handles --chunk-size files, so Blender startup cost is shared between them.
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import perf_counter
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+EXTENSIONS = (".vrm", ".glb")
+
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.lower().endswith(EXTENSIONS)
+                )
+        else:
+            files.append(path)
+    return files
+
+
+def run_worker(files, args):
+    '''Process a chunk of files in one Blender, return their reports'''
+    with tempfile.TemporaryDirectory() as tmp:
+        report = os.path.join(tmp, "report.json")
+        cmd = [
+            args.blender, "--background", "--factory-startup",
+            "--python-exit-code", "1",
+            "--python", WORKER, "--",
+            "--output-dir", args.output_dir,
+            "--format", args.format,
+            "--report", report,
+        ]
+        if args.stages:
+            cmd += ["--stages", args.stages]
+        proc = subprocess.run(cmd + files, capture_output=True, text=True)
+        if os.path.exists(report):
+            with open(report) as f:
+                return json.load(f)
+    error = f"Blender exited with code {proc.returncode}"
+    return [{'file': path, 'error': error, 'log': proc.stderr[-4000:]} for path in files]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help=".vrm/.glb files or directories")
+    parser.add_argument("--blender", default="blender")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--format", choices=("blend", "glb"), default="blend")
+    parser.add_argument("--stages", help="comma separated stages to run, all by default")
+    parser.add_argument("--report", default="report.json")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.paths)
+    args.output_dir = os.path.abspath(args.output_dir)
+    chunks = [files[i:i + args.chunk_size] for i in range(0, len(files), args.chunk_size)]
+
+    start = perf_counter()
+    reports = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(run_worker, chunk, args) for chunk in chunks]
+        for future in as_completed(futures):
+            for report in future.result():
+                status = "FAILED" if 'error' in report else "ok"
+                print(f"[{status}] {report['file']}", flush=True)
+                reports.append(report)
+
+    reports.sort(key=lambda r: r['file'])
+    failed = sum('error' in r for r in reports)
+    with open(args.report, "w") as f:
+        json.dump({
+            'files': len(reports),
+            'failed': failed,
+            'jobs': args.jobs,
+            'wall_time': perf_counter() - start,
+            'reports': reports,
+        }, f, indent=2)
+    print(f"Processed {len(reports)} files, {failed} failed, report in {args.report}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
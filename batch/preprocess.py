@@ -0,0 +1,60 @@
+'''Strip junk joints and rename bones of VRoid exports without Blender.
+
+    python batch/preprocess.py --output-dir out models/
+
+Runs with plain Python and NumPy. The output files import faster since
+Blender never sees the removed joints, and the rename stage of the full
+setup becomes a no-op.
+'''
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+from driver import collect_files
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ADDON_DIR)
+
+from utils.glb import WEIGHT_THRESHOLD, preprocess_glb  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help=".vrm/.glb files or directories")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--threshold", type=float, default=WEIGHT_THRESHOLD)
+    parser.add_argument("--no-rename", action="store_true", help="keep original joint names")
+    parser.add_argument("--keep-junk", action="store_true", help="do not remove unweighted joints")
+    parser.add_argument("--report", default="preprocess.json")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    reports = []
+    for path in collect_files(args.paths):
+        target = os.path.join(args.output_dir, os.path.basename(path))
+        start = perf_counter()
+        try:
+            report = preprocess_glb(
+                path, target,
+                rename=not args.no_rename,
+                strip=not args.keep_junk,
+                threshold=args.threshold,
+            )
+        except (OSError, ValueError, KeyError) as e:
+            report = {'error': str(e)}
+        report.update({'file': path, 'output': target, 'time': perf_counter() - start})
+        status = "FAILED" if 'error' in report else "ok"
+        print(f"[{status}] {path}", flush=True)
+        reports.append(report)
+
+    failed = sum('error' in r for r in reports)
+    with open(args.report, "w") as f:
+        json.dump({'files': len(reports), 'failed': failed, 'reports': reports}, f, indent=2)
+    print(f"Preprocessed {len(reports)} files, {failed} failed, report in {args.report}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+'''Process VRoid exports inside a background Blender.
+
+    blender --background --factory-startup --python batch/worker.py -- \
+        --output-dir out --format glb --report report.json model.vrm ...
+
+Every file is imported, all its armatures get the full rig setup and the
+result is saved as .blend or exported as .glb. A JSON list with one report
+per file is written to --report.
+'''
+import argparse
+import importlib
+import json
+import os
+import sys
+import traceback
+from time import perf_counter
+
+import bpy
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ADDON_DIR))
+pipeline = importlib.import_module(f"{os.path.basename(ADDON_DIR)}.utils.pipeline")
+profiling = importlib.import_module(f"{os.path.basename(ADDON_DIR)}.utils.profiling")
+vrm = importlib.import_module(f"{os.path.basename(ADDON_DIR)}.utils.vrm")
+weights = importlib.import_module(f"{os.path.basename(ADDON_DIR)}.utils.weights")
+
+
+def parse_args(argv):
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    parser = argparse.ArgumentParser(prog="worker.py")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--format", choices=("blend", "glb"), default="blend")
+    parser.add_argument("--report", required=True)
+    parser.add_argument("--stages", default=",".join(pipeline.DEFAULT_STAGES))
+    parser.add_argument("files", nargs="+")
+    return parser.parse_args(argv)
+
+
+def import_model(path):
+    bpy.ops.wm.read_homefile(use_empty=True)
+    # The addon isn't registered here, so no load handler clears caches of
+    # the previous file, whose objects may share names with this one
+    weights.clear_cache()
+    bpy.ops.import_scene.gltf(filepath=path)
+    return [obj for obj in bpy.context.scene.objects if obj.type == 'ARMATURE']
+
+
+def setup_armature(armature, stages, name_table=None):
+    view_layer = bpy.context.view_layer
+    for obj in view_layer.objects.selected:
+        obj.select_set(False)
+    view_layer.objects.active = armature
+    armature.select_set(True)
+    with profiling.profile_run(armature, "batch") as profiler:
+        bpy.ops.object.mode_set(mode='EDIT')
+        result = pipeline.run_setup(stages, name_table)
+        bpy.ops.object.mode_set(mode='OBJECT')
+    return dict(result.as_dict(), counters=profiler.totals)
+
+
+def save_model(path, output_dir, fmt):
+    name = os.path.splitext(os.path.basename(path))[0]
+    output = os.path.join(output_dir, f"{name}.{fmt}")
+    if fmt == "glb":
+        bpy.ops.export_scene.gltf(filepath=output, export_format='GLB')
+    else:
+        bpy.ops.wm.save_as_mainfile(filepath=output)
+    return output
+
+
+def process_file(path, args):
+    report = {'file': path}
+    start = perf_counter()
+    try:
+        armatures = import_model(path)
+        report['import_time'] = perf_counter() - start
+        name_table = vrm.load_name_table(path)
+        report['humanoid_bones'] = len(name_table)
+        report['armatures'] = {}
+        for armature in armatures:
+            result = setup_armature(armature, args.stages.split(","), name_table)
+            report['armatures'][armature.name] = result
+        save_start = perf_counter()
+        report['output'] = save_model(path, args.output_dir, args.format)
+        report['save_time'] = perf_counter() - save_start
+    except Exception as e:
+        report['error'] = f"{type(e).__name__}: {e}"
+        report['traceback'] = traceback.format_exc()
+    report['total_time'] = perf_counter() - start
+    return report
+
+
+def main():
+    args = parse_args(sys.argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+    reports = [process_file(path, args) for path in args.files]
+    with open(args.report, "w") as f:
+        json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
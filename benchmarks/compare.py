@@ -0,0 +1,34 @@
+'''Compare two benchmark result files stage by stage.
+
+    python benchmarks/compare.py before.json after.json
+'''
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data, {r["bones"]: r["stages"] for r in data["results"]}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print(__doc__)
+        return 2
+    (old_data, old), (new_data, new) = load(argv[0]), load(argv[1])
+    print(f"{old_data['revision']} -> {new_data['revision']}")
+    print(f"{'bones':>6} {'stage':<28}{'before':>11}{'after':>11}{'speedup':>9}")
+    for bones in sorted(old.keys() & new.keys()):
+        for stage in old[bones]:
+            if stage not in new[bones]:
+                continue
+            before, after = old[bones][stage], new[bones][stage]
+            speedup = before / after if after else float("inf")
+            print(f"{bones:>6} {stage:<28}{before * 1000:>9.1f}ms{after * 1000:>9.1f}ms{speedup:>8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1802 @@
+'''In-memory stand-in for the part of bpy and mathutils the addon uses.
+
+    import fake_bpy
+    fake_bpy.install()
+    import bpy  # the stand-in from here on
+
+Covers armatures with edit, pose and object mode round trips, edit bones,
+pose bones with constraints, mesh objects with vertices and vertex groups,
+the object and armature operators the addon calls, registered operators
+and property groups. Behaviour follows Blender where the addon depends on
+it: edit bones only exist in edit mode and are written back to bones when
+leaving it, renaming an edit bone renames pose bones and vertex groups of
+deformed meshes, deleting bones reparents their children, foreach_set
+skips update callbacks and RNA floats are single precision.
+
+Nothing is drawn or evaluated, so algorithm tests and microbenchmarks run
+on plain Python with numpy, e.g. rigs.build_rig works unchanged.
+'''
+import inspect
+import itertools
+import math
+import sys
+import types
+
+import numpy as np
+
+# Blender's single precision RNA floats
+_float = lambda value: float(np.float32(value))  # noqa: E731
+
+
+def _unique_name(name, taken):
+    '''name, or name.001, name.002... like Blender does for clashing names'''
+    if name not in taken:
+        return name
+    base, dot, suffix = name.rpartition(".")
+    if not (dot and suffix.isdigit() and len(suffix) == 3):
+        base = name
+    for i in range(1, 1000):
+        candidate = f"{base}.{i:03d}"
+        if candidate not in taken:
+            return candidate
+    raise ValueError(f"No unique name left for {name}")
+
+
+def _bone_axes(vector, roll):
+    '''(3, 3) rest matrix of a bone pointing along vector, columns are its X, Y
+    and Z axes, Blender's vec_roll_to_mat3
+    '''
+    x, y, z = np.asarray(vector, dtype=np.float64) / np.linalg.norm(vector)
+    theta = 1.0 + y
+    theta_alt = x * x + z * z
+    if theta > 6.1e-3 or theta_alt > 2.5e-4 ** 2:
+        if theta <= 6.1e-3:
+            # Close to -Y, Taylor series of theta keeps precision
+            theta = theta_alt * 0.5 + theta_alt * theta_alt * 0.125
+        xz = -x * z / theta
+        base = np.array([[1 - x * x / theta, x, xz], [-x, y, -z], [xz, z, 1 - z * z / theta]])
+    else:
+        base = np.diag([-1.0, -1.0, 1.0])
+    # Rotation by roll about the bone's Y axis, Rodrigues' formula
+    axis = np.array([x, y, z])
+    cross = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+    rotation = np.identity(3) + math.sin(roll) * cross + (1 - math.cos(roll)) * cross @ cross
+    return rotation @ base if axis.any() else base
+
+
+class Vector:
+    '''Float vector, vectors of bones are live views like in Blender'''
+
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        self._values = [float(v) for v in values]
+
+    def _write(self, values):
+        self._values[:] = [float(v) for v in values]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self._values[key])
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        values = list(self._values)
+        values[key] = value
+        self._write(values)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._values, dtype=dtype)
+
+    def _axis(i):
+        return property(lambda self: self._values[i], lambda self, value: self.__setitem__(i, value))
+
+    x, y, z, w = _axis(0), _axis(1), _axis(2), _axis(3)
+    del _axis
+
+    def _zip(self, other, op):
+        if isinstance(other, (int, float)):
+            return Vector(op(a, other) for a in self._values)
+        if len(other) != len(self):
+            raise ValueError("Vector size mismatch")
+        return Vector(op(a, b) for a, b in zip(self._values, other))
+
+    def __add__(self, other):
+        return self._zip(other, lambda a, b: a + b)
+
+    def __sub__(self, other):
+        return self._zip(other, lambda a, b: a - b)
+
+    def __mul__(self, other):
+        return self._zip(other, lambda a, b: a * b)
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    def __rsub__(self, other):
+        return self._zip(other, lambda a, b: b - a)
+
+    def __truediv__(self, other):
+        return self._zip(other, lambda a, b: a / b)
+
+    def __neg__(self):
+        return Vector(-a for a in self._values)
+
+    def __iadd__(self, other):
+        self._write(self + other)
+        return self
+
+    def __isub__(self, other):
+        self._write(self - other)
+        return self
+
+    def __imul__(self, other):
+        self._write(self * other)
+        return self
+
+    def __matmul__(self, other):
+        return self.dot(other)
+
+    def __eq__(self, other):
+        try:
+            return len(other) == len(self) and all(a == b for a, b in zip(self._values, other))
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Vector(({', '.join(f'{v:.4f}' for v in self._values)}))"
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self._values, other))
+
+    def cross(self, other):
+        ax, ay, az = self._values
+        bx, by, bz = other
+        return Vector((ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx))
+
+    @property
+    def length(self):
+        return math.sqrt(self.dot(self))
+
+    @property
+    def length_squared(self):
+        return self.dot(self)
+
+    def normalized(self):
+        length = self.length
+        return Vector(a / length for a in self._values) if length else Vector(self._values)
+
+    def normalize(self):
+        self._write(self.normalized())
+
+    def copy(self):
+        return Vector(self._values)
+
+    def to_tuple(self, precision=-1):
+        if precision < 0:
+            return tuple(self._values)
+        return tuple(round(v, precision) for v in self._values)
+
+    def to_3d(self):
+        return Vector((self._values + [0.0, 0.0, 0.0])[:3])
+
+    def to_4d(self):
+        return Vector((self._values + [0.0, 0.0, 0.0])[:3] + [1.0])
+
+
+class _BoundVector(Vector):
+    '''Vector stored in single precision on a bone or vertex, changes mark owner as edited'''
+
+    def __init__(self, values, owner=None):
+        self._owner = owner
+        super().__init__(_float(v) for v in values)
+
+    def _write(self, values):
+        self._values[:] = [_float(v) for v in values]
+        if self._owner is not None:
+            self._owner._changed()
+
+
+class Matrix:
+    '''Square float matrix backed by numpy'''
+
+    def __init__(self, rows=None):
+        self._m = np.identity(4) if rows is None else np.array([list(row) for row in rows], dtype=np.float64)
+
+    @classmethod
+    def Identity(cls, size):
+        return cls(np.identity(size))
+
+    @classmethod
+    def Translation(cls, vector):
+        m = np.identity(4)
+        m[:3, 3] = list(vector)[:3]
+        return cls(m)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._m, dtype=dtype)
+
+    def __len__(self):
+        return len(self._m)
+
+    def __getitem__(self, i):
+        return Vector(self._m[i])
+
+    def __iter__(self):
+        return (Vector(row) for row in self._m)
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix(self._m @ other._m)
+        values = np.array(list(other), dtype=np.float64)
+        if len(values) == 3 and len(self._m) == 4:
+            return Vector((self._m @ np.r_[values, 1.0])[:3])
+        return Vector(self._m @ values)
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix) and np.array_equal(self._m, other._m)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Matrix({self._m.tolist()})"
+
+    def inverted(self):
+        return Matrix(np.linalg.inv(self._m))
+
+    def copy(self):
+        return Matrix(self._m)
+
+    def to_3x3(self):
+        return Matrix(self._m[:3, :3])
+
+    @property
+    def translation(self):
+        return Vector(self._m[:3, 3])
+
+    @translation.setter
+    def translation(self, value):
+        self._m[:3, 3] = list(value)[:3]
+
+
+class KDTree:
+    '''mathutils.kdtree.KDTree answering queries by brute force over all points'''
+
+    def __init__(self, size):
+        self._size = size
+        self._points = []
+        self._indices = []
+        self._co = None
+
+    def insert(self, co, index):
+        if len(self._points) >= self._size:
+            raise ValueError("KDTree: too many points inserted")
+        self._points.append(tuple(co)[:3])
+        self._indices.append(index)
+        self._co = None
+
+    def balance(self):
+        self._co = np.array(self._points, dtype=np.float32).reshape(-1, 3).astype(np.float64)
+        self._index_array = np.array(self._indices, dtype=np.int64)
+
+    def _distances(self, co):
+        if self._co is None:
+            raise RuntimeError("KDTree must be balanced before use")
+        return np.linalg.norm(self._co - np.asarray(tuple(co)[:3], dtype=np.float64), axis=1)
+
+    def _results(self, distances, order):
+        return [(Vector(self._co[i]), int(self._index_array[i]), float(distances[i])) for i in order]
+
+    def find(self, co):
+        result = self.find_n(co, 1)
+        return result[0] if result else (None, None, None)
+
+    def find_n(self, co, n):
+        distances = self._distances(co)
+        n = min(n, len(distances))
+        if n <= 0:
+            return []
+        nearest = np.argpartition(distances, n - 1)[:n]
+        return self._results(distances, nearest[np.argsort(distances[nearest], kind="stable")])
+
+    def find_range(self, co, radius):
+        distances = self._distances(co)
+        inside = np.flatnonzero(distances <= radius)
+        return self._results(distances, inside[np.argsort(distances[inside], kind="stable")])
+
+
+class bpy_prop_collection:
+    '''Ordered collection looked up by index or name, like RNA collections'''
+
+    def __init__(self, items=None):
+        self._items = [] if items is None else items
+
+    def _list(self):
+        return self._items
+
+    def __len__(self):
+        return len(self._list())
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return iter(list(self._list()))
+
+    def __getitem__(self, key):
+        items = self._list()
+        if isinstance(key, str):
+            for item in items:
+                if item.name == key:
+                    return item
+            raise KeyError(f'bpy_prop_collection[key]: key "{key}" not found')
+        if isinstance(key, slice):
+            return items[key]
+        return items[key]
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return any(item.name == key for item in self._list())
+        return key in self._list()
+
+    def get(self, key, default=None):
+        for item in self._list():
+            if item.name == key:
+                return item
+        return default
+
+    def find(self, key):
+        for i, item in enumerate(self._list()):
+            if item.name == key:
+                return i
+        return -1
+
+    def keys(self):
+        return [item.name for item in self._list()]
+
+    def values(self):
+        return list(self._list())
+
+    def items(self):
+        return [(item.name, item) for item in self._list()]
+
+    def foreach_get(self, attr, seq):
+        items = self._list()
+        values = []
+        for item in items:
+            value = getattr(item, attr)
+            if isinstance(value, (Vector, Matrix)):
+                values.extend(np.asarray(value).ravel())
+            else:
+                values.append(value)
+        if len(seq) != len(values):
+            raise RuntimeError(f"internal error setting the array, size mismatch for {attr}")
+        seq[:] = values
+
+    def foreach_set(self, attr, seq):
+        '''Write raw values, like Blender it skips update callbacks of the property'''
+        items = self._list()
+        if not items:
+            return
+        values = np.asarray(seq).ravel()
+        if len(values) % len(items):
+            raise RuntimeError(f"internal error setting the array, size mismatch for {attr}")
+        size = len(values) // len(items)
+        for item, chunk in zip(items, values.reshape(len(items), size)):
+            raw = getattr(item, "_raw_set", None)
+            if raw is not None and raw(attr, chunk):
+                continue
+            current = getattr(item, attr)
+            if isinstance(current, Vector):
+                current._write(chunk)
+            elif isinstance(current, bool):
+                setattr(item, attr, bool(chunk[0]))
+            elif isinstance(current, int):
+                setattr(item, attr, int(chunk[0]))
+            else:
+                setattr(item, attr, float(chunk[0]))
+
+
+class _NamedCollection(bpy_prop_collection):
+    '''Collection with a name lookup table, for ones holding thousands of items'''
+
+    def __init__(self, items=None):
+        super().__init__(items)
+        self._names = {item.name: item for item in self._items}
+
+    def _set_items(self, items):
+        self._items = items
+        self._names = {item.name: item for item in items}
+
+    def _append(self, item):
+        self._items.append(item)
+        self._names[item.name] = item
+
+    def _discard(self, item):
+        self._items.remove(item)
+        del self._names[item.name]
+
+    def _renamed(self, item, old):
+        del self._names[old]
+        self._names[item.name] = item
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return self._names[key]
+            except KeyError:
+                raise KeyError(f'bpy_prop_collection[key]: key "{key}" not found') from None
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return key in self._names
+        return key in self._items
+
+    def get(self, key, default=None):
+        return self._names.get(key, default)
+
+
+class _IDProperties:
+    '''Custom properties, obj["key"]'''
+
+    def _id_props(self):
+        return self.__dict__.setdefault("_custom", dict())
+
+    def __getitem__(self, key):
+        return self._id_props()[key]
+
+    def __setitem__(self, key, value):
+        self._id_props()[key] = value
+
+    def __delitem__(self, key):
+        del self._id_props()[key]
+
+    def __contains__(self, key):
+        return key in self._id_props()
+
+    def get(self, key, default=None):
+        return self._id_props().get(key, default)
+
+    def keys(self):
+        return self._id_props().keys()
+
+
+class ID(_IDProperties):
+    _session_uids = itertools.count(1)
+
+    def __init__(self, name, registry=None):
+        self._registry = registry
+        self._name = name
+        # Unique in the session, loaded files get new ones like in Blender
+        self.session_uid = next(ID._session_uids)
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if value == self._name:
+            return
+        if self._registry is not None:
+            value = _unique_name(value, {item.name for item in self._registry if item is not self})
+        self._name = value
+        _tag(self)
+
+    @property
+    def original(self):
+        return self
+
+    @property
+    def is_evaluated(self):
+        return False
+
+    def __repr__(self):
+        return f"bpy.data.{type(self).__name__.lower()}s[{self._name!r}]"
+
+
+class _DataCollection(bpy_prop_collection):
+    '''bpy.data.objects, bpy.data.meshes...'''
+
+    def __init__(self, factory):
+        super().__init__()
+        self._factory = factory
+
+    def new(self, name, *args, **kwargs):
+        item = self._factory(_unique_name(name, set(self.keys())), self, *args, **kwargs)
+        self._items.append(item)
+        return item
+
+    def remove(self, item, do_unlink=True):
+        self._items.remove(item)
+        if isinstance(item, Object):
+            for collection in data.collections._items + [s.collection for s in data.scenes._items]:
+                if item in collection.objects._items:
+                    collection.objects._items.remove(item)
+
+
+class Bone(_IDProperties):
+    '''Bone of armature data, written when edit mode ends'''
+
+    def __init__(self, armature, edit_bone):
+        self._armature = armature
+        self.name = edit_bone.name
+        self.parent = None
+        self.head_local = Vector(edit_bone.head)
+        self.tail_local = Vector(edit_bone.tail)
+        self.head_radius = edit_bone.head_radius
+        self.tail_radius = edit_bone.tail_radius
+        self.use_connect = edit_bone.use_connect
+        self.use_deform = edit_bone.use_deform
+        self.select = edit_bone.select
+        self.hide = edit_bone.hide
+        self._roll = edit_bone.roll
+
+    @property
+    def children(self):
+        return [b for b in self._armature.bones if b.parent is self]
+
+    @property
+    def length(self):
+        return (self.tail_local - self.head_local).length
+
+    @property
+    def vector(self):
+        return self.tail_local - self.head_local
+
+    def __repr__(self):
+        return f"bpy.data.armatures[{self._armature.name!r}].bones[{self.name!r}]"
+
+
+class EditBone(_IDProperties):
+    def __init__(self, armature, name):
+        self._armature = armature
+        self._name = name
+        self._parent = None
+        self._head = _BoundVector((0.0, 0.0, 0.0), self)
+        self._tail = _BoundVector((0.0, 0.0, 0.0), self)
+        self._use_connect = False
+        self._roll = 0.0
+        self.head_radius = 0.1
+        self.tail_radius = 0.05
+        self.use_deform = True
+        self.select = False
+        self.select_head = False
+        self.select_tail = True
+        self.hide = False
+
+    def _changed(self):
+        _tag(self._armature)
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if value == self._name:
+            return
+        edit_bones = self._armature.edit_bones
+        old, self._name = self._name, _unique_name(value, edit_bones._names)
+        edit_bones._renamed(self, old)
+        self._armature._rename_bone(old, self._name)
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, value):
+        ancestor = value
+        while ancestor is not None:
+            if ancestor is self:
+                return
+            ancestor = ancestor._parent
+        self._parent = value
+        if value is None:
+            self._use_connect = False
+        self._changed()
+
+    @property
+    def children(self):
+        # A scan of all edit bones, like Blender does
+        return [b for b in self._armature.edit_bones if b._parent is self]
+
+    @property
+    def children_recursive(self):
+        found = []
+        for child in self.children:
+            found.append(child)
+            found.extend(child.children_recursive)
+        return found
+
+    @property
+    def head(self):
+        return self._head
+
+    @head.setter
+    def head(self, value):
+        self._head._write(value)
+
+    @property
+    def tail(self):
+        return self._tail
+
+    @tail.setter
+    def tail(self, value):
+        self._tail._write(value)
+
+    @property
+    def roll(self):
+        return self._roll
+
+    @roll.setter
+    def roll(self, value):
+        self._roll = _float(value)
+
+    @property
+    def use_connect(self):
+        return self._use_connect
+
+    @use_connect.setter
+    def use_connect(self, value):
+        # Connecting snaps head to parent's tail, an update callback foreach_set skips
+        self._use_connect = bool(value) and self._parent is not None
+        if self._use_connect:
+            self._head._write(self._parent.tail)
+        self._changed()
+
+    def _raw_set(self, attr, values):
+        if attr == "use_connect":
+            self._use_connect = bool(values[0]) and self._parent is not None
+            self._changed()
+            return True
+        if attr == "roll":
+            self._roll = _float(values[0])
+            return True
+        return False
+
+    @property
+    def length(self):
+        return (self._tail - self._head).length
+
+    @length.setter
+    def length(self, value):
+        direction = (self._tail - self._head).normalized()
+        self.tail = self._head + direction * value
+
+    @property
+    def vector(self):
+        return self._tail - self._head
+
+    @property
+    def x_axis(self):
+        return Vector(_bone_axes(self.vector, self._roll)[:, 0])
+
+    @property
+    def y_axis(self):
+        return Vector(_bone_axes(self.vector, self._roll)[:, 1])
+
+    @property
+    def z_axis(self):
+        return Vector(_bone_axes(self.vector, self._roll)[:, 2])
+
+    def align_roll(self, vector):
+        '''Roll the bone so its Z axis faces vector as far as its direction allows'''
+        axes = _bone_axes(self.vector, 0.0)
+        y_axis, z_axis = axes[:, 1], axes[:, 2]
+        vector = np.asarray(vector, dtype=np.float64)
+        # Blender expects a unit vector, and rolls to 0 when it lines up with the bone
+        if abs(np.dot(vector, y_axis)) >= 1.0 - 1.2e-7:
+            self.roll = 0.0
+            return
+        projected = vector - y_axis * np.dot(vector, y_axis)
+        self.roll = math.atan2(np.dot(np.cross(z_axis, projected), y_axis), np.dot(z_axis, projected))
+
+    def __repr__(self):
+        return f"bpy.data.armatures[{self._armature.name!r}].edit_bones[{self._name!r}]"
+
+
+class ArmatureEditBones(_NamedCollection):
+    '''Edit bones of an armature, empty outside of edit mode'''
+
+    def __init__(self, armature):
+        super().__init__()
+        self._armature = armature
+        self.active = None
+
+    def new(self, name):
+        if not self._armature.is_editmode:
+            raise RuntimeError("Error: Cannot add bones outside of edit mode")
+        bone = EditBone(self._armature, _unique_name(name, self._names))
+        self._append(bone)
+        _tag(self._armature)
+        return bone
+
+    def remove(self, bone):
+        '''Children go to the parent of the removed bone and lose their connection'''
+        for child in bone.children:
+            child._parent = bone._parent
+            child._use_connect = False
+        self._discard(bone)
+        if self.active is bone:
+            self.active = None
+        _tag(self._armature)
+
+
+class Armature(ID):
+    def __init__(self, name, registry=None):
+        super().__init__(name, registry)
+        self.bones = _NamedCollection()
+        self.edit_bones = ArmatureEditBones(self)
+        self.is_editmode = False
+        self.display_type = 'OCTAHEDRAL'
+
+    def _users(self):
+        return [obj for obj in data.objects if obj.data is self]
+
+    def _begin_edit(self):
+        if self.is_editmode:
+            return
+        self.is_editmode = True
+        by_bone = dict()
+        for bone in self.bones:
+            edit_bone = EditBone(self, bone.name)
+            edit_bone._head = _BoundVector(bone.head_local, edit_bone)
+            edit_bone._tail = _BoundVector(bone.tail_local, edit_bone)
+            edit_bone._use_connect = bone.use_connect
+            edit_bone._roll = bone._roll
+            for attr in ("head_radius", "tail_radius", "use_deform", "select", "hide"):
+                setattr(edit_bone, attr, getattr(bone, attr))
+            by_bone[bone] = edit_bone
+        for bone, edit_bone in by_bone.items():
+            edit_bone._parent = by_bone.get(bone.parent)
+        self.edit_bones._set_items(list(by_bone.values()))
+
+    def _end_edit(self):
+        '''Write edit bones to bones, pose bones follow by name.
+
+        Like Blender, bones of zero length are deleted.
+        '''
+        if not self.is_editmode:
+            return
+        for edit_bone in [b for b in self.edit_bones._items if b.length < 1e-6]:
+            self.edit_bones.remove(edit_bone)
+        by_edit = dict()
+        bones = []
+        for edit_bone in self.edit_bones._items:
+            bone = Bone(self, edit_bone)
+            by_edit[edit_bone] = bone
+            bones.append(bone)
+        for edit_bone, bone in by_edit.items():
+            bone.parent = by_edit.get(edit_bone._parent)
+        self.bones = _NamedCollection(bones)
+        self.edit_bones._set_items([])
+        self.edit_bones.active = None
+        self.is_editmode = False
+        for obj in self._users():
+            obj.pose._rebuild()
+
+    def _rename_bone(self, old, new):
+        '''Like ED_armature_bone_rename, pose bones, vertex groups and constraint targets follow'''
+        users = self._users()
+        for obj in users:
+            channel = obj.pose._channels.pop(old, None)
+            if channel is not None:
+                channel._name = new
+                obj.pose._channels[new] = channel
+        for obj in data.objects:
+            if obj.type == 'MESH' and obj._deformed_by(self):
+                group = obj.vertex_groups.get(old)
+                if group is not None:
+                    group.name = new
+            if obj.pose is None:
+                continue
+            for channel in obj.pose._order:
+                for constraint in channel.constraints._items:
+                    target = getattr(constraint, "target", None)
+                    if target in users and getattr(constraint, "subtarget", None) == old:
+                        constraint.subtarget = new
+        _tag(self)
+
+
+_CONSTRAINT_DEFAULTS = {
+    "IK": dict(
+        target=None, subtarget="", pole_target=None, pole_subtarget="", pole_angle=0.0,
+        chain_count=0, iterations=500, use_tail=True, use_stretch=True,
+        use_location=True, use_rotation=False, weight=1.0, orient_weight=0.25,
+    ),
+    "COPY_ROTATION": dict(
+        target=None, subtarget="", mix_mode='REPLACE', euler_order='AUTO',
+        use_x=True, use_y=True, use_z=True, invert_x=False, invert_y=False, invert_z=False,
+    ),
+    "LIMIT_ROTATION": dict(
+        use_limit_x=False, use_limit_y=False, use_limit_z=False,
+        min_x=0.0, max_x=0.0, min_y=0.0, max_y=0.0, min_z=0.0, max_z=0.0,
+        euler_order='AUTO', use_transform_limit=False, use_legacy_behavior=False,
+    ),
+    "COPY_LOCATION": dict(
+        target=None, subtarget="", use_x=True, use_y=True, use_z=True, use_offset=False,
+    ),
+    "DAMPED_TRACK": dict(target=None, subtarget="", track_axis='TRACK_Y', head_tail=0.0),
+}
+_CONSTRAINT_NAMES = {
+    "IK": "IK", "COPY_ROTATION": "Copy Rotation", "LIMIT_ROTATION": "Limit Rotation",
+    "COPY_LOCATION": "Copy Location", "DAMPED_TRACK": "Damped Track",
+}
+
+
+class Constraint:
+    '''Pose bone constraint, unknown properties raise like RNA does'''
+
+    def __init__(self, constraint_type, name):
+        if constraint_type not in _CONSTRAINT_DEFAULTS:
+            raise TypeError(f'ConstraintsOfPoseBone.new(): enum "{constraint_type}" not found')
+        values = dict(
+            name=name, type=constraint_type, mute=False, enabled=True, influence=1.0,
+            owner_space='WORLD', target_space='WORLD', show_expanded=True,
+        )
+        values.update(_CONSTRAINT_DEFAULTS[constraint_type])
+        object.__setattr__(self, "_values", values)
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
+
+    def __setattr__(self, name, value):
+        values = self._values
+        if name not in values:
+            raise AttributeError(f'bpy_struct: attribute "{name}" from "{values["type"]}" not found')
+        if name == "type":
+            raise AttributeError(f'bpy_struct: attribute "type" from "{values["type"]}" is read-only')
+        if isinstance(values[name], float):
+            value = _float(value)
+        elif isinstance(values[name], bool):
+            value = bool(value)
+        values[name] = value
+
+    def __repr__(self):
+        return f"Constraint({self._values['type']!r}, {self._values['name']!r})"
+
+
+class PoseBoneConstraints(bpy_prop_collection):
+    def __init__(self, pose_bone):
+        super().__init__()
+        self._pose_bone = pose_bone
+        self.active = None
+
+    def new(self, type):
+        name = _unique_name(_CONSTRAINT_NAMES.get(type, type.title()), set(self.keys()))
+        constraint = Constraint(type, name)
+        self._items.append(constraint)
+        self.active = constraint
+        _tag(self._pose_bone._object)
+        return constraint
+
+    def remove(self, constraint):
+        self._items.remove(constraint)
+        if self.active is constraint:
+            self.active = None
+        _tag(self._pose_bone._object)
+
+    def clear(self):
+        self._items.clear()
+        self.active = None
+
+
+_IK_LIMIT = math.pi
+
+
+class PoseBone(_IDProperties):
+    def __init__(self, obj, name):
+        self._object = obj
+        self._name = name
+        self.constraints = PoseBoneConstraints(self)
+        self.rotation_mode = 'QUATERNION'
+        self.location = Vector((0.0, 0.0, 0.0))
+        self.rotation_quaternion = Vector((1.0, 0.0, 0.0, 0.0))
+        self.rotation_euler = Vector((0.0, 0.0, 0.0))
+        self.scale = Vector((1.0, 1.0, 1.0))
+        self.ik_stretch = 0.0
+        for axis in "xyz":
+            self.__dict__[f"lock_ik_{axis}"] = False
+            self.__dict__[f"use_ik_limit_{axis}"] = False
+            self.__dict__[f"ik_stiffness_{axis}"] = 0.0
+            self.__dict__[f"ik_min_{axis}"] = _float(-_IK_LIMIT)
+            self.__dict__[f"ik_max_{axis}"] = _float(_IK_LIMIT)
+
+    def __setattr__(self, name, value):
+        # IK limits are clamped to a half turn on their side of zero
+        if name.startswith("ik_min_"):
+            value = _float(min(0.0, max(-_IK_LIMIT, value)))
+        elif name.startswith("ik_max_"):
+            value = _float(max(0.0, min(_IK_LIMIT, value)))
+        elif name.startswith(("ik_stiffness_", "ik_stretch")):
+            value = _float(min(1.0, max(0.0, value)))
+        super().__setattr__(name, value)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def bone(self):
+        return self._object.data.bones.get(self._name)
+
+    @property
+    def parent(self):
+        bone = self.bone
+        if bone is None or bone.parent is None:
+            return None
+        return self._object.pose._channels.get(bone.parent.name)
+
+    @property
+    def children(self):
+        channels = self._object.pose._channels
+        return [channels[child.name] for child in self.bone.children if child.name in channels]
+
+    def __repr__(self):
+        return f"bpy.data.objects[{self._object.name!r}].pose.bones[{self._name!r}]"
+
+
+class Pose:
+    '''Pose bones of an armature object, rebuilt by name from bones when edit mode ends'''
+
+    def __init__(self, obj):
+        self._object = obj
+        # Pose bones by name and in bone order
+        self._channels = dict()
+        self._order = []
+        self.bones = _PoseBones(self)
+
+    def _rebuild(self):
+        channels = dict()
+        for bone in self._object.data.bones:
+            channels[bone.name] = self._channels.get(bone.name) or PoseBone(self._object, bone.name)
+        self._channels = channels
+        self._order = list(channels.values())
+
+
+class _PoseBones(bpy_prop_collection):
+    def __init__(self, pose):
+        super().__init__()
+        self._pose = pose
+
+    def _list(self):
+        return self._pose._order
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return self._pose._channels[key]
+            except KeyError:
+                raise KeyError(f'bpy_prop_collection[key]: key "{key}" not found') from None
+        return self._pose._order[key]
+
+    def __contains__(self, key):
+        return key in self._pose._channels if isinstance(key, str) else key in self._pose._order
+
+    def get(self, key, default=None):
+        return self._pose._channels.get(key, default)
+
+
+class VertexGroupElement:
+    __slots__ = ("_group", "_weight", "_mesh")
+
+    def __init__(self, group, weight, mesh):
+        self._group = group
+        self._weight = _float(weight)
+        self._mesh = mesh
+
+    @property
+    def group(self):
+        return self._group._index
+
+    @property
+    def weight(self):
+        return self._weight
+
+    @weight.setter
+    def weight(self, value):
+        self._weight = _float(min(1.0, max(0.0, value)))
+        _tag(self._mesh)
+
+
+class MeshVertex:
+    __slots__ = ("index", "_co", "_mesh", "groups", "select", "normal")
+
+    def __init__(self, index, mesh):
+        self.index = index
+        self._mesh = mesh
+        self._co = _BoundVector((0.0, 0.0, 0.0), self)
+        self.groups = []
+        self.select = False
+        self.normal = Vector((0.0, 0.0, 1.0))
+
+    def _changed(self):
+        _tag(self._mesh)
+
+    @property
+    def co(self):
+        return self._co
+
+    @co.setter
+    def co(self, value):
+        self._co._write(value)
+
+
+class MeshVertices(bpy_prop_collection):
+    def __init__(self, mesh):
+        super().__init__()
+        self._mesh = mesh
+
+    def add(self, count):
+        start = len(self._items)
+        self._items.extend(MeshVertex(start + i, self._mesh) for i in range(count))
+        _tag(self._mesh)
+
+    def foreach_get(self, attr, seq):
+        if attr == "co":
+            values = np.array([v.co._values for v in self._items], dtype=np.float64).ravel()
+            if len(seq) != len(values):
+                raise RuntimeError("internal error setting the array, size mismatch for co")
+            seq[:] = values
+            return
+        super().foreach_get(attr, seq)
+
+    def foreach_set(self, attr, seq):
+        if attr == "co":
+            values = np.asarray(seq, dtype=np.float32).reshape(-1, 3).tolist()
+            for vertex, co in zip(self._items, values):
+                vertex.co._values[:] = co
+            _tag(self._mesh)
+            return
+        super().foreach_set(attr, seq)
+
+
+class Mesh(ID):
+    def __init__(self, name, registry=None):
+        super().__init__(name, registry)
+        self.vertices = MeshVertices(self)
+        self.edges = bpy_prop_collection()
+        self.polygons = bpy_prop_collection()
+
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices.add(len(vertices))
+        self.vertices.foreach_set("co", np.asarray(vertices, dtype=np.float32).ravel())
+        self.edges = bpy_prop_collection(list(edges))
+        self.polygons = bpy_prop_collection(list(faces))
+
+    def update(self, calc_edges=False):
+        _tag(self)
+
+
+class VertexGroup:
+    def __init__(self, obj, name, index):
+        self._object = obj
+        self._name = name
+        self._index = index
+        # Indices of vertices with an element of this group
+        self._members = set()
+        self.lock_weight = False
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if value == self._name:
+            return
+        groups = self._object.vertex_groups
+        old, self._name = self._name, _unique_name(value, groups._names)
+        groups._renamed(self, old)
+        _tag(self._object)
+
+    @property
+    def index(self):
+        return self._index
+
+    def _vertices(self):
+        return self._object.data.vertices._items
+
+    def add(self, index, weight, type):
+        if type not in {'REPLACE', 'ADD', 'SUBTRACT'}:
+            raise TypeError(f'VertexGroup.add(): enum "{type}" not found')
+        mesh = self._object.data
+        vertices = self._vertices()
+        for i in index:
+            elements = vertices[i].groups
+            element = next((e for e in elements if e._group is self), None) if i in self._members else None
+            if element is None:
+                if type == 'SUBTRACT':
+                    continue
+                elements.append(VertexGroupElement(self, min(1.0, max(0.0, weight)), mesh))
+                self._members.add(i)
+            elif type == 'REPLACE':
+                element._weight = _float(min(1.0, max(0.0, weight)))
+            elif type == 'ADD':
+                element._weight = _float(min(1.0, element._weight + weight))
+            else:
+                element._weight = _float(max(0.0, element._weight - weight))
+        _tag(mesh)
+
+    def remove(self, index):
+        vertices = self._vertices()
+        for i in index:
+            if i in self._members:
+                elements = vertices[i].groups
+                elements[:] = [e for e in elements if e._group is not self]
+                self._members.discard(i)
+        _tag(self._object.data)
+
+    def weight(self, index):
+        for element in self._vertices()[index].groups:
+            if element._group is self:
+                return element.weight
+        raise RuntimeError("Error: Vertex not in group")
+
+    def __repr__(self):
+        return f"bpy.data.objects[{self._object.name!r}].vertex_groups[{self._name!r}]"
+
+
+class VertexGroups(_NamedCollection):
+    def __init__(self, obj):
+        super().__init__()
+        self._object = obj
+        self.active_index = -1
+
+    def new(self, name="Group"):
+        group = VertexGroup(self._object, _unique_name(name, self._names), len(self._items))
+        self._append(group)
+        self.active_index = len(self._items) - 1
+        _tag(self._object)
+        return group
+
+    def remove(self, group):
+        '''Like BKE_object_defgroup_remove, weights of later groups shift down one index'''
+        if group._members:
+            group.remove(list(group._members))
+        self._discard(group)
+        for i, later in enumerate(self._items[group._index:], group._index):
+            later._index = i
+        self.active_index = min(self.active_index, len(self._items) - 1)
+        _tag(self._object)
+        _tag(self._object.data)
+
+    def clear(self):
+        for group in reversed(self._items):
+            self.remove(group)
+
+
+class Modifier:
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+        self.object = None
+        self.show_viewport = True
+        self.use_vertex_groups = True
+        self.use_bone_envelopes = False
+
+
+class ObjectModifiers(bpy_prop_collection):
+    def __init__(self, obj):
+        super().__init__()
+        self._object = obj
+
+    def new(self, name, type):
+        modifier = Modifier(_unique_name(name, set(self.keys())), type)
+        self._items.append(modifier)
+        _tag(self._object)
+        return modifier
+
+    def remove(self, modifier):
+        self._items.remove(modifier)
+        _tag(self._object)
+
+
+class Object(ID):
+    def __init__(self, name, registry=None, object_data=None):
+        super().__init__(name, registry)
+        self.data = object_data
+        self._parent = None
+        self.parent_type = 'OBJECT'
+        self.parent_bone = ""
+        self.modifiers = ObjectModifiers(self)
+        self.vertex_groups = VertexGroups(self)
+        self._location = _BoundVector((0.0, 0.0, 0.0), self)
+        self.matrix_parent_inverse = Matrix()
+        self._matrix_world = Matrix()
+        self.mode = 'OBJECT'
+        self.hide_viewport = False
+        self._select = False
+        self.pose = Pose(self) if isinstance(object_data, Armature) else None
+        if self.pose is not None:
+            self.pose._rebuild()
+
+    def _changed(self):
+        _tag(self)
+
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location._write(value)
+
+    @property
+    def matrix_world(self):
+        '''Only translations are supported, evaluated on view layer update like in Blender'''
+        return self._matrix_world
+
+    @matrix_world.setter
+    def matrix_world(self, value):
+        self._matrix_world = Matrix(value)
+        parent = self._parent._matrix_world @ self.matrix_parent_inverse if self._parent else Matrix()
+        self.location = (parent.inverted() @ self._matrix_world).translation
+
+    def _evaluate(self):
+        local = Matrix.Translation(self._location)
+        if self._parent is None:
+            self._matrix_world = local
+        else:
+            self._matrix_world = self._parent._evaluate() @ self.matrix_parent_inverse @ local
+        return self._matrix_world
+
+    @property
+    def type(self):
+        if isinstance(self.data, Armature):
+            return 'ARMATURE'
+        if isinstance(self.data, Mesh):
+            return 'MESH'
+        return 'EMPTY'
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, value):
+        self._parent = value
+        _tag(self)
+
+    @property
+    def children(self):
+        return tuple(obj for obj in data.objects if obj._parent is self)
+
+    @property
+    def users_collection(self):
+        return tuple(c for c in data.collections._items + [s.collection for s in data.scenes._items]
+                     if self in c.objects._items)
+
+    def select_set(self, state, view_layer=None):
+        self._select = bool(state)
+
+    def select_get(self, view_layer=None):
+        return self._select
+
+    def _deformed_by(self, armature):
+        if self._parent is not None and self._parent.data is armature:
+            return True
+        return any(m.type == 'ARMATURE' and m.object is not None and m.object.data is armature
+                   for m in self.modifiers)
+
+
+class CollectionObjects(bpy_prop_collection):
+    def __init__(self, collection):
+        super().__init__()
+        self._collection = collection
+
+    def link(self, obj):
+        if obj in self._items:
+            raise RuntimeError(f"Object '{obj.name}' already in collection '{self._collection.name}'")
+        self._items.append(obj)
+        _tag(self._collection)
+
+    def unlink(self, obj):
+        self._items.remove(obj)
+        _tag(self._collection)
+
+
+class CollectionChildren(bpy_prop_collection):
+    def link(self, collection):
+        self._items.append(collection)
+
+    def unlink(self, collection):
+        self._items.remove(collection)
+
+
+class Collection(ID):
+    def __init__(self, name, registry=None):
+        super().__init__(name, registry)
+        self.objects = CollectionObjects(self)
+        self.children = CollectionChildren()
+
+    @property
+    def all_objects(self):
+        found = list(self.objects)
+        for child in self.children:
+            found.extend(obj for obj in child.all_objects if obj not in found)
+        return bpy_prop_collection(found)
+
+
+class LayerObjects(bpy_prop_collection):
+    def __init__(self, scene):
+        super().__init__()
+        self._scene = scene
+        self._active = None
+
+    def _list(self):
+        return list(self._scene.objects)
+
+    @property
+    def active(self):
+        return self._active if self._active in self._list() else None
+
+    @active.setter
+    def active(self, obj):
+        self._active = obj
+
+    @property
+    def selected(self):
+        return bpy_prop_collection([obj for obj in self._list() if obj._select])
+
+
+class Depsgraph:
+    def __init__(self, scene, updates):
+        self.scene = scene
+        self.updates = updates
+
+
+class DepsgraphUpdate:
+    def __init__(self, id):
+        self.id = id
+        self.is_updated_geometry = isinstance(id, Mesh)
+        self.is_updated_transform = isinstance(id, Object)
+
+
+class ViewLayer:
+    def __init__(self, scene):
+        self.name = "ViewLayer"
+        self.objects = LayerObjects(scene)
+        self._scene = scene
+
+    def update(self):
+        '''Evaluate object matrices and call depsgraph_update_post handlers with
+        every ID changed since the last update'''
+        for obj in data.objects:
+            obj._evaluate()
+        if not _tagged:
+            return
+        updates = [DepsgraphUpdate(id) for id in _tagged.values()]
+        _tagged.clear()
+        depsgraph = Depsgraph(self._scene, updates)
+        for handler in list(app.handlers.depsgraph_update_post):
+            handler(self._scene, depsgraph)
+
+    @property
+    def depsgraph(self):
+        return Depsgraph(self._scene, [])
+
+
+class Scene(ID):
+    def __init__(self, name, registry=None):
+        super().__init__(name, registry)
+        self.collection = Collection("Scene Collection")
+        self.view_layers = bpy_prop_collection([ViewLayer(self)])
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_current = 1
+        self.render = types.SimpleNamespace(fps=24)
+
+    @property
+    def objects(self):
+        return self.collection.all_objects
+
+    def frame_set(self, frame, subframe=0.0):
+        self.frame_current = int(frame)
+
+
+# IDs changed since the last view layer update, by id()
+_tagged = dict()
+
+
+def _tag(block):
+    if isinstance(block, ID):
+        _tagged[id(block)] = block
+
+
+class BlendData:
+    def __init__(self):
+        self.objects = _DataCollection(Object)
+        self.meshes = _DataCollection(Mesh)
+        self.armatures = _DataCollection(Armature)
+        self.collections = _DataCollection(Collection)
+        self.scenes = _DataCollection(Scene)
+        self.filepath = ""
+        self.scenes.new("Scene")
+
+
+data = BlendData()
+
+
+class WindowManager:
+    '''Progress and timers do nothing, modal operators run through execute'''
+
+    def progress_begin(self, low, high):
+        pass
+
+    def progress_update(self, value):
+        pass
+
+    def progress_end(self):
+        pass
+
+
+_CONTEXT_MODES = {'OBJECT': 'OBJECT', 'POSE': 'POSE', 'EDIT': 'EDIT_{type}'}
+
+
+class Context:
+    window_manager = WindowManager()
+    window = None
+    area = None
+    region = None
+    preferences = None
+
+    @property
+    def scene(self):
+        return data.scenes[0]
+
+    @property
+    def view_layer(self):
+        return self.scene.view_layers[0]
+
+    @property
+    def active_object(self):
+        return self.view_layer.objects.active
+
+    object = active_object
+
+    @property
+    def selected_objects(self):
+        return list(self.view_layer.objects.selected)
+
+    @property
+    def mode(self):
+        obj = self.active_object
+        if obj is None:
+            return 'OBJECT'
+        return _CONTEXT_MODES[obj.mode].format(type=obj.type)
+
+    @property
+    def objects_in_mode(self):
+        obj = self.active_object
+        if obj is None or obj.mode == 'OBJECT':
+            return []
+        return [o for o in self.scene.objects if o.mode == obj.mode and o.type == obj.type]
+
+    @property
+    def edit_object(self):
+        obj = self.active_object
+        return obj if obj is not None and obj.mode == 'EDIT' else None
+
+
+context = Context()
+
+
+def _set_mode(obj, mode):
+    if obj.mode == mode:
+        return
+    if obj.mode == 'EDIT' and isinstance(obj.data, Armature):
+        obj.data._end_edit()
+    obj.mode = mode
+    if mode == 'EDIT' and isinstance(obj.data, Armature):
+        obj.data._begin_edit()
+
+
+def _mode_objects(active):
+    '''Active object and selected objects of its type, they share multi-object modes'''
+    found = [active]
+    found.extend(obj for obj in context.selected_objects if obj.type == active.type and obj is not active)
+    return found
+
+
+def _require_active():
+    obj = context.active_object
+    if obj is None:
+        raise RuntimeError("Operator bpy.ops.object.mode_set.poll() failed, context is incorrect")
+    return obj
+
+
+def _object_mode_set(mode='OBJECT', toggle=False):
+    active = _require_active()
+    if toggle and active.mode == mode:
+        mode = 'OBJECT'
+    if mode == active.mode:
+        return {'FINISHED'}
+    for obj in list(context.scene.objects):
+        if obj.mode != 'OBJECT' and obj.mode != mode:
+            _set_mode(obj, 'OBJECT')
+    if mode != 'OBJECT':
+        for obj in _mode_objects(active):
+            _set_mode(obj, mode)
+    return {'FINISHED'}
+
+
+def _object_editmode_toggle():
+    active = _require_active()
+    return _object_mode_set('OBJECT' if active.mode == 'EDIT' else 'EDIT')
+
+
+def _object_posemode_toggle():
+    active = _require_active()
+    if active.type != 'ARMATURE':
+        raise RuntimeError("Operator bpy.ops.object.posemode_toggle.poll() failed, context is incorrect")
+    return _object_mode_set('OBJECT' if active.mode == 'POSE' else 'POSE')
+
+
+def _object_select_all(action='TOGGLE'):
+    objects = list(context.scene.objects)
+    if action == 'TOGGLE':
+        action = 'DESELECT' if any(obj._select for obj in objects) else 'SELECT'
+    for obj in objects:
+        obj._select = action == 'SELECT' if action != 'INVERT' else not obj._select
+    return {'FINISHED'}
+
+
+def _edit_armatures(name):
+    armatures = [obj.data for obj in context.objects_in_mode if obj.type == 'ARMATURE' and obj.mode == 'EDIT']
+    if not armatures:
+        raise RuntimeError(f"Operator bpy.ops.armature.{name}.poll() failed, context is incorrect")
+    return armatures
+
+
+def _armature_select_all(action='TOGGLE'):
+    armatures = _edit_armatures("select_all")
+    bones = [b for armature in armatures for b in armature.edit_bones]
+    if action == 'TOGGLE':
+        action = 'DESELECT' if any(b.select for b in bones) else 'SELECT'
+    for bone in bones:
+        state = not bone.select if action == 'INVERT' else action == 'SELECT'
+        bone.select = bone.select_head = bone.select_tail = state
+    return {'FINISHED'}
+
+
+def _armature_delete(confirm=True):
+    '''Blender rebuilds the pose from bones as they were when edit mode started,
+    so pose bones renamed since then come back empty under their old names
+    '''
+    for armature in _edit_armatures("delete"):
+        for bone in [b for b in armature.edit_bones if b.select]:
+            armature.edit_bones.remove(bone)
+        for obj in armature._users():
+            obj.pose._rebuild()
+    return {'FINISHED'}
+
+
+def _read_homefile(use_empty=False, **kwargs):
+    reset()
+    for handler in list(app.handlers.load_post):
+        handler(None)
+    return {'FINISHED'}
+
+
+_OPERATORS = {
+    "object.mode_set": _object_mode_set,
+    "object.editmode_toggle": _object_editmode_toggle,
+    "object.posemode_toggle": _object_posemode_toggle,
+    "object.select_all": _object_select_all,
+    "armature.select_all": _armature_select_all,
+    "armature.delete": _armature_delete,
+    "wm.read_homefile": _read_homefile,
+    "wm.read_factory_settings": _read_homefile,
+}
+_registered = dict()
+
+
+def _call_registered(cls, **kwargs):
+    if hasattr(cls, "poll") and not cls.poll(context):
+        raise RuntimeError(f"Operator bpy.ops.{cls.bl_idname}.poll() failed, context is incorrect")
+    operator = cls()
+    for name, value in kwargs.items():
+        setattr(operator, name, value)
+    return operator.execute(context)
+
+
+class _OpsModule:
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        idname = f"{self._module}.{name}"
+        if idname in _registered:
+            return lambda *args, **kwargs: _call_registered(_registered[idname], **kwargs)
+        if idname in _OPERATORS:
+            return lambda *args, **kwargs: _OPERATORS[idname](**kwargs)
+        raise AttributeError(f"Calling operator \"bpy.ops.{idname}\" error, could not be found")
+
+
+class _Ops(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _OpsModule(name)
+
+
+class _Property:
+    '''Annotation made by bpy.props, a descriptor once its class is registered'''
+
+    def __init__(self, kind, default=None, **options):
+        self.kind = kind
+        self.options = options
+        if kind == 'ENUM' and default is None:
+            items = options.get("items")
+            default = items[0][0] if items and not callable(items) else ""
+        self.default = default
+
+    def _value(self, instance):
+        store = instance.__dict__.setdefault("_rna", dict())
+        if self not in store:
+            store[self] = self.options["type"]() if self.kind == 'POINTER' else self.default
+        return store
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return self._value(instance)[self]
+
+    def __set__(self, instance, value):
+        if self.kind == 'INT':
+            value = int(value)
+        elif self.kind == 'FLOAT':
+            value = _float(value)
+        elif self.kind == 'BOOLEAN':
+            value = bool(value)
+        if "min" in self.options:
+            value = max(self.options["min"], value)
+        if "max" in self.options:
+            value = min(self.options["max"], value)
+        self._value(instance)[self] = value
+
+
+def _prop_factory(kind, default):
+    def make(**options):
+        options.setdefault("default", default)
+        return _Property(kind, **options)
+    return make
+
+
+class bpy_struct(_IDProperties):
+    pass
+
+
+class Operator(bpy_struct):
+    bl_options = set()
+
+    def report(self, type, message):
+        level = next(iter(type), 'INFO').title()
+        self.__dict__.setdefault("reports", []).append((level.upper(), message))
+        print(f"{level}: {message}")
+
+
+class PropertyGroup(bpy_struct):
+    pass
+
+
+class Panel(bpy_struct):
+    pass
+
+
+def register_class(cls):
+    for klass in reversed(cls.__mro__):
+        for name, annotation in inspect.get_annotations(klass).items():
+            if isinstance(annotation, _Property):
+                setattr(cls, name, annotation)
+    idname = getattr(cls, "bl_idname", None)
+    if idname and issubclass(cls, Operator):
+        _registered[idname] = cls
+
+
+def unregister_class(cls):
+    _registered.pop(getattr(cls, "bl_idname", None), None)
+
+
+def persistent(func):
+    func._bpy_persistent = True
+    return func
+
+
+app = types.ModuleType("bpy.app")
+app.version = (4, 2, 0)
+app.version_string = "4.2.0 (fake_bpy)"
+app.background = True
+app.handlers = types.ModuleType("bpy.app.handlers")
+app.handlers.persistent = persistent
+for _name in ("depsgraph_update_pre", "depsgraph_update_post", "undo_pre", "undo_post",
+              "redo_pre", "redo_post", "load_pre", "load_post", "save_pre", "save_post",
+              "frame_change_pre", "frame_change_post"):
+    setattr(app.handlers, _name, [])
+
+
+def reset():
+    '''Empty file with one scene, like File > New with an empty startup'''
+    global data
+    data = BlendData()
+    _tagged.clear()
+    if "bpy" in sys.modules and getattr(sys.modules["bpy"], "_fake", False):
+        sys.modules["bpy"].data = data
+
+
+class _TypesModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        # Types the addon doesn't touch are plain structs
+        cls = type(name, (bpy_struct,), {})
+        setattr(self, name, cls)
+        return cls
+
+
+def _abspath(path, start=None, library=None):
+    return path[2:] if path.startswith("//") else path
+
+
+def install():
+    '''Put the stand-in in sys.modules as bpy and mathutils, returns the bpy module'''
+    bpy = types.ModuleType("bpy")
+    bpy._fake = True
+    bpy.data = data
+    bpy.context = context
+    bpy.app = app
+
+    bpy.types = _TypesModule("bpy.types")
+    for cls in (ID, Object, Mesh, Armature, Collection, Scene, ViewLayer, Bone, EditBone,
+                PoseBone, Pose, Constraint, VertexGroup, MeshVertex, Modifier, Context,
+                Operator, PropertyGroup, Panel, bpy_struct, bpy_prop_collection):
+        setattr(bpy.types, cls.__name__, cls)
+
+    bpy.props = types.ModuleType("bpy.props")
+    for name, kind, default in (
+        ("BoolProperty", 'BOOLEAN', False), ("IntProperty", 'INT', 0),
+        ("FloatProperty", 'FLOAT', 0.0), ("StringProperty", 'STRING', ""),
+        ("EnumProperty", 'ENUM', None), ("PointerProperty", 'POINTER', None),
+        ("CollectionProperty", 'COLLECTION', None), ("FloatVectorProperty", 'FLOAT_VECTOR', (0.0, 0.0, 0.0)),
+    ):
+        setattr(bpy.props, name, _prop_factory(kind, default))
+
+    bpy.utils = types.ModuleType("bpy.utils")
+    bpy.utils.register_class = register_class
+    bpy.utils.unregister_class = unregister_class
+    bpy.path = types.ModuleType("bpy.path")
+    bpy.path.abspath = _abspath
+    bpy.ops = _Ops("bpy.ops")
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector = Vector
+    mathutils.Matrix = Matrix
+    mathutils.kdtree = types.ModuleType("mathutils.kdtree")
+    mathutils.kdtree.KDTree = KDTree
+
+    sys.modules.update({
+        "bpy": bpy,
+        "bpy.types": bpy.types,
+        "bpy.props": bpy.props,
+        "bpy.utils": bpy.utils,
+        "bpy.path": bpy.path,
+        "bpy.ops": bpy.ops,
+        "bpy.app": app,
+        "bpy.app.handlers": app.handlers,
+        "mathutils": mathutils,
+        "mathutils.kdtree": mathutils.kdtree,
+    })
+    return bpy
@@ -0,0 +1,94 @@
+'''Pose evaluation time of a synthetic rig before and after chain decimation.
+
+    blender --background --factory-startup --python benchmarks/pose.py -- \
+        --bones 1000 --chain-length 8 --step 2 --output pose.json
+
+The rig is renamed and fixed first, like a rig ready for animation. Every
+evaluation rotates the root bone and updates the view layer, which
+re-evaluates the pose and the skinned meshes.
+'''
+import argparse
+import importlib
+import json
+import os
+import sys
+from time import perf_counter
+
+import bpy
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.dirname(ADDON_DIR))
+sys.path.insert(0, BENCH_DIR)
+ADDON = os.path.basename(ADDON_DIR)
+bones_utils = importlib.import_module(f"{ADDON}.utils.bones")
+
+import rigs  # noqa: E402
+
+
+def parse_args(argv):
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    parser = argparse.ArgumentParser(prog="pose.py")
+    parser.add_argument("--bones", type=int, default=1000)
+    parser.add_argument("--chain-length", type=int, default=8)
+    parser.add_argument("--vertices", type=int, default=20000)
+    parser.add_argument("--step", type=int, default=2)
+    parser.add_argument("--length", type=int, default=0, help="bones per chain, overrides --step")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="pose_results.json")
+    return parser.parse_args(argv)
+
+
+def pose_time(armature, frames):
+    '''Seconds per pose evaluation, best of three runs'''
+    bpy.ops.object.mode_set(mode='POSE')
+    root = armature.pose.bones[0]
+    root.rotation_mode = 'XYZ'
+    view_layer = bpy.context.view_layer
+    best = None
+    for _ in range(3):
+        start = perf_counter()
+        for frame in range(frames):
+            root.rotation_euler[2] = frame * 0.01
+            view_layer.update()
+        elapsed = (perf_counter() - start) / frames
+        best = elapsed if best is None else min(best, elapsed)
+    bpy.ops.object.mode_set(mode='EDIT')
+    return best
+
+
+def main():
+    args = parse_args(sys.argv)
+    spec = rigs.make_rig_spec(args.bones, args.chain_length, junk_ratio=0.0, seed=args.seed)
+    bpy.ops.wm.read_homefile(use_empty=True)
+    armature = rigs.build_rig(spec, args.vertices, seed=args.seed)
+    bpy.ops.object.mode_set(mode='EDIT')
+    bones_utils.simplify_symmetrize_names()
+    bones_utils.fix_bones_chains()
+
+    bones_before = len(armature.data.edit_bones)
+    before = pose_time(armature, args.frames)
+    start = perf_counter()
+    plan = bones_utils.decimate_chains(args.step, args.length)
+    decimate_time = perf_counter() - start
+    bones_after = len(armature.data.edit_bones)
+    after = pose_time(armature, args.frames)
+
+    print(plan.summary())
+    print(f"{bones_before} -> {bones_after} bones, decimation took {decimate_time * 1000:.1f}ms")
+    print(f"pose evaluation {before * 1000:.2f}ms -> {after * 1000:.2f}ms per frame")
+    with open(args.output, "w") as f:
+        json.dump({
+            "blender": bpy.app.version_string,
+            "vertices": args.vertices,
+            "bones_before": bones_before,
+            "bones_after": bones_after,
+            "decimate_time": decimate_time,
+            "pose_time_before": before,
+            "pose_time_after": after,
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+'''Synthetic VRoid style rigs for benchmarks.
+
+make_rig_spec builds a plain description of the rig (names, parents,
+heads, tails and which bones carry weights) without touching bpy, and
+build_rig turns it into an armature with skinned child meshes. Both work
+in Blender and on the stand-in of fake_bpy.py.
+'''
+import random
+
+FINGERS = ["Thumb", "Index", "Middle", "Ring", "Little"]
+
+# name, parent, side, is sided
+SECONDARY = [
+    ("Hair", "J_Bip_C_Head", False),
+    ("Skirt", "J_Bip_C_Hips", True),
+    ("SkirtBack", "J_Bip_C_Hips", True),
+    ("HairBack", "J_Bip_C_Head", False),
+    ("Sleeve", "J_Bip_{side}_UpperArm", True),
+    ("Tops", "J_Bip_C_UpperChest", True),
+]
+
+
+class RigSpec:
+    '''Bones of a synthetic rig in creation order'''
+
+    def __init__(self):
+        self.names = []
+        self.parents = []
+        self.heads = []
+        self.tails = []
+        self.weighted = []
+
+    def add(self, name, parent, head, tail=None, weighted=True):
+        if tail is None:
+            tail = (head[0], head[1] + 0.05, head[2])
+        self.names.append(name)
+        self.parents.append(parent)
+        self.heads.append(tuple(head))
+        self.tails.append(tuple(tail))
+        self.weighted.append(weighted)
+        return name
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _add_body(spec):
+    spec.add("Root", None, (0, 0, 0), weighted=False)
+    spine = ["Hips", "Spine", "Chest", "UpperChest", "Neck", "Head"]
+    heights = [1.0, 1.1, 1.2, 1.3, 1.45, 1.55]
+    parent = "Root"
+    for name, z in zip(spine, heights):
+        parent = spec.add(f"J_Bip_C_{name}", parent, (0, 0, z))
+    for side, sx in (("L", 1), ("R", -1)):
+        spec.add(f"J_Adj_{side}_FaceEye", "J_Bip_C_Head", (sx * 0.03, -0.08, 1.62), weighted=False)
+        parent = "J_Bip_C_UpperChest"
+        for name, x in (("Shoulder", 0.05), ("UpperArm", 0.15), ("LowerArm", 0.4), ("Hand", 0.65)):
+            parent = spec.add(f"J_Bip_{side}_{name}", parent, (sx * x, 0, 1.4))
+        for i, finger in enumerate(FINGERS):
+            parent = f"J_Bip_{side}_Hand"
+            for k in (1, 2, 3):
+                head = (sx * (0.7 + 0.03 * k), -0.04 + 0.02 * i, 1.4)
+                parent = spec.add(f"J_Bip_{side}_{finger}{k}", parent, head)
+        parent = "J_Bip_C_Hips"
+        for name, head in (("UpperLeg", (0.1, 0, 0.95)), ("LowerLeg", (0.1, 0, 0.5)),
+                           ("Foot", (0.1, 0, 0.1)), ("ToeBase", (0.1, -0.1, 0.02))):
+            parent = spec.add(f"J_Bip_{side}_{name}", parent, (sx * head[0], head[1], head[2]))
+        parent = "J_Bip_C_UpperChest"
+        for k in (1, 2):
+            parent = spec.add(f"J_Sec_{side}_Bust{k}", parent, (sx * 0.08, -0.1 - 0.05 * k, 1.3))
+
+
+def _add_chain(spec, rnd, name, parent, side, strand, length, junk_ratio):
+    side_part = f"{side}_" if side else ""
+    sx = {"L": 1, "R": -1, None: 0}[side]
+    x = sx * 0.05 + rnd.uniform(-0.15, 0.15)
+    y = rnd.uniform(-0.15, 0.15)
+    z = spec.heads[spec.names.index(parent)][2] if parent in spec.names else 1.0
+    junk_tail = rnd.random() < junk_ratio
+    for k in range(1, length + 1):
+        weighted = not (junk_tail and k == length)
+        head = (x, y, z - 0.06 * k)
+        parent = spec.add(f"J_Sec_{side_part}{name}{k}_{strand:02d}", parent, head, weighted=weighted)
+    spec.add(f"J_Sec_{side_part}{name}_end_{strand:02d}", parent, (x, y, z - 0.06 * (length + 1)), weighted=False)
+
+
+def make_rig_spec(bones=500, chain_length=5, junk_ratio=0.2, seed=0) -> RigSpec:
+    '''Describe a VRoid style rig with roughly the given number of bones'''
+    rnd = random.Random(seed)
+    spec = RigSpec()
+    _add_body(spec)
+    strands = dict()
+    category = 0
+    while len(spec) + chain_length + 1 <= bones:
+        name, parent, sided = SECONDARY[category % len(SECONDARY)]
+        sides = ("L", "R") if sided else (None,)
+        for side in sides:
+            key = (name, side)
+            strands[key] = strands.get(key, 0) + 1
+            # two digit ids, start a new chain name once they run out
+            variant = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"[(strands[key] - 1) // 99 - 1] if strands[key] > 99 else ""
+            strand = (strands[key] - 1) % 99 + 1
+            chain_parent = parent.format(side=side)
+            _add_chain(spec, rnd, name + variant, chain_parent, side, strand, chain_length, junk_ratio)
+        category += 1
+    return spec
+
+
+def build_rig(spec, vertices=20000, meshes=1, influences=4, seed=0):
+    '''Create an armature from spec with skinned child meshes, returns armature object'''
+    import bpy
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    armature_data = bpy.data.armatures.new("Armature")
+    armature = bpy.data.objects.new("Armature", armature_data)
+    bpy.context.scene.collection.objects.link(armature)
+    view_layer = bpy.context.view_layer
+    for obj in view_layer.objects.selected:
+        obj.select_set(False)
+    view_layer.objects.active = armature
+    armature.select_set(True)
+
+    bpy.ops.object.mode_set(mode='EDIT')
+    edit_bones = armature_data.edit_bones
+    for name, parent, head, tail in zip(spec.names, spec.parents, spec.heads, spec.tails):
+        bone = edit_bones.new(name)
+        bone.head = head
+        bone.tail = tail
+        if parent is not None:
+            bone.parent = edit_bones[parent]
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    weighted = [name for name, w in zip(spec.names, spec.weighted) if w]
+    per_mesh = max(3, vertices // meshes)
+    for m in range(meshes):
+        mesh = bpy.data.meshes.new(f"Mesh{m}")
+        mesh.vertices.add(per_mesh)
+        co = rng.random((per_mesh, 3)) * (1.0, 1.0, 1.7) - (0.5, 0.5, 0.0)
+        mesh.vertices.foreach_set("co", co.ravel())
+        mesh.update()
+        obj = bpy.data.objects.new(mesh.name, mesh)
+        bpy.context.scene.collection.objects.link(obj)
+        obj.parent = armature
+        modifier = obj.modifiers.new("Armature", 'ARMATURE')
+        modifier.object = armature
+        for name in spec.names:
+            obj.vertex_groups.new(name=name)
+
+        bones = rng.integers(0, len(weighted), size=(per_mesh, influences))
+        levels = rng.integers(1, 9, size=(per_mesh, influences))
+        vertex_ids = np.repeat(np.arange(per_mesh), influences)
+        keys = bones.ravel() * 10 + levels.ravel()
+        order = np.argsort(keys, kind="stable")
+        keys, vertex_ids = keys[order], vertex_ids[order]
+        splits = np.flatnonzero(np.diff(keys)) + 1
+        for key, ids in zip(keys[np.r_[0, splits]], np.split(vertex_ids, splits)):
+            group = obj.vertex_groups[weighted[key // 10]]
+            group.add(ids.tolist(), (key % 10) / 8, 'REPLACE')
+    return armature
+
+
+def make_rig(bones=500, vertices=20000, chain_length=5, junk_ratio=0.2, meshes=1, influences=4, seed=0):
+    '''Build a VRoid style rig of roughly the given size, returns armature object'''
+    spec = make_rig_spec(bones, chain_length, junk_ratio, seed)
+    return build_rig(spec, vertices, meshes, influences, seed)
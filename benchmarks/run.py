@@ -0,0 +1,134 @@
+'''Time every setup stage on synthetic rigs of growing size.
+
+    blender --background --factory-startup --python benchmarks/run.py -- \
+        --bones 100,250,500,1000,2000 --vertices 50000 --output results.json
+
+Stages run in pipeline order on a fresh rig for every repetition, the
+best time of all repetitions is kept. Compare two result files with
+benchmarks/compare.py.
+
+Outside of Blender the stages run on the in-memory stand-in of
+fake_bpy.py, which takes seconds and no Blender install. Timings of the
+algorithms are comparable between revisions, bpy calls cost nothing:
+
+    python benchmarks/run.py --bones 100,500,2000 --output results.json
+'''
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+from time import perf_counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.dirname(ADDON_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+try:
+    import bpy
+except ImportError:
+    import fake_bpy
+    bpy = fake_bpy.install()
+ADDON = os.path.basename(ADDON_DIR)
+bones_utils = importlib.import_module(f"{ADDON}.utils.bones")
+constraints = importlib.import_module(f"{ADDON}.utils.constraints")
+
+import rigs  # noqa: E402
+
+
+def _setup_ik():
+    return constraints.setup_ik(apply_edits=False)
+
+
+def _rotation_limits():
+    return constraints.add_rotation_limits(apply_edits=False)
+
+
+STAGES = [
+    ("simplify_symmetrize_names", bones_utils.simplify_symmetrize_names),
+    ("fix_bones_chains", bones_utils.fix_bones_chains),
+    ("clear_leaf_bones", bones_utils.clear_leaf_bones),
+    ("cleaner", bones_utils.remove_junk_bones),
+    ("apply_edit_bones", constraints.apply_edit_bones),
+    ("setup_ik", _setup_ik),
+    ("rotation_limits", _rotation_limits),
+]
+
+
+def parse_args(argv):
+    if "--" in argv:
+        argv = argv[argv.index("--") + 1:]
+    else:
+        argv = argv[1:] if getattr(bpy, "_fake", False) else []
+    parser = argparse.ArgumentParser(prog="run.py")
+    parser.add_argument("--bones", default="100,250,500,1000,2000")
+    parser.add_argument("--vertices", type=int, default=20000)
+    parser.add_argument("--meshes", type=int, default=1)
+    parser.add_argument("--influences", type=int, default=4)
+    parser.add_argument("--chain-length", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    return parser.parse_args(argv)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "-C", ADDON_DIR, "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_once(spec, args):
+    bpy.ops.wm.read_homefile(use_empty=True)
+    rigs.build_rig(spec, args.vertices, args.meshes, args.influences, args.seed)
+    bpy.ops.object.mode_set(mode='EDIT')
+    timings = dict()
+    for name, stage in STAGES:
+        start = perf_counter()
+        stage()
+        timings[name] = perf_counter() - start
+    bones_left = len(bpy.context.object.data.edit_bones)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return timings, bones_left
+
+
+def main():
+    args = parse_args(sys.argv)
+    results = []
+    for bones in (int(b) for b in args.bones.split(",")):
+        spec = rigs.make_rig_spec(bones, args.chain_length, seed=args.seed)
+        best = dict()
+        for _ in range(args.repeat):
+            timings, bones_left = run_once(spec, args)
+            for name, seconds in timings.items():
+                best[name] = min(best.get(name, seconds), seconds)
+        best["total"] = sum(best.values())
+        results.append({
+            "bones": len(spec),
+            "bones_left": bones_left,
+            "vertices": args.vertices,
+            "meshes": args.meshes,
+            "influences": args.influences,
+            "stages": best,
+        })
+        print(f"{len(spec):>6} bones: " + ", ".join(f"{k} {v * 1000:.1f}ms" for k, v in best.items()))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "revision": git_revision(),
+            "blender": bpy.app.version_string,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+# Right side bones get mirrored left side values unless listed, see utils/symmetry.py
 IK_CONFIG = {
     'LowerArm_L': {
         'chain_count': 2,
@@ -7,14 +8,6 @@ IK_CONFIG = {
         'ik_max_x': 0,
         'ik_min_x': -2.61799
     },
-    'LowerArm_R': {
-        'chain_count': 2,
-        'lock_ik_y': True,
-        'lock_ik_z': True,
-        'use_ik_limit_x': True,
-        'ik_min_x': -2.61799,
-        'ik_max_x': 0
-    },
     'LowerLeg_L': {
         'chain_count': 2,
         'lock_ik_y': True,
@@ -22,13 +15,5 @@ IK_CONFIG = {
         'use_ik_limit_x': True,
         'ik_max_x': 0,
         'ik_min_x': -2.61799
-    },
-    'LowerLeg_R': {
-        'chain_count': 2,
-        'lock_ik_y': True,
-        'lock_ik_z': True,
-        'use_ik_limit_x': True,
-        'ik_max_x': 0,
-        'ik_min_x': -2.61799
     }
 }
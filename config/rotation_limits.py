@@ -1,3 +1,4 @@
+# Right side bones get mirrored left side values unless listed, see utils/symmetry.py
 ROTATION_LIMITS = {
     'UpperLeg_L': {
         'min_x': -0.698132,
@@ -7,14 +8,6 @@ ROTATION_LIMITS = {
         'min_z': -0.785398,
         'max_z': 1.39626
     },
-    'UpperLeg_R': {
-        'min_x': -0.698132,
-        'max_x': 1.91986,
-        'min_y': -0.436332,
-        'max_y': 0.436332,
-        'min_z': -0.785398,
-        'max_z': 1.39626
-    },
     'UpperArm_L': {
         'min_x': -2.0944,
         'max_x': 0.436332,
@@ -23,14 +16,6 @@ ROTATION_LIMITS = {
         'min_z': -2.26893,
         'max_z': 1.5708
     },
-    'UpperArm_R': {
-        'min_x': -2.0944,
-        'max_x': 0.436332,
-        'min_y': -0.872665,
-        'max_y': 0.872665,
-        'min_z': -1.5708,
-        'max_z': 2.26893
-    },
     'Spine': {
         'min_x': -0.523599,
         'max_x': 0.523599,
@@ -87,14 +72,6 @@ ROTATION_LIMITS = {
         'min_z': -0.349066,
         'max_z': 0.523599
     },
-    'Thumb1_R':{
-        'min_x': -0.994838,
-        'max_x': 0.349066,
-        'min_y': 0,
-        'max_y': 0,
-        'min_z': -0.523599,
-        'max_z': 0.349066
-    },
     'Shoulder_L':{
         'min_x': -0.349066,
         'max_x': 0.349066,
@@ -103,14 +80,6 @@ ROTATION_LIMITS = {
         'min_z': -0.349066,
         'max_z': 0.349066
     },
-    'Shoulder_R':{
-        'min_x': -0.349066,
-        'max_x': 0.349066,
-        'min_y': -0.349066,
-        'max_y': 0.0872665,
-        'min_z': -0.349066,
-        'max_z': 0.349066
-    },
     'Foot_L':{
         'min_x': -0.837758,
         'max_x': 0.645772,
@@ -118,13 +87,5 @@ ROTATION_LIMITS = {
         'max_y': 0.0523599,
         'min_z': -0.261799,
         'max_z': 0.261799
-    },
-    'Foot_R':{
-        'min_x': -0.837758,
-        'max_x': 0.645772,
-        'min_y': -0.0523599,
-        'max_y': 0.0523599,
-        'min_z': -0.261799,
-        'max_z': 0.261799
     }
-}
\ No newline at end of file
+}
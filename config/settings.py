@@ -2,8 +2,101 @@ import bpy
 
 
 class VRoidSettings(bpy.types.PropertyGroup):
+    vrm_file: bpy.props.StringProperty(
+        name="VRM file",
+        default="",
+        subtype='FILE_PATH',
+        description="Take bone names from humanoid map of this .vrm file, VRoid naming is used for the rest",
+    )  # type: ignore
+    rename_bones: bpy.props.BoolProperty(
+        name="Rename bones",
+        default=True,
+        description="Simplify bone names and use blender's left/right naming convention",
+    )  # type: ignore
     bone_chains: bpy.props.BoolProperty(
         name="Fix bone chains",
         default=True,
         description="Connect bones in chains, i.e. arms, legs, fingers, etc..",
     )  # type: ignore
+    leaf_tails: bpy.props.BoolProperty(
+        name="Fix leaf tails",
+        default=False,
+        description="Point weighted leaf bones, like hair tips, along the vertices they deform and roll flat strands so X runs across them",
+    )  # type: ignore
+    cleanup: bpy.props.BoolProperty(
+        name="Clean skeleton",
+        default=True,
+        description="Remove bones that have no weights and no constraints",
+    )  # type: ignore
+    reassign_orphans: bpy.props.BoolProperty(
+        name="Reassign orphaned vertices",
+        default=False,
+        description="Weight vertices left without any bone weights, e.g. after cleanup, to the nearest bones",
+    )  # type: ignore
+    orphan_neighbors: bpy.props.IntProperty(
+        name="Nearest bones",
+        default=1,
+        min=1,
+        max=8,
+        description="Number of nearest bones an orphaned vertex is shared between, closer bones get more weight",
+    )  # type: ignore
+    limit_influences: bpy.props.BoolProperty(
+        name="Limit influences",
+        default=False,
+        description="Keep only the strongest weights of every vertex and renormalize them, for game engines",
+    )  # type: ignore
+    max_influences: bpy.props.IntProperty(
+        name="Max influences",
+        default=4,
+        min=1,
+        description="Number of bone weights kept per vertex",
+    )  # type: ignore
+    weight_threshold: bpy.props.FloatProperty(
+        name="Min weight",
+        default=0.01,
+        min=0.0,
+        max=1.0,
+        description="Weights below this are dropped before renormalizing",
+    )  # type: ignore
+    ik: bpy.props.BoolProperty(
+        name="Setup IK",
+        default=True,
+        description="Add inverse kinematics to arms and legs",
+    )  # type: ignore
+    finger_constraints: bpy.props.BoolProperty(
+        name="Finger constraints",
+        default=True,
+        description="Make finger segments follow rotation of the previous segment",
+    )  # type: ignore
+    rotation_limits: bpy.props.BoolProperty(
+        name="Rotation limits",
+        default=True,
+        description="Limit rotation of body and finger bones to natural ranges",
+    )  # type: ignore
+    constraint_preset: bpy.props.StringProperty(
+        name="Constraint preset",
+        default="",
+        subtype='FILE_PATH',
+        description="JSON file with \"ik\", \"rotation_limits\" and \"finger_constraints\" to use instead of built in limits",
+    )  # type: ignore
+    all_selected: bpy.props.BoolProperty(
+        name="All selected armatures",
+        default=False,
+        description="Run operators on every selected armature in one edit session and undo step, not only the active one",
+    )  # type: ignore
+    symmetry: bpy.props.BoolProperty(
+        name="Mirror left to right",
+        default=False,
+        description="Plan left side bones only and mirror them to matching right side bones, asymmetric parts are processed per side",
+    )  # type: ignore
+    incremental: bpy.props.BoolProperty(
+        name="Skip unchanged",
+        default=True,
+        description="Skip whole stages whose input didn't change since they last ran on the armature, a change anywhere reruns the stage on all bones. Constraint stages always run",
+    )  # type: ignore
+    log_file: bpy.props.StringProperty(
+        name="Log file",
+        default="",
+        subtype='FILE_PATH',
+        description="Append a JSON line with timings of every run to this file",
+    )  # type: ignore
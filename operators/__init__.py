@@ -1,3 +1,7 @@
-from .cleaner import VRoidCleanerOperator
+from .cleaner import VRoidCleanerOperator, VRoidCleanerModalOperator
 from .ik import VRoidIKOperator
-from .chains import VRoidFixChainsOperator
\ No newline at end of file
+from .bake import VRoidBakeIKOperator
+from .chains import VRoidFixChainsOperator, VRoidFixChainsModalOperator
+from .pipeline import VRoidFullSetupOperator
+from .prune import VRoidPruneOperator
+from .decimate import VRoidDecimateOperator
@@ -0,0 +1,81 @@
+import bpy
+from ..utils import profiling
+from ..utils.bake import bake_ik_chains
+from ..utils.constraint_spec import preset_or_default
+from ..utils.objects import target_armatures, toggle_edit_mode
+
+class VRoidBakeIKOperator(bpy.types.Operator):
+    '''Bake arm and leg IK into FK rotation keys for fast playback and export, then mute the IK'''
+    bl_idname = "bones.vroid_bake_ik"
+    bl_label = "Bake IK to FK"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    frame_start: bpy.props.IntProperty(
+        name="Start frame",
+        default=1,
+        min=0,
+        description="First frame to bake",
+    )  # type: ignore
+    frame_end: bpy.props.IntProperty(
+        name="End frame",
+        default=250,
+        min=0,
+        description="Last frame to bake",
+    )  # type: ignore
+    decimate: bpy.props.BoolProperty(
+        name="Decimate keys",
+        default=False,
+        description="Drop keys that linear interpolation of the keys around them reproduces",
+    )  # type: ignore
+    tolerance: bpy.props.FloatProperty(
+        name="Tolerance",
+        default=0.001,
+        min=0.0,
+        precision=4,
+        description="Largest change of a rotation channel dropping keys may cause",
+    )  # type: ignore
+    mute_constraints: bpy.props.BoolProperty(
+        name="Mute constraints",
+        default=True,
+        description="Mute IK and other constraints of baked bones so the keys alone drive them, unmute them to animate with IK again",
+    )  # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        self.frame_start = context.scene.frame_start
+        self.frame_end = context.scene.frame_end
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        if self.frame_end < self.frame_start:
+            self.report({'ERROR'}, "End frame is before start frame")
+            return {'CANCELLED'}
+        settings = context.scene.vroid_settings
+        log_file = bpy.path.abspath(settings.log_file)
+        armatures = target_armatures(context, settings.all_selected)
+        preset = preset_or_default(bpy.path.abspath(settings.constraint_preset), self.report)
+        with profiling.profile_run(context.active_object, self.bl_label, log_file) as profiler:
+            # Edit bones have to reach the pose before it is evaluated
+            mode = context.mode
+            if mode == 'EDIT_ARMATURE':
+                toggle_edit_mode()
+            results = bake_ik_chains(
+                armatures,
+                range(self.frame_start, self.frame_end + 1),
+                preset,
+                self.tolerance if self.decimate else None,
+                self.mute_constraints,
+            )
+            if mode == 'EDIT_ARMATURE':
+                toggle_edit_mode()
+
+        for name, result in results.items():
+            prefix = f"{name}: " if len(results) > 1 else ""
+            self.report({'INFO'} if result.plan else {'WARNING'}, prefix + result.summary())
+            for line in result.plan.resolver.report():
+                self.report({'WARNING'}, prefix + line)
+        self.report({'INFO'}, profiler.summary())
+        return {'FINISHED'}
@@ -1,5 +1,41 @@
 import bpy
-from ..utils.bones import simplify_symmetrize_names, fix_bones_chains, clear_leaf_bones
+from ..utils import profiling
+from ..utils import fingerprint
+from ..utils.bones import (
+    simplify_symmetrize_names,
+    fix_bones_chains,
+    fix_leaf_tails,
+    clear_leaf_bones,
+    preview_fix,
+    capture_mirror,
+    capture_snapshot,
+    delete_bones_and_cleanup,
+    restore_bones,
+    undo_renames,
+)
+from ..utils.fingerprint import run_stage
+from ..utils.objects import (
+    active_object,
+    enter_edit_mode,
+    get_deformed,
+    shared_children,
+    target_armatures,
+    toggle_edit_mode,
+)
+from ..utils.snapshot import find_junk_leaves
+from ..utils.vrm import name_table_or_none
+from ..utils.weights import (
+    WeightIndexBuilder,
+    bone_segments,
+    limit_armature_influences,
+    limit_influences,
+    reassign_armature_orphans,
+    reassign_orphans,
+)
+from .modal import ChunkedModalOperator
+
+# Lines of a preview shown in the info reports, the rest are only counted
+PREVIEW_LINES = 20
 
 class VRoidFixChainsOperator(bpy.types.Operator):
     """Rename symmetrical VRoid bones to blender convention."""
@@ -8,22 +44,216 @@ class VRoidFixChainsOperator(bpy.types.Operator):
     bl_label = "Fix Armature"
     bl_options = {"UNDO"}
 
+    dry_run: bpy.props.BoolProperty(
+        name="Dry run",
+        default=False,
+        description="Only list what would change, leave the armature as it is",
+    )  # type: ignore
+
     @classmethod
     def poll(cls, context):
         return context.active_object and context.active_object.type == 'ARMATURE'
 
     def execute(self, context):
+        if self.dry_run:
+            return self.preview(context)
+
+        settings = context.scene.vroid_settings
+        name_table = name_table_or_none(bpy.path.abspath(settings.vrm_file), self.report)
+        log_file = bpy.path.abspath(settings.log_file)
+        armatures = target_armatures(context, settings.all_selected)
+        mirror = True if settings.symmetry else None
+        stages = [
+            ("rename_bones", simplify_symmetrize_names, (name_table,), name_table),
+            ("bone_chains", fix_bones_chains, (settings.symmetry,), mirror),
+            ("clear_leaf_bones", clear_leaf_bones, (settings.symmetry,), mirror),
+        ]
+        if settings.leaf_tails:
+            stages.insert(2, ("leaf_tails", fix_leaf_tails, (), None))
+        neighbors = settings.orphan_neighbors
+        limits = [settings.max_influences, settings.weight_threshold]
+        orphans_reassigned = dict()
+        influences_removed = dict()
+        fixed = 0
+        with profiling.profile_run(context.active_object, self.bl_label, log_file) as profiler:
+            mode = enter_edit_mode(context, armatures)
+
+            with shared_children():
+                for armature in armatures:
+                    with active_object(context, armature):
+                        ran = False
+                        for name, stage, args, extra in stages:
+                            with profiling.stage(name):
+                                ran |= run_stage(armature, name, stage, *args, extra=extra, incremental=settings.incremental)[0]
+                        if settings.reassign_orphans:
+                            with profiling.stage("reassign_orphans"):
+                                reassigned, stats = run_stage(
+                                    armature, "reassign_orphans", reassign_armature_orphans, armature, neighbors,
+                                    extra=neighbors, incremental=settings.incremental,
+                                )
+                            if reassigned:
+                                orphans_reassigned.update(stats)
+                            ran |= reassigned
+                        if settings.limit_influences:
+                            with profiling.stage("limit_influences"):
+                                limited, stats = run_stage(
+                                    armature, "limit_influences", limit_armature_influences, armature, *limits,
+                                    extra=limits, incremental=settings.incremental,
+                                )
+                            if limited:
+                                influences_removed.update(stats)
+                            ran |= limited
+                    fixed += ran
+
+            if mode != 'EDIT_ARMATURE':
+                toggle_edit_mode()
+
+        if not fixed:
+            self.report({"INFO"}, "Armature is unchanged since last fix, nothing to do")
+        elif len(armatures) > 1:
+            self.report({"INFO"}, f"{fixed} of {len(armatures)} armatures were fixed!")
+        else:
+            self.report({"INFO"}, "Armature was fixed!")
+        for mesh, reassigned in orphans_reassigned.items():
+            self.report({"INFO"}, f"{mesh}: weighted {reassigned} orphaned vertices to nearest bones")
+        for mesh, removed in influences_removed.items():
+            self.report({"INFO"}, f"{mesh}: removed {removed} weak or excess influences")
+        self.report({"INFO"}, profiler.summary())
+
+        return {"FINISHED"}
+
+    def preview(self, context):
+        settings = context.scene.vroid_settings
+        name_table = name_table_or_none(bpy.path.abspath(settings.vrm_file), self.report)
         mode = context.mode
         if mode != 'EDIT_ARMATURE':
-            bpy.ops.object.editmode_toggle()
-        
-        simplify_symmetrize_names()
-        fix_bones_chains()
-        clear_leaf_bones()
-        
+            toggle_edit_mode()
+        diff = preview_fix(name_table, settings.symmetry)
         if mode != 'EDIT_ARMATURE':
-            bpy.ops.object.editmode_toggle()
-        
-        self.report({"INFO"}, "Armature was fixed!")
-        
-        return {"FINISHED"}
+            toggle_edit_mode()
+
+        renamed, moved, removed = diff.describe_counts()
+        self.report({"INFO"}, f"Would rename {renamed}, move {moved} and remove {removed} bones")
+        lines = diff.describe()
+        for line in lines[:PREVIEW_LINES]:
+            self.report({"INFO"}, line)
+        if len(lines) > PREVIEW_LINES:
+            self.report({"INFO"}, f"+{len(lines) - PREVIEW_LINES} more")
+        return {"CANCELLED"}
+
+
+class VRoidFixChainsModalOperator(ChunkedModalOperator, bpy.types.Operator):
+    """Fix armature in the background with progress, Esc cancels and undoes the fix."""
+
+    bl_idname = "bones.vroid_fix_modal"
+    bl_label = "Fix Armature (interactive)"
+    bl_options = {"UNDO"}
+    restore_mode = True
+
+    def start(self, context):
+        settings = context.scene.vroid_settings
+        self.table = name_table_or_none(bpy.path.abspath(settings.vrm_file), self.report)
+        self.incremental = settings.incremental
+        self.leaf_tails = settings.leaf_tails
+        self.symmetry = settings.symmetry
+        self.neighbors = settings.orphan_neighbors if settings.reassign_orphans else None
+        self.limits = [settings.max_influences, settings.weight_threshold] if settings.limit_influences else None
+        self.stored = context.active_object.get(fingerprint.PROPERTY)
+        self.renames = dict()
+        self.original = None
+        self.fixed = False
+        self.orphans_reassigned = dict()
+        self.influences_removed = dict()
+        super().start(context)
+
+    def steps(self):
+        armature = self.armature
+        incremental = self.incremental
+        # Renaming, chains and leaf tails are bulk writes of edit bones, rollback undoes them
+        with profiling.stage("rename_bones"):
+            ran, renames = run_stage(
+                armature, "rename_bones", simplify_symmetrize_names, self.table,
+                extra=self.table, incremental=incremental,
+            )
+        self.renames = renames or dict()
+        self.fixed |= ran
+        yield 0.05
+        self.original = capture_snapshot()
+        with profiling.stage("bone_chains"):
+            self.fixed |= run_stage(
+                armature, "bone_chains", fix_bones_chains, self.symmetry,
+                extra=self.mirror_extra, incremental=incremental,
+            )[0]
+        yield 0.1
+        if self.leaf_tails:
+            with profiling.stage("leaf_tails"):
+                self.fixed |= run_stage(armature, "leaf_tails", fix_leaf_tails, incremental=incremental)[0]
+            yield 0.15
+
+        if not (incremental and fingerprint.is_up_to_date(armature, "clear_leaf_bones", self.mirror_extra)):
+            builder = WeightIndexBuilder(armature)
+            while True:
+                with profiling.stage("weights", resume=True):
+                    finished = builder.step()
+                if finished:
+                    break
+                yield 0.15 + 0.65 * builder.done / max(builder.total, 1)
+
+            self.cancellable = False
+            with profiling.stage("clear_leaf_bones"):
+                snapshot = capture_snapshot(builder.index)
+                plan = find_junk_leaves(snapshot, capture_mirror(snapshot, self.symmetry))
+                delete_bones_and_cleanup(plan.bones, builder.index)
+                fingerprint.mark_done(armature, "clear_leaf_bones", self.mirror_extra)
+            self.fixed = True
+            yield 0.8
+
+        if self.neighbors and not (incremental and fingerprint.is_up_to_date(armature, "reassign_orphans", self.neighbors)):
+            self.cancellable = False
+            with profiling.stage("reassign_orphans", resume=True):
+                segments = bone_segments(armature)
+            to_armature = armature.matrix_world.inverted()
+            meshes = [obj for obj in get_deformed(armature) if obj.type == 'MESH' and obj.vertex_groups]
+            for i, obj in enumerate(meshes):
+                with profiling.stage("reassign_orphans", resume=True):
+                    reassigned = reassign_orphans(obj, segments, to_armature @ obj.matrix_world, self.neighbors)
+                if reassigned:
+                    self.orphans_reassigned[obj.name] = reassigned
+                yield 0.8 + 0.1 * (i + 1) / len(meshes)
+            fingerprint.mark_done(armature, "reassign_orphans", self.neighbors)
+            self.fixed = True
+
+        if self.limits and not (incremental and fingerprint.is_up_to_date(armature, "limit_influences", self.limits)):
+            self.cancellable = False
+            bone_names = {b.name for b in armature.data.edit_bones}
+            meshes = [obj for obj in get_deformed(armature) if obj.type == 'MESH' and obj.vertex_groups]
+            for i, obj in enumerate(meshes):
+                with profiling.stage("limit_influences", resume=True):
+                    self.influences_removed[obj.name] = limit_influences(obj, *self.limits, bone_names)
+                yield 0.9 + 0.1 * (i + 1) / len(meshes)
+            fingerprint.mark_done(armature, "limit_influences", self.limits)
+            self.fixed = True
+
+    @property
+    def mirror_extra(self):
+        return True if self.symmetry else None
+
+    def rollback(self):
+        with profiling.stage("rollback"):
+            if self.original is not None:
+                restore_bones(self.original)
+            undo_renames(self.renames)
+            if self.stored is None:
+                fingerprint.clear_fingerprints(self.armature)
+            else:
+                self.armature[fingerprint.PROPERTY] = self.stored
+
+    def finish_report(self):
+        if not self.fixed:
+            self.report({"INFO"}, "Armature is unchanged since last fix, nothing to do")
+        else:
+            self.report({"INFO"}, "Armature was fixed!")
+        for mesh, reassigned in self.orphans_reassigned.items():
+            self.report({"INFO"}, f"{mesh}: weighted {reassigned} orphaned vertices to nearest bones")
+        for mesh, removed in self.influences_removed.items():
+            self.report({"INFO"}, f"{mesh}: removed {removed} weak or excess influences")
@@ -1,5 +1,11 @@
 import bpy
-from ..utils.bones import get_junk_bone_chain, delete_bones_and_cleanup
+from ..utils import profiling
+from ..utils.bones import capture_mirror, capture_snapshot, delete_bones_and_cleanup, remove_junk_bones
+from ..utils.fingerprint import is_up_to_date, mark_done, run_stage
+from ..utils.objects import active_object, enter_edit_mode, shared_children, target_armatures
+from ..utils.snapshot import analyze_junk_bones
+from ..utils.weights import WeightIndexBuilder
+from .modal import ChunkedModalOperator
 
 class VRoidCleanerOperator(bpy.types.Operator):
     '''Remove all bones that dont have effect'''
@@ -12,18 +18,74 @@ class VRoidCleanerOperator(bpy.types.Operator):
         return context.active_object and context.active_object.type == 'ARMATURE'
 
     def execute(self, context):
-        mode = context.mode
-        if mode != 'EDIT_ARMATURE':
-            bpy.ops.object.editmode_toggle()
+        settings = context.scene.vroid_settings
+        log_file = bpy.path.abspath(settings.log_file)
+        armatures = target_armatures(context, settings.all_selected)
+        plans = dict()
+        with profiling.profile_run(context.active_object, self.bl_label, log_file) as profiler:
+            enter_edit_mode(context, armatures)
 
-        junk_bones = set()
-        for bone in context.active_object.data.edit_bones:
-            print(f"Checking bone: {bone.name}")  # Debug
-            chain = get_junk_bone_chain(bone)
-            if chain:
-                print(f"Marked as junk: {[b.name for b in chain]}")  # Debug
-                junk_bones.update(b.name for b in chain)
+            with shared_children():
+                for armature in armatures:
+                    with active_object(context, armature), profiling.stage("cleanup"):
+                        ran, plan = run_stage(
+                            armature, "cleanup", remove_junk_bones, settings.symmetry,
+                            extra=True if settings.symmetry else None, incremental=settings.incremental,
+                        )
+                    if ran:
+                        plans[armature.name] = plan
 
-        delete_bones_and_cleanup(junk_bones)
+        if not plans:
+            self.report({'INFO'}, "Skeleton is unchanged since last cleanup, nothing to do")
+            return {'FINISHED'}
+        for name, plan in plans.items():
+            prefix = f"{name}: " if len(armatures) > 1 else ""
+            self.report({'INFO'}, prefix + plan.summary())
+            if plan:
+                self.report({'INFO'}, prefix + "Removed: " + ", ".join(sorted(plan.bones)))
+        self.report({'INFO'}, profiler.summary())
 
         return {'FINISHED'}
+
+
+class VRoidCleanerModalOperator(ChunkedModalOperator, bpy.types.Operator):
+    '''Remove all bones that dont have effect, in the background with progress, Esc cancels'''
+    bl_idname = "bones.vroid_cleanup_modal"
+    bl_label = "Clean skeleton (interactive)"
+    bl_options = {'UNDO'}
+
+    def start(self, context):
+        self.incremental = context.scene.vroid_settings.incremental
+        self.symmetry = context.scene.vroid_settings.symmetry
+        self.plan = None
+        super().start(context)
+
+    def steps(self):
+        armature = self.armature
+        extra = True if self.symmetry else None
+        if self.incremental and is_up_to_date(armature, "cleanup", extra):
+            return
+        # Reading weights is the slow part and changes nothing
+        builder = WeightIndexBuilder(armature)
+        while True:
+            with profiling.stage("weights", resume=True):
+                finished = builder.step()
+            if finished:
+                break
+            yield 0.9 * builder.done / max(builder.total, 1)
+
+        self.cancellable = False
+        with active_object(bpy.context, armature), profiling.stage("cleanup"):
+            snapshot = capture_snapshot(builder.index)
+            self.plan = analyze_junk_bones(snapshot, capture_mirror(snapshot, self.symmetry))
+            delete_bones_and_cleanup(self.plan.bones, builder.index)
+            mark_done(armature, "cleanup", extra)
+        yield 1.0
+
+    def finish_report(self):
+        if self.plan is None:
+            self.report({'INFO'}, "Skeleton is unchanged since last cleanup, nothing to do")
+            return
+        self.report({'INFO'}, self.plan.summary())
+        if self.plan:
+            self.report({'INFO'}, "Removed: " + ", ".join(sorted(self.plan.bones)))
@@ -0,0 +1,61 @@
+import bpy
+from ..utils import profiling
+from ..utils.bones import decimate_chains
+from ..utils.objects import active_object, enter_edit_mode, shared_children, target_armatures, toggle_edit_mode
+
+class VRoidDecimateOperator(bpy.types.Operator):
+    '''Remove bones from hair, skirt and other secondary chains, merging their weights'''
+    bl_idname = "bones.vroid_decimate"
+    bl_label = "Decimate Chains"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    mode: bpy.props.EnumProperty(
+        name="Keep",
+        items=[
+            ('STEP', "Every n-th bone", "Keep every n-th bone of a chain"),
+            ('LENGTH', "Bones per chain", "Keep this many bones spread evenly along a chain"),
+        ],
+        default='STEP',
+    )  # type: ignore
+    step: bpy.props.IntProperty(
+        name="Step",
+        default=2,
+        min=2,
+        description="Keep every n-th bone, the others are merged into the kept bone above",
+    )  # type: ignore
+    length: bpy.props.IntProperty(
+        name="Chain length",
+        default=3,
+        min=1,
+        description="Number of bones left in every longer chain",
+    )  # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        settings = context.scene.vroid_settings
+        log_file = bpy.path.abspath(settings.log_file)
+        armatures = target_armatures(context, settings.all_selected)
+        length = self.length if self.mode == 'LENGTH' else 0
+        plans = dict()
+        with profiling.profile_run(context.active_object, self.bl_label, log_file) as profiler:
+            mode = enter_edit_mode(context, armatures)
+
+            with shared_children():
+                for armature in armatures:
+                    with active_object(context, armature), profiling.stage("decimate"):
+                        plans[armature.name] = decimate_chains(self.step, length)
+
+            if mode != 'EDIT_ARMATURE':
+                toggle_edit_mode()
+
+        for name, plan in plans.items():
+            prefix = f"{name}: " if len(plans) > 1 else ""
+            self.report({'INFO'}, prefix + plan.summary())
+        self.report({'INFO'}, profiler.summary())
+        return {'FINISHED'}
@@ -1,6 +1,9 @@
 import bpy
 
-from ..utils.constraints import setup_ik
+from ..utils import profiling
+from ..utils.constraint_spec import preset_or_default
+from ..utils.constraints import apply_edit_bones, setup_ik
+from ..utils.objects import active_object, enter_edit_mode, target_armatures, toggle_edit_mode
 
 class VRoidIKOperator(bpy.types.Operator):
     '''Auto setup inverse kinematics for arms and legs'''
@@ -13,13 +16,25 @@ class VRoidIKOperator(bpy.types.Operator):
         return context.active_object and context.active_object.type == 'ARMATURE'
 
     def execute(self, context):
-        mode = context.mode
-        if mode != 'EDIT_ARMATURE':
-            bpy.ops.object.editmode_toggle()
-        
-        setup_ik()
+        settings = context.scene.vroid_settings
+        log_file = bpy.path.abspath(settings.log_file)
+        armatures = target_armatures(context, settings.all_selected)
+        preset = preset_or_default(bpy.path.abspath(settings.constraint_preset), self.report)
+        with profiling.profile_run(context.active_object, self.bl_label, log_file) as profiler:
+            mode = enter_edit_mode(context, armatures)
 
-        if mode != 'EDIT_ARMATURE':
-            bpy.ops.object.editmode_toggle()
+            # One flush for all armatures sharing the edit session
+            apply_edit_bones()
+            for armature in armatures:
+                with active_object(context, armature), profiling.stage("ik"):
+                    report = setup_ik(apply_edits=False, preset=preset)
+                prefix = f"{armature.name}: " if len(armatures) > 1 else ""
+                self.report({'INFO'}, prefix + report.summary())
+                for line in report.resolver.report():
+                    self.report({'WARNING'}, prefix + line)
+
+            if mode != 'EDIT_ARMATURE':
+                toggle_edit_mode()
         self.report({'INFO'}, 'IK was setup!')
-        return {'FINISHED'}
\ No newline at end of file
+        self.report({'INFO'}, profiler.summary())
+        return {'FINISHED'}
@@ -0,0 +1,107 @@
+from time import perf_counter
+
+import bpy
+from ..utils import profiling
+from ..utils.objects import enter_edit_mode, toggle_edit_mode
+
+# Events passed on to the viewport while a modal run is in progress
+NAVIGATION_EVENTS = {
+    'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+    'TRACKPADPAN', 'TRACKPADZOOM', 'NDOF_MOTION',
+}
+
+
+class ChunkedModalOperator:
+    '''Mixin running an operator's work from a timer, a few chunks per tick.
+
+    Subclasses implement steps(), a generator doing the work in small
+    chunks and yielding progress between 0 and 1, rollback() undoing what
+    steps did so far and finish_report(). steps sets cancellable to False
+    before writing changes it can't roll back. Context passed to invoke
+    is gone by the next tick, steps and rollback use bpy.context.
+    '''
+    # Seconds of work per timer tick, events are handled between ticks
+    tick_time = 0.05
+    # Leave edit mode at the end if the run had to enter it
+    restore_mode = False
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    def start(self, context):
+        settings = context.scene.vroid_settings
+        self.armature = context.active_object
+        self.log_file = bpy.path.abspath(settings.log_file)
+        self.profiler = profiling.Profiler(self.bl_label)
+        self.cancellable = True
+        self.progress = 0.0
+        self.work = self.steps()
+        with profiling.activate(self.profiler):
+            self.mode = enter_edit_mode(context, [self.armature])
+
+    def execute(self, context):
+        '''Run all steps at once, when called from scripts'''
+        self.start(context)
+        with profiling.activate(self.profiler):
+            for self.progress in self.work:
+                pass
+        self.end_mode()
+        profiling.store(self.profiler, self.armature, self.log_file)
+        self.finish_report()
+        self.report({'INFO'}, self.profiler.summary())
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        self.start(context)
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.01, window=context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            if not self.cancellable:
+                self.report({'WARNING'}, "Writing changes, can't cancel anymore")
+                return {'RUNNING_MODAL'}
+            with profiling.activate(self.profiler):
+                self.rollback()
+            self.end(context)
+            self.report({'WARNING'}, f"{self.bl_label} cancelled, {self.armature.name} is left unchanged")
+            return {'CANCELLED'}
+        if event.type in NAVIGATION_EVENTS:
+            return {'PASS_THROUGH'}
+        if event.type != 'TIMER':
+            return {'RUNNING_MODAL'}
+
+        deadline = perf_counter() + self.tick_time
+        try:
+            with profiling.activate(self.profiler):
+                while perf_counter() < deadline:
+                    self.progress = next(self.work)
+        except StopIteration:
+            self.end(context)
+            self.finish_report()
+            self.report({'INFO'}, self.profiler.summary())
+            return {'FINISHED'}
+        except Exception:
+            self.end(context)
+            raise
+        context.window_manager.progress_update(int(self.progress * 100))
+        return {'RUNNING_MODAL'}
+
+    def rollback(self):
+        '''Undo changes of steps so far, nothing to undo when steps only read'''
+
+    def end_mode(self):
+        if self.restore_mode and self.mode != 'EDIT_ARMATURE':
+            with profiling.activate(self.profiler):
+                toggle_edit_mode()
+
+    def end(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        self.end_mode()
+        profiling.store(self.profiler, self.armature, self.log_file)
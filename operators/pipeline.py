@@ -0,0 +1,61 @@
+import bpy
+from ..utils import profiling
+from ..utils.constraint_spec import preset_or_default
+from ..utils.objects import enter_edit_mode, target_armatures, toggle_edit_mode
+from ..utils.pipeline import STAGES, run_batch_setup
+from ..utils.vrm import name_table_or_none
+
+class VRoidFullSetupOperator(bpy.types.Operator):
+    '''Run every enabled setup stage with a single edit bones flush'''
+    bl_idname = "bones.vroid_full_setup"
+    bl_label = "Full Rig Setup"
+    bl_options = {'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    def execute(self, context):
+        settings = context.scene.vroid_settings
+        log_file = bpy.path.abspath(settings.log_file)
+        name_table = name_table_or_none(bpy.path.abspath(settings.vrm_file), self.report)
+        armatures = target_armatures(context, settings.all_selected)
+        with profiling.profile_run(context.active_object, self.bl_label, log_file) as profiler:
+            mode = enter_edit_mode(context, armatures)
+
+            results = run_batch_setup(
+                armatures,
+                [stage for stage in STAGES if getattr(settings, stage)],
+                name_table,
+                settings.incremental,
+                preset_or_default(bpy.path.abspath(settings.constraint_preset), self.report),
+                max_influences=settings.max_influences,
+                weight_threshold=settings.weight_threshold,
+                symmetry=settings.symmetry,
+                orphan_neighbors=settings.orphan_neighbors,
+            )
+
+            if mode != 'EDIT_ARMATURE':
+                toggle_edit_mode()
+
+        for name, result in results.items():
+            prefix = f"{name}: " if len(results) > 1 else ""
+            if result.removed is not None:
+                self.report({'INFO'}, prefix + result.removed.summary())
+            if result.skipped:
+                self.report({'INFO'}, prefix + "Unchanged, skipped: " + ", ".join(result.skipped))
+            if result.constraints:
+                counts = result.constraints
+                self.report({'INFO'}, prefix + (
+                    f"{counts['created']} constraints created, {counts['updated']} updated, "
+                    f"{counts['unchanged']} unchanged"
+                ))
+            for mesh, reassigned in result.orphans_reassigned.items():
+                self.report({'INFO'}, prefix + f"{mesh}: weighted {reassigned} orphaned vertices to nearest bones")
+            for mesh, removed in result.influences_removed.items():
+                self.report({'INFO'}, prefix + f"{mesh}: removed {removed} weak or excess influences")
+            for line in result.warnings:
+                self.report({'WARNING'}, prefix + line)
+        self.report({'INFO'}, "Rig setup finished!")
+        self.report({'INFO'}, profiler.summary())
+        return {'FINISHED'}
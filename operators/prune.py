@@ -0,0 +1,62 @@
+import bpy
+from ..utils import profiling
+from ..utils.bones import prune_bones
+from ..utils.objects import active_object, enter_edit_mode, shared_children, target_armatures, toggle_edit_mode
+
+class VRoidPruneOperator(bpy.types.Operator):
+    '''Remove bones and give their weights to the nearest remaining parent bone'''
+    bl_idname = "bones.vroid_prune"
+    bl_label = "Prune Bones"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    mode: bpy.props.EnumProperty(
+        name="Prune",
+        items=[
+            ('THRESHOLD', "Weak bones", "Bones whose strongest vertex weight is below threshold"),
+            ('BUDGET', "To bone budget", "Least influential bones until the budget is met"),
+            ('SELECTED', "Selected bones", "Bones selected in edit mode"),
+        ],
+        default='THRESHOLD',
+    )  # type: ignore
+    threshold: bpy.props.FloatProperty(
+        name="Min influence",
+        default=0.05,
+        min=0.0,
+        max=1.0,
+        description="Bones with max vertex weight below this are pruned",
+    )  # type: ignore
+    budget: bpy.props.IntProperty(
+        name="Bone budget",
+        default=150,
+        min=1,
+        description="Number of bones to keep",
+    )  # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object and context.active_object.type == 'ARMATURE'
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        settings = context.scene.vroid_settings
+        log_file = bpy.path.abspath(settings.log_file)
+        armatures = target_armatures(context, settings.all_selected)
+        plans = dict()
+        with profiling.profile_run(context.active_object, self.bl_label, log_file) as profiler:
+            mode = enter_edit_mode(context, armatures)
+
+            with shared_children():
+                for armature in armatures:
+                    with active_object(context, armature), profiling.stage("prune"):
+                        plans[armature.name] = prune_bones(self.mode, self.threshold, self.budget)
+
+            if mode != 'EDIT_ARMATURE':
+                toggle_edit_mode()
+
+        for name, plan in plans.items():
+            prefix = f"{name}: " if len(plans) > 1 else ""
+            self.report({'INFO'}, prefix + plan.summary())
+        self.report({'INFO'}, profiler.summary())
+        return {'FINISHED'}
@@ -0,0 +1,62 @@
+'''Tests run on the in-memory bpy of benchmarks/fake_bpy.py, no Blender needed:
+
+    python -m pytest tests
+
+Rigs come from benchmarks/rigs.py, the pytest-benchmark fixtures in
+test_benchmarks.py time the planners on them.
+'''
+import importlib
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, os.path.dirname(ADDON_DIR))
+sys.path.insert(0, os.path.join(ADDON_DIR, "benchmarks"))
+
+import fake_bpy  # noqa: E402
+
+bpy = fake_bpy.install()
+ADDON = os.path.basename(ADDON_DIR)
+addon = importlib.import_module(ADDON)
+snapshot_utils = importlib.import_module(f"{ADDON}.utils.snapshot")
+weights_utils = importlib.import_module(f"{ADDON}.utils.weights")
+
+import rigs  # noqa: E402
+
+BONES = 200
+VERTICES = 5000
+
+
+def build_rig(bones=BONES, vertices=VERTICES):
+    '''Fresh file with a rigs.make_rig armature, active and in edit mode'''
+    bpy.ops.wm.read_homefile(use_empty=True)
+    armature = rigs.make_rig(bones=bones, vertices=vertices)
+    bpy.ops.object.mode_set(mode='EDIT')
+    return armature
+
+
+@pytest.fixture(scope="session", autouse=True)
+def registered():
+    # Handlers drop cached weights when a test loads a fresh file
+    addon.register()
+    yield
+    addon.unregister()
+
+
+@pytest.fixture
+def rig_spec():
+    '''Description of the rig the rig fixture builds'''
+    return rigs.make_rig_spec(BONES)
+
+
+@pytest.fixture
+def rig():
+    return build_rig()
+
+
+@pytest.fixture
+def snapshot(rig):
+    return snapshot_utils.ArmatureSnapshot.capture(rig, weights_utils.build_weight_index(rig))
@@ -0,0 +1,55 @@
+'''Planner timings on a larger rig, compare runs with pytest-benchmark:
+
+    python -m pytest tests/test_benchmarks.py --benchmark-autosave
+    python -m pytest tests/test_benchmarks.py --benchmark-compare
+'''
+import importlib
+
+import pytest
+
+from conftest import ADDON, build_rig, snapshot_utils, weights_utils
+
+pytest.importorskip("pytest_benchmark")
+
+constraints = importlib.import_module(f"{ADDON}.utils.constraints")
+constraint_spec = importlib.import_module(f"{ADDON}.utils.constraint_spec")
+
+BONES = 2000
+VERTICES = 20000
+
+
+@pytest.fixture(scope="module")
+def large_snapshot():
+    armature = build_rig(BONES, VERTICES)
+    return snapshot_utils.ArmatureSnapshot.capture(armature, weights_utils.build_weight_index(armature))
+
+
+def test_bench_plan_renames(benchmark, large_snapshot):
+    renames = benchmark(snapshot_utils.plan_renames, large_snapshot)
+    assert renames
+
+
+def test_bench_plan_bones_chains(benchmark, large_snapshot):
+    renamed = large_snapshot.renamed(snapshot_utils.plan_renames(large_snapshot))
+    plan = benchmark(snapshot_utils.plan_bones_chains, renamed)
+    assert len(plan.changed())
+
+
+def test_bench_analyze_junk_bones(benchmark, large_snapshot):
+    plan = benchmark(snapshot_utils.analyze_junk_bones, large_snapshot)
+    assert plan
+
+
+def test_bench_find_junk_leaves(benchmark, large_snapshot):
+    plan = benchmark(snapshot_utils.find_junk_leaves, large_snapshot)
+    assert plan
+
+
+def test_bench_apply_constraint_spec(benchmark):
+    # Re-runs on a set up rig, the common case of Full Setup after tweaks
+    build_rig(BONES, VERTICES // 10)
+    constraints.apply_edit_bones()
+    specs = constraint_spec.default_preset().specs['rotation_limits']
+    constraints.apply_constraint_spec(specs, apply_edits=False)
+    report = benchmark(constraints.apply_constraint_spec, specs, apply_edits=False)
+    assert report.written == 0
@@ -0,0 +1,48 @@
+import importlib
+
+import pytest
+
+from conftest import ADDON
+
+constraints = importlib.import_module(f"{ADDON}.utils.constraints")
+constraint_spec = importlib.import_module(f"{ADDON}.utils.constraint_spec")
+
+STAGES = ('ik', 'finger_constraints', 'rotation_limits')
+
+
+@pytest.fixture
+def posed_rig(rig):
+    '''Rig with edit bones flushed to the pose, still in edit mode'''
+    constraints.apply_edit_bones()
+    return rig
+
+
+def _constraint_count(specs):
+    return sum(len(spec.constraints) for spec in specs.values())
+
+
+@pytest.mark.parametrize("stage", STAGES)
+def test_apply_constraint_spec_second_run_is_unchanged(posed_rig, stage):
+    specs = constraint_spec.default_preset().specs[stage]
+    first = constraints.apply_constraint_spec(specs, apply_edits=False)
+    assert first.created == _constraint_count(specs)
+    assert (first.updated, first.unchanged) == (0, 0)
+    assert first.written > 0
+
+    second = constraints.apply_constraint_spec(specs, apply_edits=False)
+    assert second.as_dict() == {'created': 0, 'updated': 0, 'unchanged': first.created, 'written': 0}
+
+
+def test_apply_constraint_spec_restores_hand_edits(posed_rig):
+    specs = constraint_spec.default_preset().specs['ik']
+    constraints.apply_constraint_spec(specs, apply_edits=False)
+    resolver = constraints.PoseBoneResolver(posed_rig)
+    bone = constraints.get_pose_bone("LowerArm_L", resolver)
+    ik = next(c for c in bone.constraints if c.type == 'IK')
+    chain_count = ik.chain_count
+    ik.chain_count = chain_count + 3
+
+    report = constraints.apply_constraint_spec(specs, apply_edits=False)
+    assert (report.created, report.updated, report.written) == (0, 1, 1)
+    assert report.unchanged == _constraint_count(specs) - 1
+    assert ik.chain_count == chain_count
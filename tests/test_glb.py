@@ -0,0 +1,112 @@
+import importlib
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from conftest import ADDON
+
+glb_utils = importlib.import_module(f"{ADDON}.utils.glb")
+
+UNSIGNED_BYTE = 5121
+UNSIGNED_SHORT = 5123
+FLOAT = 5126
+
+
+def write_glb(path, gltf, arrays):
+    '''Write gltf with arrays appended to the BIN chunk as VEC4 accessors'''
+    gltf = dict(gltf, bufferViews=[], accessors=[], buffers=[])
+    data = bytearray()
+    for array, component_type, normalized in arrays:
+        view = {"buffer": 0, "byteOffset": len(data), "byteLength": array.nbytes}
+        accessor = {
+            "bufferView": len(gltf["bufferViews"]), "componentType": component_type,
+            "count": len(array), "type": "VEC4",
+        }
+        if normalized:
+            accessor["normalized"] = True
+        gltf["bufferViews"].append(view)
+        gltf["accessors"].append(accessor)
+        data += array.tobytes()
+        data += b"\0" * (-len(data) % 4)
+    gltf["buffers"].append({"byteLength": len(data)})
+    chunks = b""
+    for chunk, chunk_type, pad in ((json.dumps(gltf).encode(), glb_utils.CHUNK_JSON, b" "),
+                                   (bytes(data), glb_utils.CHUNK_BIN, b"\0")):
+        chunk += pad * (-len(chunk) % 4)
+        chunks += struct.pack("<II", len(chunk), chunk_type) + chunk
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", glb_utils.GLB_MAGIC, 2, 12 + len(chunks)) + chunks)
+
+
+def skinned_gltf():
+    '''Root > Hips > Hair, Hair only carries weights below the threshold'''
+    return {
+        "nodes": [
+            {"name": "Root", "children": [1, 3]},
+            {"name": "J_Bip_C_Hips", "children": [2]},
+            {"name": "J_Sec_Hair1_01"},
+            {"name": "Body", "mesh": 0, "skin": 0},
+        ],
+        "scenes": [{"nodes": [0]}],
+        "skins": [{"joints": [0, 1, 2]}],
+        "meshes": [{"primitives": [{"attributes": {
+            "JOINTS_0": 0, "WEIGHTS_0": 1, "JOINTS_1": 2, "WEIGHTS_1": 3,
+        }}]}],
+    }
+
+
+@pytest.fixture
+def glb_path(tmp_path):
+    joints = np.array([[1, 2, 0, 0], [1, 0, 0, 0], [2, 0, 0, 0]], dtype=np.uint8)
+    weights = np.array([[0.5, 0.0008, 0, 0], [1.0, 0, 0, 0], [0.0005, 0, 0, 0]], dtype=np.float32)
+    joints_1 = np.array([[2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]], dtype=np.uint8)
+    # Normalized unsigned shorts, second set of the same vertices
+    weights_1 = np.rint(np.array([[0.0002, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]) * 65535).astype(np.uint16)
+    path = tmp_path / "model.glb"
+    write_glb(path, skinned_gltf(), [
+        (joints, UNSIGNED_BYTE, False), (weights, FLOAT, False),
+        (joints_1, UNSIGNED_BYTE, False), (weights_1, UNSIGNED_SHORT, True),
+    ])
+    return path
+
+
+def test_find_junk_joints(glb_path):
+    with glb_utils.GLB(glb_path) as glb:
+        assert glb_utils.find_junk_joints(glb) == {2}
+        assert glb_utils.find_junk_joints(glb, threshold=0.0) == set()
+
+
+def test_preprocess_glb_remaps_joints_and_drops_their_weights(glb_path, tmp_path):
+    target = tmp_path / "out.glb"
+    report = glb_utils.preprocess_glb(glb_path, target)
+    assert report["removed"] == ["J_Sec_Hair1_01"]
+
+    with glb_utils.GLB(target) as glb:
+        gltf = glb.gltf
+        assert [node["name"] for node in gltf["nodes"]] == ["Root", "Hips", "Body"]
+        assert gltf["nodes"][0]["children"] == [1, 2]
+        assert "children" not in gltf["nodes"][1]
+        assert gltf["skins"][0]["joints"] == [0, 1]
+        assert gltf["nodes"][2]["skin"] == 0
+        joints = glb.accessor(0)
+        weights = glb.weights(1)
+        weights_1 = glb.weights(3)
+        np.testing.assert_array_equal(joints[:, 0], [1, 1, 0])
+        np.testing.assert_array_equal(glb.accessor(2)[0], [0, 0, 0, 0])
+        # Weights of the removed joint are gone, not moved to joint 0
+        np.testing.assert_allclose(weights[0], [1.0, 0, 0, 0])
+        np.testing.assert_allclose(weights_1[0], [0, 0, 0, 0])
+        np.testing.assert_allclose(weights[1], [1.0, 0, 0, 0])
+        # Vertex weighted only to removed joints is left without weights
+        np.testing.assert_allclose(weights[2], [0, 0, 0, 0])
+
+
+def test_preprocess_glb_keeps_weights_without_removed_joints(glb_path, tmp_path):
+    target = tmp_path / "out.glb"
+    report = glb_utils.preprocess_glb(glb_path, target, threshold=0.0)
+    assert report["removed"] == []
+    with glb_utils.GLB(glb_path) as source, glb_utils.GLB(target) as glb:
+        np.testing.assert_array_equal(glb.accessor(1), source.accessor(1))
+        np.testing.assert_array_equal(glb.accessor(3), source.accessor(3))
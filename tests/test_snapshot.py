@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from conftest import snapshot_utils
+
+ArmatureSnapshot = snapshot_utils.ArmatureSnapshot
+JunkPlan = snapshot_utils.JunkPlan
+
+
+def _renamed(snapshot):
+    return snapshot.renamed(snapshot_utils.plan_renames(snapshot))
+
+
+def test_plan_renames_vroid_names(snapshot):
+    renames = snapshot_utils.plan_renames(snapshot)
+    assert renames["J_Bip_C_Hips"] == "Hips"
+    assert renames["J_Bip_L_Hand"] == "Hand_L"
+    assert renames["J_Bip_R_Thumb3"] == "Thumb3_R"
+    assert renames["J_Sec_L_Skirt2_01"] == "Skirt01_2_L"
+    assert renames["J_Sec_Hair_end_01"] == "Hair01"
+    # Names without a VRoid pattern stay
+    assert "Root" not in renames
+    assert "J_Adj_L_FaceEye" not in renames
+
+
+def test_plan_renames_unique_and_stable(snapshot):
+    renamed = _renamed(snapshot)
+    assert len(set(renamed.names)) == len(renamed)
+    assert snapshot_utils.plan_renames(renamed) == {}
+
+
+def test_plan_renames_name_table_and_taken_names():
+    snapshot = ArmatureSnapshot(
+        ["Hips", "J_Bip_C_Hips", "J_Bip_C_Spine"], [-1, 0, 1],
+        np.zeros((3, 3)), np.ones((3, 3)), [False] * 3,
+    )
+    renames = snapshot_utils.plan_renames(snapshot, {"J_Bip_C_Spine": "spine"})
+    assert renames == {"J_Bip_C_Hips": "Hips.001", "J_Bip_C_Spine": "spine"}
+
+
+def test_plan_bones_chains_targets(snapshot):
+    plan = snapshot_utils.plan_bones_chains(_renamed(snapshot))
+    assert plan.targets["UpperArm_L"] == "LowerArm_L"
+    assert plan.targets["LowerLeg_R"] == "Foot_R"
+    assert plan.targets["Hair01_4"] == "Hair01_5"
+    assert plan.targets["Hair01_5"] == "Hair01"
+    assert "Head" not in plan.targets
+
+
+def test_plan_bones_chains_connects_chains(snapshot):
+    renamed = _renamed(snapshot)
+    plan = snapshot_utils.plan_bones_chains(renamed)
+    index = renamed.index
+    for i in np.flatnonzero(plan.connected):
+        np.testing.assert_allclose(plan.heads[i], plan.tails[renamed.parents[i]])
+    for name in ("LowerArm_L", "Hand_R", "Hair01_2", "Skirt01_5_L", "Tops01_R"):
+        assert plan.connected[index[name]]
+    # Skirts hang from the hips but are not part of its chain
+    assert not plan.connected[index["Skirt01_1_L"]]
+    assert not plan.connected[index["Hips"]]
+
+
+def test_plan_bones_chains_finger_tips_follow_parent(snapshot):
+    renamed = _renamed(snapshot)
+    plan = snapshot_utils.plan_bones_chains(renamed)
+    index = renamed.index
+    for side in ("L", "R"):
+        parent, tip = index[f"Index2_{side}"], index[f"Index3_{side}"]
+        direction = plan.tails[parent] - plan.heads[parent]
+        tip_direction = plan.tails[tip] - plan.heads[tip]
+        np.testing.assert_allclose(
+            tip_direction / np.linalg.norm(tip_direction), direction / np.linalg.norm(direction), atol=1e-6,
+        )
+
+
+def test_plan_bones_chains_flattens_toes(snapshot):
+    renamed = _renamed(snapshot)
+    plan = snapshot_utils.plan_bones_chains(renamed)
+    for side in ("L", "R"):
+        toe = renamed.index[f"ToeBase_{side}"]
+        assert plan.tails[toe][2] == pytest.approx(plan.heads[toe][2])
+        assert plan.length(toe) > 0
+
+
+def _subtree_unweighted(spec):
+    '''Bone names whose whole subtree carries no weights, by brute force'''
+    children = {name: [] for name in spec.names}
+    for name, parent in zip(spec.names, spec.parents):
+        if parent is not None:
+            children[parent].append(name)
+    weighted = dict(zip(spec.names, spec.weighted))
+
+    def _unweighted(name):
+        return not weighted[name] and all(_unweighted(child) for child in children[name])
+
+    return {name for name in spec.names if _unweighted(name)}, children
+
+
+def test_analyze_junk_bones(snapshot, rig_spec):
+    expected, children = _subtree_unweighted(rig_spec)
+    plan = snapshot_utils.analyze_junk_bones(snapshot)
+    assert plan.bones == expected
+    for name, reason in plan.reasons.items():
+        assert reason == (JunkPlan.CHAIN if children[name] else JunkPlan.LEAF)
+    assert "Root" not in plan.bones
+
+
+def test_find_junk_leaves(snapshot, rig_spec):
+    expected, children = _subtree_unweighted(rig_spec)
+    plan = snapshot_utils.find_junk_leaves(snapshot)
+    assert plan.bones == {name for name in expected if not children[name]}
+    assert set(plan.reasons.values()) == {JunkPlan.LEAF}
+    assert plan.bones <= snapshot_utils.analyze_junk_bones(snapshot).bones
+
+
+def test_constrained_bones_are_not_junk(snapshot):
+    i = snapshot.index["J_Adj_L_FaceEye"]
+    assert "J_Adj_L_FaceEye" in snapshot_utils.find_junk_leaves(snapshot).bones
+    snapshot.constrained[i] = True
+    assert "J_Adj_L_FaceEye" not in snapshot_utils.find_junk_leaves(snapshot).bones
+    assert "J_Adj_L_FaceEye" not in snapshot_utils.analyze_junk_bones(snapshot).bones
+
+
+def _strand_snapshot():
+    '''Root with two leaf strands hanging along -Z, tails pointing +Y'''
+    return ArmatureSnapshot(
+        ["Root", "Hair01", "Hair02"], [-1, 0, 0],
+        np.zeros((3, 3)), np.array([[0, 0, 1], [0, 1, 0], [0, 1, 0]], dtype=float), [False] * 3,
+    )
+
+
+def test_plan_leaf_tails_rolls_flat_strands():
+    snapshot = _strand_snapshot()
+    sums = np.array([0.0, 1.0, 1.0])
+    centroids = np.array([[0, 0, 0], [0, 0, -0.5], [0, 0, -0.5]], dtype=float)
+    # Hair01 is a card wide along X, Hair02 is about as thick as wide
+    covariances = np.array([
+        np.zeros((3, 3)), np.diag([0.01, 1e-6, 0.08]), np.diag([0.01, 0.01, 0.08]),
+    ])
+    plan = snapshot_utils.plan_leaf_tails(snapshot, sums, centroids, covariances)
+    for i in (1, 2):
+        direction = plan.tails[i] - plan.heads[i]
+        np.testing.assert_allclose(direction / np.linalg.norm(direction), [0, 0, -1], atol=1e-9)
+    # Z of the card faces away from it, X runs across along the width
+    np.testing.assert_allclose(np.abs(plan.roll_axes[1]), [0, 1, 0], atol=1e-9)
+    assert plan.roll_axes[2] is None
+    assert 0 not in plan.roll_axes
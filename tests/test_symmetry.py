@@ -0,0 +1,72 @@
+import importlib
+
+import numpy as np
+
+from conftest import ADDON, snapshot_utils
+
+symmetry = importlib.import_module(f"{ADDON}.utils.symmetry")
+
+MIRROR = symmetry.MIRROR
+
+
+def _symmetric_snapshot():
+    '''Hips with mirrored legs, the right arm differs from the left one'''
+    names = ["Hips", "Leg_L", "Foot_L", "Leg_R", "Foot_R", "Arm_L", "Arm_R", "Tail_R"]
+    parents = [-1, 0, 1, 0, 3, 0, 0, 0]
+    heads = np.array([
+        (0, 0, 1), (0.1, 0, 1), (0.1, 0, 0.5), (-0.1, 0, 1), (-0.1, 0, 0.5),
+        (0.2, 0, 1.4), (-0.2, 0, 1.4), (0, 0.1, 1),
+    ], dtype=float)
+    tails = heads + (0, 0, -0.5)
+    tails[6] = (-0.3, 0, 1.4)
+    return snapshot_utils.ArmatureSnapshot(names, parents, heads, tails, [False, False, True, False, True, False, False, False])
+
+
+def test_side_and_mirror_name():
+    assert symmetry.side("Hand_L") == "L"
+    assert symmetry.side("Hand_R.001") == "R"
+    assert symmetry.side("Hips") is None
+    assert symmetry.mirror_name("Hand_L") == "Hand_R"
+    assert symmetry.mirror_name("Hand_R.001") == "Hand_L.001"
+    assert symmetry.mirror_name("Hips") == "Hips"
+
+
+def test_mirror_map_pairs_mirrored_subtrees():
+    snapshot = _symmetric_snapshot()
+    mirror = symmetry.MirrorMap(snapshot)
+    index = snapshot.index
+    assert mirror.twins == {index["Leg_R"]: index["Leg_L"], index["Foot_R"]: index["Foot_L"]}
+    assert mirror.sources == {index["Leg_L"]: index["Leg_R"], index["Foot_L"]: index["Foot_R"]}
+    assert sorted(mirror.unmatched) == ["Arm_R", "Tail_R"]
+    assert len(mirror) == 2
+    assert mirror.is_mirrored(index["Foot_R"]) and not mirror.is_mirrored(index["Foot_L"])
+
+
+def test_mirror_map_needs_whole_subtree():
+    snapshot = _symmetric_snapshot()
+    snapshot.heads[snapshot.index["Foot_R"]] += (0, 0.01, 0)
+    mirror = symmetry.MirrorMap(snapshot)
+    # A differing child keeps its parent from being mirrored too
+    assert mirror.twins == {}
+    assert {"Leg_R", "Foot_R"} <= set(mirror.unmatched)
+    assert symmetry.MirrorMap(snapshot, tolerance=0.1).twins
+
+
+def test_mirror_map_compares_flags():
+    snapshot = _symmetric_snapshot()
+    snapshot.weighted[snapshot.index["Foot_L"]] = True
+    assert symmetry.MirrorMap(snapshot).twins == {}
+
+
+def test_mirror_values():
+    values = {"min_y": -0.5, "max_y": 1.0, "max_z": 0.25, "min_x": -1.0, "subtarget": "Hand_L", "pole_angle": 0.5}
+    mirrored = symmetry.mirror_values(values)
+    assert mirrored == {
+        "min_y": -1.0, "max_y": 0.5, "min_z": -0.25, "max_z": 0.0,
+        "min_x": -1.0, "subtarget": "Hand_R", "pole_angle": 0.5,
+    }
+    assert values["subtarget"] == "Hand_L"
+    # Mirroring twice gets the original limits back
+    assert symmetry.mirror_values(symmetry.mirror_values({"ik_min_z": -0.2, "ik_max_z": 0.7})) == {
+        "ik_min_z": -0.2, "ik_max_z": 0.7,
+    }
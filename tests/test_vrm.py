@@ -0,0 +1,115 @@
+import importlib
+import json
+import os
+import struct
+
+import pytest
+
+from conftest import ADDON
+
+vrm = importlib.import_module(f"{ADDON}.utils.vrm")
+
+NODES = [{"name": name} for name in (
+    "J_Bip_C_Hips", "J_Bip_L_UpperArm", "J_Bip_R_Thumb1", "J_Bip_L_Index3", "J_Bip_L_ToeBase",
+)] + [{}]
+
+
+def vrm0_gltf():
+    return {"nodes": NODES, "extensions": {"VRM": {"humanoid": {"humanBones": [
+        {"bone": "hips", "node": 0},
+        {"bone": "leftUpperArm", "node": 1},
+        {"bone": "rightThumbProximal", "node": 2},
+        {"bone": "leftIndexDistal", "node": 3},
+        {"bone": "leftToes", "node": 4},
+        {"bone": "spine", "node": 5},
+        {"bone": "neck", "node": 99},
+        {"bone": "head"},
+    ]}}}}
+
+
+def vrm1_gltf():
+    return {"nodes": NODES, "extensions": {"VRMC_vrm": {"humanoid": {"humanBones": {
+        "hips": {"node": 0},
+        "leftUpperArm": {"node": 1},
+        "rightThumbMetacarpal": {"node": 2},
+        "leftIndexDistal": {"node": 3},
+        "leftToes": {"node": 4},
+        "head": {},
+    }}}}}
+
+
+@pytest.mark.parametrize("humanoid, version, name", [
+    ("hips", 0, "Hips"),
+    ("leftUpperArm", 0, "UpperArm_L"),
+    ("rightLowerLeg", 1, "LowerLeg_R"),
+    ("leftToes", 0, "ToeBase_L"),
+    ("rightEye", 1, "FaceEye_R"),
+    ("leftThumbProximal", 0, "Thumb1_L"),
+    ("leftThumbProximal", 1, "Thumb2_L"),
+    ("rightThumbMetacarpal", 1, "Thumb1_R"),
+    ("leftIndexProximal", 1, "Index1_L"),
+    ("rightLittleIntermediate", 0, "Little2_R"),
+    ("leftRingDistal", 1, "Ring3_L"),
+])
+def test_humanoid_to_bone_name(humanoid, version, name):
+    assert vrm.humanoid_to_bone_name(humanoid, version) == name
+
+
+@pytest.mark.parametrize("gltf", [vrm0_gltf(), vrm1_gltf()], ids=["vrm0", "vrm1"])
+def test_name_table_from_gltf(gltf):
+    # Bones without nodes, or nodes without names, are left out
+    assert vrm.name_table_from_gltf(gltf) == {
+        "J_Bip_C_Hips": "Hips",
+        "J_Bip_L_UpperArm": "UpperArm_L",
+        "J_Bip_R_Thumb1": "Thumb1_R",
+        "J_Bip_L_Index3": "Index3_L",
+        "J_Bip_L_ToeBase": "ToeBase_L",
+    }
+
+
+def test_name_table_from_gltf_without_humanoid():
+    assert vrm.name_table_from_gltf({"nodes": NODES}) == {}
+    assert vrm.humanoid_nodes({}) == (dict(), None)
+
+
+def write_vrm(path, gltf):
+    '''Write gltf as the JSON chunk of a .vrm file without binary data'''
+    chunk = json.dumps(gltf).encode()
+    chunk += b" " * (-len(chunk) % 4)
+    header = struct.pack("<4sII", vrm.GLB_MAGIC, 2, 20 + len(chunk))
+    with open(path, "wb") as f:
+        f.write(header + struct.pack("<II", len(chunk), vrm.CHUNK_JSON) + chunk)
+
+
+def test_load_name_table_reads_glb_and_gltf(tmp_path):
+    glb_path, gltf_path = tmp_path / "model.vrm", tmp_path / "model.gltf"
+    write_vrm(glb_path, vrm1_gltf())
+    gltf_path.write_text(json.dumps(vrm0_gltf()))
+    assert vrm.load_name_table(str(glb_path)) == vrm.load_name_table(str(gltf_path))
+
+
+def test_load_name_table_rereads_changed_files(tmp_path):
+    path = tmp_path / "model.vrm"
+    write_vrm(path, vrm0_gltf())
+    table = vrm.load_name_table(str(path))
+    assert vrm.load_name_table(str(path)) is table
+
+    gltf = vrm0_gltf()
+    gltf["extensions"]["VRM"]["humanoid"]["humanBones"][0]["bone"] = "spine"
+    write_vrm(path, gltf)
+    stat = os.stat(path)
+    # Same size, a later mtime tells the cache the file changed
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    changed = vrm.load_name_table(str(path))
+    assert changed is not table
+    assert changed["J_Bip_C_Hips"] == "Spine"
+
+
+def test_name_table_or_none_reports_bad_files(tmp_path):
+    reports = []
+    path = tmp_path / "broken.vrm"
+    path.write_bytes(vrm.GLB_MAGIC + struct.pack("<IIII", 2, 28, 8, 0) + b"\0" * 8)
+    assert vrm.name_table_or_none("") is None
+    assert vrm.name_table_or_none(str(path), lambda *args: reports.append(args)) is None
+    assert vrm.name_table_or_none(str(tmp_path / "missing.vrm"), lambda *args: reports.append(args)) is None
+    assert [kind for kind, _ in reports] == [{'WARNING'}, {'WARNING'}]
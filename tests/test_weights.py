@@ -0,0 +1,137 @@
+import importlib
+
+import numpy as np
+import pytest
+
+from conftest import ADDON, addon, build_rig, bpy, weights_utils
+
+pipeline = importlib.import_module(f"{ADDON}.utils.pipeline")
+
+
+def make_mesh(name, groups, co=None):
+    '''Mesh object with one vertex per row of groups, a {group name: weight} dict each'''
+    co = np.zeros((len(groups), 3)) if co is None else np.asarray(co, dtype=float)
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(groups))
+    mesh.vertices.foreach_set("co", co.ravel())
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    for vertex, weights in enumerate(groups):
+        for group, weight in weights.items():
+            vg = obj.vertex_groups.get(group) or obj.vertex_groups.new(name=group)
+            vg.add([vertex], weight, 'REPLACE')
+    return obj
+
+
+def weights_of(obj):
+    '''{group name: weight} of every vertex'''
+    names = [vg.name for vg in obj.vertex_groups]
+    return [
+        {names[g.group]: pytest.approx(g.weight, abs=1e-6) for g in v.groups if g.weight > 0}
+        for v in obj.data.vertices
+    ]
+
+
+@pytest.fixture
+def empty_file():
+    bpy.ops.wm.read_homefile(use_empty=True)
+
+
+def test_merge_weights_adds_and_renormalizes(empty_file):
+    obj = make_mesh("Mesh", [
+        {"A": 0.5, "B": 0.25, "Other": 0.25},
+        {"B": 1.0},
+        {"C": 1.0},
+    ])
+    affected = weights_utils.merge_weights(obj, {"B": "A", "Missing": "A"}, deform_names={"A", "C"})
+    assert affected == 2
+    # Source groups stay for the caller, the merged weight renormalizes over deform groups
+    assert weights_of(obj) == [
+        {"A": 1.0, "B": 0.25, "Other": 0.25},
+        {"A": 1.0, "B": 1.0},
+        {"C": 1.0},
+    ]
+
+
+def test_merge_weights_creates_missing_targets(empty_file):
+    obj = make_mesh("Mesh", [{"A": 0.5}, {"C": 1.0}])
+    assert weights_utils.merge_weights(obj, {"A": "New"}) == 1
+    assert weights_of(obj) == [{"A": 0.5, "New": 0.5}, {"C": 1.0}]
+    assert weights_utils.merge_weights(obj, {"Missing": "C"}) == 0
+
+
+def test_limit_influences(empty_file):
+    obj = make_mesh("Mesh", [
+        {"A": 0.4, "B": 0.3, "C": 0.2, "D": 0.1},
+        {"A": 0.995, "B": 0.005},
+        {"A": 0.004, "B": 0.002},
+        {"A": 0.5, "B": 0.3, "Other": 0.2},
+    ])
+    removed = weights_utils.limit_influences(obj, max_influences=2, threshold=0.01, deform_names={"A", "B", "C", "D"})
+    assert removed == 4
+    assert weights_of(obj) == [
+        {"A": 0.4 / 0.7, "B": 0.3 / 0.7},
+        {"A": 1.0},
+        # A vertex always keeps its strongest weight
+        {"A": 1.0},
+        # Groups that don't deform are neither counted nor touched
+        {"A": 0.5 / 0.8, "B": 0.3 / 0.8, "Other": 0.2},
+    ]
+    assert weights_utils.limit_influences(obj, max_influences=2, threshold=0.01) == 1
+
+
+def test_reassign_orphans_weights_nearest_bones(empty_file):
+    segments = weights_utils.BoneSegments(["Low", "High"], [(0, 0, 0), (0, 0, 1)], [(0, 0, 1), (0, 0, 2)])
+    obj = make_mesh(
+        "Mesh", [{"Low": 1.0}, {}, {"Other": 1.0}, {}],
+        co=[(0, 0, 0.5), (0.1, 0, 0.2), (0.1, 0, 1.8), (0.1, 0, 1.8)],
+    )
+    reassigned = weights_utils.reassign_orphans(obj, segments, np.eye(4))
+    assert reassigned == 3
+    assert weights_of(obj) == [{"Low": 1.0}, {"Low": 1.0}, {"Other": 1.0, "High": 1.0}, {"High": 1.0}]
+    assert weights_utils.reassign_orphans(obj, segments, np.eye(4)) == 0
+
+
+def test_reassign_orphans_shares_between_neighbors(empty_file):
+    segments = weights_utils.BoneSegments(["Left", "Right"], [(-1, 0, 0), (1, 0, 0)], [(-1, 0, 1), (1, 0, 1)])
+    obj = make_mesh("Mesh", [{}], co=[(0, 0, 0.5)])
+    # The matrix moves the vertex to armature space before the lookup
+    matrix = np.eye(4)
+    matrix[0, 3] = 0.5
+    assert weights_utils.reassign_orphans(obj, segments, matrix, neighbors=2) == 1
+    names = [vg.name for vg in obj.vertex_groups]
+    weights = {names[g.group]: g.weight for g in obj.data.vertices[0].groups}
+    assert set(weights) == {"Left", "Right"}
+    assert weights["Right"] > weights["Left"]
+    assert sum(weights.values()) == pytest.approx(1.0, abs=1 / 256)
+
+
+def _junk_bone(rig):
+    '''A bone inside a chain that no mesh is weighted to'''
+    index = weights_utils.build_weight_index(rig)
+    return next(
+        b.name for b in rig.data.edit_bones
+        if b.name.startswith("J_Sec_") and b.children and not index.has_effect(b.name)
+    )
+
+
+def test_cleanup_sees_meshes_of_a_reloaded_file():
+    # Scripts load files without the handlers that reset cached weights and deformed meshes
+    addon.unregister()
+    try:
+        rig = build_rig()
+        junk = _junk_bone(rig)
+        pipeline.run_setup(('cleanup',))
+        assert junk not in rig.data.edit_bones
+
+        # Same rig again, now a mesh holds the bone
+        rig = build_rig()
+        bpy.ops.object.mode_set(mode='OBJECT')
+        hair = make_mesh("Hair002", [{junk: 1.0}])
+        hair.parent = rig
+        hair.modifiers.new("Armature", 'ARMATURE').object = rig
+        bpy.ops.object.mode_set(mode='EDIT')
+        pipeline.run_setup(('cleanup',))
+        assert junk in rig.data.edit_bones
+    finally:
+        addon.register()
@@ -1,5 +1,7 @@
 import bpy
 
+from ..utils.profiling import last_profile
+
 class VRoidBonesPanel(bpy.types.Panel):
     bl_idname = "OBJECT_PT_vroid_panel"
     bl_label = "VRoid Bones"
@@ -8,7 +10,44 @@ class VRoidBonesPanel(bpy.types.Panel):
     #bl_context = "armature_edit"
 
     def draw(self, context):
+        settings = context.scene.vroid_settings
         big_box = self.layout.box()
+        big_box.prop(settings, 'all_selected')
         big_box.operator('bones.vroid_fix')
+        big_box.operator('bones.vroid_fix', text="Preview Fix").dry_run = True
+        big_box.operator('bones.vroid_fix_modal')
         big_box.operator('bones.vroid_ik')
-        big_box.operator('bones.vroid_cleanup')
\ No newline at end of file
+        big_box.operator('bones.vroid_bake_ik')
+        big_box.operator('bones.vroid_cleanup')
+        big_box.operator('bones.vroid_cleanup_modal')
+        big_box.operator('bones.vroid_prune')
+        big_box.operator('bones.vroid_decimate')
+
+        setup_box = self.layout.box()
+        props = (
+            'vrm_file', 'rename_bones', 'bone_chains', 'leaf_tails', 'cleanup',
+            'reassign_orphans', 'orphan_neighbors',
+            'limit_influences', 'max_influences', 'weight_threshold',
+            'ik', 'finger_constraints', 'rotation_limits', 'constraint_preset', 'symmetry', 'incremental',
+        )
+        for prop in props:
+            setup_box.prop(settings, prop)
+        setup_box.operator('bones.vroid_full_setup')
+        self.layout.prop(settings, 'log_file')
+
+        profile = last_profile(context.active_object)
+        if profile:
+            self.draw_profile(profile)
+
+    def draw_profile(self, profile):
+        box = self.layout.box()
+        box.label(text=f"Last run: {profile['name']} {profile['time']:.2f}s")
+        for stage in profile['stages']:
+            col = box.column(align=True)
+            col.label(text=f"{stage['name']}: {stage['time'] * 1000:.1f} ms")
+            counters = (
+                f"{stage['bones_visited']} bones, {stage['vertices_scanned']} verts "
+                f"({stage.get('meshes_cached', 0)} meshes cached), "
+                f"{stage['ops_calls']} ops, {stage['mode_toggles']} toggles"
+            )
+            col.label(text=counters, icon='BLANK1')
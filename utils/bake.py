@@ -0,0 +1,333 @@
+'''Bake IK chains set up by setup_ik into FK rotation keys.
+
+Every frame is evaluated once for all armatures, pose matrices of chain
+bones are copied into preallocated arrays with one foreach_get per
+armature, rotations are solved for all frames at once and keys are
+written per F-curve in bulk.
+'''
+from contextlib import contextmanager
+
+import numpy as np
+
+import bpy
+from mathutils import Matrix
+
+from . import profiling
+from .constraint_spec import default_preset
+from .constraints import PoseBoneResolver
+from .objects import get_deformed
+
+ROTATION_PATHS = {'QUATERNION': "rotation_quaternion", 'AXIS_ANGLE': "rotation_axis_angle"}
+
+
+class BakePlan:
+    '''Bones moved by an armature's IK chains and constraints acting on them.
+
+    Bones are listed owner first, then up the chain. Keys baked from the
+    evaluated pose already hold the effect of every constraint of these
+    bones, rotation limits included.
+    '''
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.bones = []
+        self.chains = 0
+        self.constraints = []
+
+    def __bool__(self):
+        return bool(self.bones)
+
+
+class BakeResult:
+    '''What baking one armature did'''
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.frames = 0
+        self.keys = 0
+        self.muted = 0
+
+    def summary(self):
+        if not self.plan:
+            return "No IK chains to bake, setup IK or unmute it first"
+        text = (
+            f"Baked {len(self.plan.bones)} bones of {self.plan.chains} IK chains "
+            f"over {self.frames} frames, {self.keys} keys written"
+        )
+        if self.muted:
+            text += f", {self.muted} constraints muted"
+        return text
+
+
+def plan_bake(armature, preset=None) -> BakePlan:
+    '''Chains of IK constraints setup_ik added, chain_count is taken from the preset.
+
+    Bones whose IK constraint was removed or is muted already are left out.
+    '''
+    preset = preset or default_preset()
+    plan = BakePlan(PoseBoneResolver(armature))
+    baked = set()
+    for bone_name, spec in preset.specs['ik'].items():
+        pose_bone = plan.resolver.get(bone_name)
+        if pose_bone is None:
+            continue
+        if not any(c.type == 'IK' and not c.mute for c in pose_bone.constraints):
+            continue
+        plan.chains += 1
+        chain_count = spec.constraints['IK']['chain_count']
+        depth = 0
+        # chain_count 0 means the whole way up to the root
+        while pose_bone is not None and (chain_count == 0 or depth < chain_count):
+            if pose_bone.name not in baked:
+                baked.add(pose_bone.name)
+                plan.bones.append(pose_bone.name)
+            pose_bone = pose_bone.parent
+            depth += 1
+    pose_bones = armature.pose.bones
+    plan.constraints = [c for name in plan.bones for c in pose_bones[name].constraints if not c.mute]
+    return plan
+
+
+class PoseSampler:
+    '''Pose matrices of some bones of an armature and of their parents, frame by frame.'''
+
+    def __init__(self, armature, names, frame_count):
+        pose_bones = armature.pose.bones
+        index = {b.name: i for i, b in enumerate(pose_bones)}
+        self.armature = armature
+        self.names = list(names)
+        parents = [pose_bones[name].parent for name in self.names]
+        self.rows = np.array([index[name] for name in self.names], dtype=np.int64)
+        self.parent_rows = np.array([index[p.name] if p else -1 for p in parents], dtype=np.int64)
+        self._buffer = np.empty(len(pose_bones) * 16, dtype=np.float32)
+        self.pose = np.empty((frame_count, len(self.names), 4, 4), dtype=np.float32)
+        self.parent_pose = np.empty_like(self.pose)
+
+    def read(self, frame):
+        '''Store matrices of the evaluated pose as frame'''
+        self.armature.pose.bones.foreach_get("matrix", self._buffer)
+        # foreach_get gives matrices column by column
+        matrices = self._buffer.reshape(-1, 4, 4).transpose(0, 2, 1)
+        self.pose[frame] = matrices[self.rows]
+        self.parent_pose[frame] = matrices[self.parent_rows]
+
+    def basis_rotations(self):
+        '''Rotation part of every bone's matrix_basis per frame, (frames, bones, 3, 3).
+
+        Bones are taken to inherit rotation and scale of their parents,
+        as imported VRoid bones do.
+        '''
+        bones = self.armature.data.bones
+        rest = np.array([np.array(bones[name].matrix_local) for name in self.names])
+        has_parent = self.parent_rows >= 0
+        parent_rest = np.array([
+            np.array(bones[name].parent.matrix_local) if bones[name].parent else np.identity(4)
+            for name in self.names
+        ])
+        parent_pose = np.where(has_parent[None, :, None, None], self.parent_pose, np.identity(4))
+        # pose = parent pose @ (parent rest^-1 @ rest) @ basis
+        to_basis = np.linalg.inv(rest) @ parent_rest
+        basis = to_basis[None] @ np.linalg.inv(parent_pose) @ self.pose
+        rotations = basis[..., :3, :3]
+        return rotations / np.linalg.norm(rotations, axis=-2, keepdims=True)
+
+
+def matrix_to_quaternion(m):
+    '''Unit quaternions (w, x, y, z) of rotation matrices (..., 3, 3)'''
+    m00, m11, m22 = m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]
+    squares = np.stack([
+        1 + m00 + m11 + m22,
+        1 + m00 - m11 - m22,
+        1 - m00 + m11 - m22,
+        1 - m00 - m11 + m22,
+    ], axis=-1) / 4
+    w_x = m[..., 2, 1] - m[..., 1, 2]
+    w_y = m[..., 0, 2] - m[..., 2, 0]
+    w_z = m[..., 1, 0] - m[..., 0, 1]
+    x_y = m[..., 0, 1] + m[..., 1, 0]
+    x_z = m[..., 0, 2] + m[..., 2, 0]
+    y_z = m[..., 1, 2] + m[..., 2, 1]
+    # Off diagonal sums are 4 times products of two components, divide by the largest one
+    products = np.stack([
+        np.stack([4 * squares[..., 0], w_x, w_y, w_z], axis=-1),
+        np.stack([w_x, 4 * squares[..., 1], x_y, x_z], axis=-1),
+        np.stack([w_y, x_y, 4 * squares[..., 2], y_z], axis=-1),
+        np.stack([w_z, x_z, y_z, 4 * squares[..., 3]], axis=-1),
+    ], axis=-2)
+    largest = np.argmax(squares, axis=-1)
+    row = np.take_along_axis(products, largest[..., None, None], axis=-2)[..., 0, :]
+    q = row / (4 * np.sqrt(np.take_along_axis(squares, largest[..., None], axis=-1)))
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def rotation_channels(rotations, mode):
+    '''Values of rotation channels of a bone with given rotation_mode, rotations is (frames, 3, 3).
+
+    Quaternions are flipped where needed so consecutive frames stay on one
+    side and keys interpolate the short way.
+    '''
+    if mode in ROTATION_PATHS:
+        q = matrix_to_quaternion(rotations)
+        dots = np.sum(q[1:] * q[:-1], axis=-1)
+        q[1:] *= np.cumprod(np.where(dots < 0, -1.0, 1.0))[:, None]
+        if mode == 'QUATERNION':
+            return q
+        half_angles = np.arccos(np.clip(q[:, 0], -1.0, 1.0))
+        sines = np.sin(half_angles)
+        axes = np.where(sines[:, None] > 1e-8, q[:, 1:] / np.where(sines > 1e-8, sines, 1.0)[:, None], (0.0, 1.0, 0.0))
+        return np.column_stack([2 * half_angles, axes])
+    values = np.empty((len(rotations), 3))
+    previous = None
+    for frame, rotation in enumerate(rotations.tolist()):
+        euler = Matrix(rotation).to_euler(mode, previous) if previous else Matrix(rotation).to_euler(mode)
+        values[frame] = euler
+        previous = euler
+    return values
+
+
+def decimate_keys(frames, values, tolerance):
+    '''Mask of keys to keep so linear interpolation between them stays within tolerance.
+
+    values is (frames, channels), channels of one bone keep the same keys.
+    Splits at the worst key until every span fits (Ramer-Douglas-Peucker).
+    '''
+    keep = np.zeros(len(frames), dtype=bool)
+    keep[[0, -1]] = True
+    spans = [(0, len(frames) - 1)]
+    while spans:
+        start, end = spans.pop()
+        if end - start < 2:
+            continue
+        t = (frames[start + 1:end] - frames[start]) / (frames[end] - frames[start])
+        line = values[start] + (values[end] - values[start]) * t[:, None]
+        error = np.abs(values[start + 1:end] - line).max(axis=1)
+        worst = int(np.argmax(error))
+        if error[worst] > tolerance:
+            middle = start + 1 + worst
+            keep[middle] = True
+            spans += [(start, middle), (middle, end)]
+    return keep
+
+
+def ensure_action(armature):
+    animation_data = armature.animation_data or armature.animation_data_create()
+    if animation_data.action is None:
+        animation_data.action = bpy.data.actions.new(f"{armature.name}Action")
+    return animation_data.action
+
+
+def ensure_fcurve(action, armature, data_path, index, group):
+    if hasattr(action, "fcurve_ensure_for_datablock"):
+        # Layered actions of Blender 4.4 and newer keep curves per slot
+        return action.fcurve_ensure_for_datablock(armature, data_path, index=index, group_name=group)
+    fcurve = action.fcurves.find(data_path, index=index)
+    return fcurve or action.fcurves.new(data_path, index=index, action_group=group)
+
+
+def set_keys(fcurve, frames, values):
+    '''Replace keys of fcurve in the range of frames with linear keys, written in bulk.
+
+    Keys outside the range keep their values and interpolation, their
+    handles are recalculated.
+    '''
+    points = fcurve.keyframe_points
+    linear = bpy.types.Keyframe.bl_rna.properties['interpolation'].enum_items['LINEAR'].value
+    co = np.empty(len(points) * 2, dtype=np.float32)
+    points.foreach_get("co", co)
+    interpolation = np.empty(len(points), dtype=np.int32)
+    points.foreach_get("interpolation", interpolation)
+    co = co.reshape(-1, 2)
+    outside = (co[:, 0] < frames[0]) | (co[:, 0] > frames[-1])
+
+    co = np.concatenate([co[outside], np.column_stack([frames, values])])
+    interpolation = np.concatenate([interpolation[outside], np.full(len(frames), linear, dtype=np.int32)])
+    order = np.argsort(co[:, 0], kind="stable")
+    points.clear()
+    points.add(len(co))
+    points.foreach_set("co", co[order].astype(np.float32).ravel())
+    points.foreach_set("interpolation", interpolation[order])
+    fcurve.update()
+
+
+def write_rotation_keys(armature, names, frames, rotations, tolerance=None) -> int:
+    '''Key basis rotations (frames, bones, 3, 3) of named bones in their rotation modes.
+
+    With tolerance, keys that linear interpolation reproduces are dropped.
+    Returns number of keys written.
+    '''
+    action = ensure_action(armature)
+    keys = 0
+    for i, name in enumerate(names):
+        pose_bone = armature.pose.bones[name]
+        values = rotation_channels(rotations[:, i], pose_bone.rotation_mode)
+        keep = decimate_keys(frames, values, tolerance) if tolerance is not None else np.ones(len(frames), dtype=bool)
+        data_path = pose_bone.path_from_id(ROTATION_PATHS.get(pose_bone.rotation_mode, "rotation_euler"))
+        for channel in range(values.shape[1]):
+            fcurve = ensure_fcurve(action, armature, data_path, channel, name)
+            set_keys(fcurve, frames[keep], values[keep, channel])
+        keys += int(keep.sum()) * values.shape[1]
+    return keys
+
+
+@contextmanager
+def deform_disabled(armatures):
+    '''Turn off Armature modifiers bound to armatures in the viewport for the block.
+
+    Frames evaluate much faster without deforming meshes, constraints
+    targeting deformed meshes see them in rest pose meanwhile.
+    '''
+    modifiers = [
+        modifier
+        for armature in armatures
+        for obj in get_deformed(armature)
+        for modifier in getattr(obj, 'modifiers', ())
+        if modifier.type == 'ARMATURE' and modifier.object == armature and modifier.show_viewport
+    ]
+    for modifier in modifiers:
+        modifier.show_viewport = False
+    try:
+        yield modifiers
+    finally:
+        for modifier in modifiers:
+            modifier.show_viewport = True
+
+
+def bake_ik_chains(armatures, frames, preset=None, tolerance=None, mute=True) -> dict:
+    '''Bake IK chains of armatures into FK rotation keys of the active actions.
+
+    Every frame is evaluated once for all armatures. tolerance enables
+    decimate_keys, mute mutes constraints of baked bones, IK and rotation
+    limits alike, so playback uses the keys as they are. Returns a
+    BakeResult per armature name.
+    '''
+    scene = bpy.context.scene
+    frames = np.array(frames, dtype=np.float64)
+    results = dict()
+    samplers = []
+    with profiling.stage("plan"):
+        for armature in armatures:
+            plan = plan_bake(armature, preset)
+            results[armature.name] = BakeResult(plan)
+            if plan:
+                samplers.append(PoseSampler(armature, plan.bones, len(frames)))
+    if not samplers or not len(frames):
+        return results
+
+    frame_current, subframe = scene.frame_current, scene.frame_subframe
+    with profiling.stage("evaluate"), deform_disabled([sampler.armature for sampler in samplers]):
+        for i, frame in enumerate(frames.astype(np.int64).tolist()):
+            scene.frame_set(frame)
+            for sampler in samplers:
+                sampler.read(i)
+
+    with profiling.stage("write"):
+        for sampler in samplers:
+            result = results[sampler.armature.name]
+            result.frames = len(frames)
+            result.keys = write_rotation_keys(sampler.armature, sampler.names, frames, sampler.basis_rotations(), tolerance)
+            if mute:
+                for constraint in result.plan.constraints:
+                    constraint.mute = True
+                result.muted = len(result.plan.constraints)
+    scene.frame_set(frame_current, subframe=subframe)
+    return results
@@ -1,207 +1,211 @@
-import re
-from functools import lru_cache
+import numpy as np
 
 import bpy
-from mathutils import Vector
-from .objects import get_children
-
-
-def bone_has_effect(bone):
-    '''Check if bone has vertex groups attached to it'''
-    armature = bpy.context.object
-    children = get_children(armature)
-    for obj in children:
-        if not hasattr(obj, 'vertex_groups'):
-            continue
-        vg = obj.vertex_groups.get(bone.name)
-        if vg is None:
-            continue
-        # Check if any vertex has non-zero weight for this group
-        for vertex in obj.data.vertices:
-            for group in vertex.groups:
-                if group.group == vg.index and group.weight > 0.001:
-                    return True
-    return False
-
-
-
-def is_junk_bone(bone):
-    """Check if a bone is useless."""
-    return not bone.constraints and not bone_has_effect(bone)
-
-def get_junk_bone_chain(bone) -> list:
-    """Recursively collect bones in a chain if all are junk."""
-    im_junk = is_junk_bone(bone)
-    if not bone.children:
-        return [bone] if im_junk else []
-
-    collected_junk = []
-    all_children_junk = True
-    for child in bone.children:
-        child_junk = get_junk_bone_chain(child)
-        collected_junk.extend(child_junk)
-        if not child_junk:  # If any child isn't junk
-            all_children_junk = False
-
-    if im_junk and all_children_junk:
-        collected_junk.append(bone)
-
-    return collected_junk
-
-
-def delete_bones_and_cleanup(bone_names):
-    """Delete selected bones and clean up vertex groups."""
+from . import profiling
+from .snapshot import (
+    ArmatureSnapshot,
+    ChainPlan,
+    DecimatePlan,
+    JunkPlan,
+    PrunePlan,
+    analyze_junk_bones,
+    find_junk_leaves,
+    plan_bones_chains,
+    plan_decimation,
+    plan_fix,
+    plan_leaf_tails,
+    plan_prune,
+    plan_renames,
+)
+from .objects import get_deformed
+from .symmetry import MirrorMap
+from .vertex_groups import update_vertex_groups
+from .weights import build_weight_index, clear_cache_if_reloaded, merge_weights, weight_moments
+
+
+def capture_snapshot(weights=None) -> ArmatureSnapshot:
+    '''Snapshot edit bones of active armature, weights is an optional WeightIndex'''
+    return ArmatureSnapshot.capture(bpy.context.object, weights)
+
+
+def capture_mirror(snapshot, symmetry=False):
+    '''MirrorMap of snapshot in symmetry mode, None otherwise'''
+    if not symmetry:
+        return None
+    mirror = MirrorMap(snapshot)
+    profiling.count("bones_mirrored", len(mirror))
+    return mirror
+
+
+def remove_junk_bones(symmetry=False) -> JunkPlan:
+    '''Delete every bone whose whole subtree is junk.
+
+    In symmetry mode mirrored right side bones follow their left twins.
+    '''
+    weights = build_weight_index(bpy.context.object)
+    snapshot = capture_snapshot(weights)
+    plan = analyze_junk_bones(snapshot, capture_mirror(snapshot, symmetry))
+    delete_bones_and_cleanup(plan.bones, weights)
+    return plan
+
+
+def delete_bones_and_cleanup(bone_names, weights=None):
+    """Delete selected bones and clean up vertex groups.
+
+    With weights given, empty vertex groups without a bone are purged as well.
+    """
     bpy.ops.armature.select_all(action='DESELECT')
+    profiling.count("ops_calls", 2)
     for name in bone_names:
         bone = bpy.context.active_object.data.edit_bones.get(name)
         if bone:
             bone.select = True
     bpy.ops.armature.delete()
 
-    # Cleanup vertex groups
-    armature = bpy.context.object
-    for obj in get_children(armature):
-        for name in bone_names:
-            vg = obj.vertex_groups.get(name)
-            if vg:
-                obj.vertex_groups.remove(vg)
+    return update_vertex_groups(bpy.context.object, removed=bone_names, weights=weights)
 
-def simplify_symmetrize_names():
-    '''Rename bones to blenders armature symmetry names'''
-    j_sec_regex = re.compile(r"J_Sec_((?P<side>R|L)_)?(?P<name>[a-zA-Z]+)(?P<order>\d{1,2})?_(?P<leaf>end_)?(?P<id>\d{2})")
-    j_bip_regex = re.compile(r"J_Bip_(?P<side>R|L|C)_(?P<name>\w+)")
-    bones = bpy.context.active_object.data.edit_bones
-    n = 1
-    vg_remap = dict()
-    for bone in bones[:]:
-        original_name = bone.name
-        if (rematch := j_sec_regex.match(bone.name)):
-            name = rematch.group('name')
-            id = rematch.group('id')
-            order = rematch.group('order')
-            order = f"_{order}" if order else ""
-            side = rematch.group("side")
-            side = f"_{side}" if side else ""
-            vg_remap[original_name] = bone.name
-
-            bone.name = f'{name}{id}{order}{side}'
-            n += 1
-        elif (rematch := j_bip_regex.match(bone.name)):
-            name = rematch.group('name')
-            side = rematch.group('side')
-            side = f'_{side}' if side != 'C' else ''
-            bone.name = f'{name}{side}'
-            vg_remap[original_name] = bone.name
 
+def rename_bones(renames):
+    '''Rename edit bones and vertex groups of child meshes'''
+    if not renames:
+        return
+    bones = bpy.context.active_object.data.edit_bones
+    for original_name, new_name in renames.items():
+        bones[original_name].name = new_name
 
     # Need to make sure all vertex groups are properly renamed
     # they are not renamed automaticaly all the times for some reason
+    update_vertex_groups(bpy.context.object, renames)
+
+
+def simplify_symmetrize_names(name_table=None):
+    '''Rename bones to blenders armature symmetry names'''
+    renames = plan_renames(capture_snapshot(), name_table)
+    rename_bones(renames)
+    return renames
+
+
+def apply_chains_plan(bones, plan):
+    '''Write planned geometry and connections into edit bones in bulk.
+
+    Edit bones must be in the order the plan's snapshot was captured in.
+    Bones with roll axes are rolled after their tails moved, see ChainPlan.
+    '''
+    if not len(plan.changed()):
+        return
+    # Blender keeps the roll angle, which can flip X and Z of a turned bone
+    old_z = {i: np.array(bones[i].z_axis) for i in plan.roll_axes}
+    bones.foreach_set("head", plan.heads.astype(np.float32).ravel())
+    bones.foreach_set("tail", plan.tails.astype(np.float32).ravel())
+    bones.foreach_set("head_radius", plan.head_radius.astype(np.float32))
+    bones.foreach_set("use_connect", plan.connected)
+    for i, axis in plan.roll_axes.items():
+        if axis is None:
+            axis = old_z[i]
+        elif np.dot(axis, old_z[i]) < 0:
+            axis = -axis
+        # align_roll needs a unit vector
+        bones[i].align_roll(axis / np.linalg.norm(axis))
+
+
+def fix_bones_chains(symmetry=False):
+    '''Put tails of bones in chain to the head of child bone and connect them properly.
+
+    In symmetry mode mirrored right side bones copy their left twins.
+    '''
+    bones = bpy.context.active_object.data.edit_bones
+    snapshot = capture_snapshot()
+    apply_chains_plan(bones, plan_bones_chains(snapshot, capture_mirror(snapshot, symmetry)))
+
+
+def fix_leaf_tails(min_elongation=1.5) -> ChainPlan:
+    '''Orient and size leaf bones after the vertices they deform, see plan_leaf_tails'''
     armature = bpy.context.object
-    children = get_children(armature)
-    for obj in children:
-        vgs = obj.vertex_groups
-        for orig, new in vg_remap.items():
-            group = vgs.get(orig)
-            if group is not None:
-                group.name = new
-
-
-def fix_bones_chains():
-    '''Put tails of bones in chain to the head of child bone and connect them properly.'''
-    # Regex patterns for identifying special bone types
-    finger_last_re = re.compile(r"(?P<finger>Thumb|Index|Middle|Ring|Little)3_(?P<side>R|L)")
-    toe_base_re = re.compile(r"ToeBase_(?P<side>L|R)")
-
-    # Get all bones in current armature
+    snapshot = capture_snapshot()
+    moments = weight_moments(armature, snapshot.names)
+    plan = plan_leaf_tails(snapshot, moments.sums, moments.centroids(), moments.covariances(), min_elongation)
+    apply_chains_plan(armature.data.edit_bones, plan)
+    return plan
+
+
+def clear_leaf_bones(symmetry=False) -> JunkPlan:
+    weights = build_weight_index(bpy.context.object)
+    snapshot = capture_snapshot(weights)
+    plan = find_junk_leaves(snapshot, capture_mirror(snapshot, symmetry))
+    delete_bones_and_cleanup(plan.bones, weights)
+    return plan
+
+
+def preview_fix(name_table=None, symmetry=False):
+    '''What "Fix Armature" would change, without changing anything'''
+    snapshot = capture_snapshot(build_weight_index(bpy.context.object))
+    return plan_fix(snapshot, name_table=name_table, symmetry=symmetry)
+
+
+def prune_bones(mode='THRESHOLD', threshold=0.05, budget=0) -> PrunePlan:
+    '''Delete bones after merging their weights into nearest surviving ancestors.
+
+    THRESHOLD compares bone's max vertex weight, BUDGET ranks bones by
+    their total weight, see plan_prune.
+    '''
+    armature = bpy.context.object
+    weights = build_weight_index(armature)
+    snapshot = capture_snapshot(weights)
+    measure = weights.total if mode == 'BUDGET' else weights.max_weight
+    influence = np.array([measure(name) for name in snapshot.names])
+    plan = plan_prune(snapshot, influence, mode, threshold, budget)
+    if not plan:
+        return plan
+
+    deform_names = set(snapshot.names) - plan.bones
+    for obj in get_deformed(armature):
+        if obj.type == 'MESH' and obj.vertex_groups:
+            merge_weights(obj, plan.targets, deform_names)
+    delete_bones_and_cleanup(plan.bones)
+    return plan
+
+
+def decimate_chains(step=2, length=0) -> DecimatePlan:
+    '''Remove bones from secondary chains, weights go to the kept bone above.
+
+    See plan_decimation for step and length.
+    '''
+    armature = bpy.context.object
+    clear_cache_if_reloaded()
+    snapshot = capture_snapshot()
+    plan = plan_decimation(snapshot, step, length)
+    if not plan:
+        return plan
+
+    # Weights move between bones that both deform, sums stay as they were
+    for obj in get_deformed(armature):
+        if obj.type == 'MESH' and obj.vertex_groups:
+            merge_weights(obj, plan.targets)
+    delete_bones_and_cleanup(plan.bones)
+
+    # Deleting reparents children to the kept bone, now stretch it over the gap
+    bones = armature.data.edit_bones
+    snapshot = capture_snapshot()
+    tails = snapshot.tails.copy()
+    connected = snapshot.connected.copy()
+    for name, tail in plan.tails.items():
+        tails[snapshot.index[name]] = tail
+    for name, connect in plan.connected.items():
+        connected[snapshot.index[name]] = connect
+    bones.foreach_set("tail", tails.astype(np.float32).ravel())
+    bones.foreach_set("use_connect", connected)
+    return plan
+
+
+def restore_bones(snapshot):
+    '''Write geometry and connections captured in snapshot back into edit bones'''
     bones = bpy.context.active_object.data.edit_bones
+    bones.foreach_set("head", snapshot.heads.astype(np.float32).ravel())
+    bones.foreach_set("tail", snapshot.tails.astype(np.float32).ravel())
+    bones.foreach_set("head_radius", snapshot.head_radius.astype(np.float32))
+    bones.foreach_set("use_connect", snapshot.connected)
+
 
-    # List of bone names that should be excluded from automatic connection
-    exceptions = ['Sleeve','Skirt','Bust','FaceEye','HairJoint','Tops','Food','Hood']
-
-    # Mapping of limb bone prefixes to their natural child prefixes
-    limb_hierarchy = {'UpperLeg':'LowerLeg','LowerLeg':'Foot','UpperArm':'LowerArm','LowerArm':'Hand'}
-
-    def _get_target_child(bone):
-        """Determine which child bone should be connected to the current bone."""
-        # Skip processing for Head bone or bones without children
-        if bone.name == "Head" or not bone.children:
-            return None
-
-        # Limb hierarchy handling - find matching child bone based on naming convention
-        for prefix, child_prefix in limb_hierarchy.items():
-            if bone.name.startswith(prefix):
-                for child in bone.children:
-                    if child.name.startswith(child_prefix):
-                        return child
-                return bone.children[0]  # Fallback to first child if no match
-
-        # Default to first child when no special cases apply
-        target = bone.children[0]
-
-        # Handle cases where bone has multiple children
-        if len(bone.children) > 1:
-            for child in bone.children:
-                # Skip children that match exception patterns
-                if not any(ex in child.name for ex in exceptions):
-                    target = child
-                    break
-                # Disconnect any exception bones
-                child.use_connect = False
-        return target
-
-    def _process_bone_chain(bone):
-        """Process an individual bone to connect it to its appropriate child."""
-        target = _get_target_child(bone)
-        if not target:
-            return
-
-        # Move current bone's tail to match target's head position
-        bone.select_tail = True
-        offset = target.head - bone.tail
-        bpy.ops.transform.translate(value=offset)
-        bone.select_tail = False
-
-        # Special handling for root bone - adjust its tail downward
-        if bone.name.lower() == 'root':
-            bone.select_tail = True
-            bpy.ops.transform.translate(value=(0, 0, -bone.length * 0.8))
-            bone.select_tail = False
-            return
-
-        # Establish parent-child connection between bones
-        bones.active = bone
-        target.select = True
-        bpy.ops.armature.parent_set(type='CONNECTED')
-        bpy.ops.armature.select_all(action='DESELECT')
-
-    def _adjust_special_bones():
-        """Apply special adjustments to finger and toe bones."""
-        for bone in bones:
-            # Only process bones with exactly one child
-            if len(bone.children) != 1:
-                continue
-
-            child = bone.children[0]
-            # Adjust finger tip bones to extend in same direction as parent
-            if finger_last_re.match(child.name):
-                direction = (bone.tail - bone.head).normalized()
-                child.tail = child.head + direction * child.length
-            # Adjust toe base bones to extend horizontally from parent
-            elif toe_base_re.match(child.name):
-                direction = ((bone.tail - bone.head) * Vector((1.0, 1.0, 0.0))).normalized()
-                child.tail = child.head + (direction * child.length) / 2
-
-    # Main processing sequence
-    bpy.ops.armature.select_all(action='DESELECT')  # Clear any existing selections
-    for bone in bones:
-        _process_bone_chain(bone)  # Process each bone in the armature
-    _adjust_special_bones()  # Apply special adjustments to finger/toe bones
-
-
-
-def clear_leaf_bones():
-    junk_bones = set()
-    for bone in bpy.context.active_object.data.edit_bones:
-        if not bone.children and is_junk_bone(bone):
-            junk_bones.add(bone.name)
-    delete_bones_and_cleanup(junk_bones)
+def undo_renames(renames):
+    '''Give bones renamed by rename_bones their original names back'''
+    rename_bones({new: old for old, new in reversed(list(renames.items()))})
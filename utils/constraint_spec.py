@@ -0,0 +1,143 @@
+import json
+import os
+from itertools import product
+
+from ..config.ik_config import IK_CONFIG
+from ..config.rotation_limits import ROTATION_LIMITS
+from .symmetry import mirror_specs
+
+FINGERS = ["Thumb", "Index", "Middle", "Ring", "Little"]
+
+# Placeholders resolved per bone when a spec is applied
+SELF = "<self>"
+PARENT = "<parent>"
+
+_presets = dict()
+
+
+class BoneSpec:
+    '''Pose bone properties and constraints (by type) one bone should end up with'''
+
+    def __init__(self):
+        self.properties = dict()
+        self.constraints = dict()
+
+    def as_dict(self):
+        return {'properties': self.properties, 'constraints': self.constraints}
+
+
+def compile_ik(config=IK_CONFIG) -> dict:
+    '''Right side bones missing from config mirror their left twins'''
+    specs = dict()
+    for bone_name, params in config.items():
+        spec = specs.setdefault(bone_name, BoneSpec())
+        spec.constraints["IK"] = {"chain_count": params.get("chain_count", 0)}
+        for axis in "xyz":
+            spec.properties[f"lock_ik_{axis}"] = params.get(f"lock_ik_{axis}", False)
+            spec.properties[f"use_ik_limit_{axis}"] = params.get(f"use_ik_limit_{axis}", False)
+            spec.properties[f"ik_max_{axis}"] = params.get(f"ik_max_{axis}", 3.14159)
+            spec.properties[f"ik_min_{axis}"] = params.get(f"ik_min_{axis}", -3.14159)
+    return mirror_specs(specs)
+
+
+def compile_finger_constraints(fingers=FINGERS) -> dict:
+    '''Finger segments 2 and 3 add rotation of the previous segment'''
+    specs = dict()
+    for finger, num in product(fingers, [2, 3]):
+        spec = specs.setdefault(f"{finger}{num}_L", BoneSpec())
+        spec.constraints["COPY_ROTATION"] = {
+            "target": SELF,
+            "subtarget": PARENT,
+            "mix_mode": "ADD",
+            "target_space": "LOCAL",
+            "owner_space": "LOCAL",
+            "use_y": False,
+            "use_x" if finger == "Thumb" else "use_z": False,
+        }
+    return mirror_specs(specs)
+
+
+def compile_rotation_limits(config=ROTATION_LIMITS) -> dict:
+    '''"<fingers>" entry applies to first segment of every finger but thumb.
+
+    Right side bones missing from config mirror their left twins.
+    '''
+    specs = dict()
+    for bone_name, params in config.items():
+        if bone_name == "<fingers>":
+            names = [f"{finger}1_L" for finger in FINGERS[1:]]
+        else:
+            names = [bone_name]
+        values = {"owner_space": "LOCAL", "use_transform_limit": True}
+        for p_name, p_value in params.items():
+            values[p_name] = p_value
+            values[f"use_limit_{p_name.split('_')[1]}"] = True
+        for name in names:
+            specs.setdefault(name, BoneSpec()).constraints["LIMIT_ROTATION"] = dict(values)
+    return mirror_specs(specs)
+
+
+class ConstraintPreset:
+    '''Compiled bone specs of every constraint stage.
+
+    key identifies where the preset came from, None for the built in one.
+    '''
+
+    def __init__(self, ik=IK_CONFIG, rotation_limits=ROTATION_LIMITS, finger_constraints=True, key=None):
+        self.key = key
+        self.specs = {
+            'ik': compile_ik(ik),
+            'finger_constraints': compile_finger_constraints() if finger_constraints else dict(),
+            'rotation_limits': compile_rotation_limits(rotation_limits),
+        }
+
+
+def default_preset() -> ConstraintPreset:
+    if None not in _presets:
+        _presets[None] = ConstraintPreset()
+    return _presets[None]
+
+
+def load_preset(path) -> ConstraintPreset:
+    '''Constraint preset from a JSON file with "ik", "rotation_limits" and
+    "finger_constraints" keys, missing keys fall back to built in config.
+
+    Presets are compiled once per file and recompiled only when it changes.
+    '''
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _presets.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must contain a JSON object")
+    unknown = set(data) - {'ik', 'rotation_limits', 'finger_constraints'}
+    if unknown:
+        raise ValueError(f"{path} has unknown keys: " + ", ".join(sorted(unknown)))
+    preset = ConstraintPreset(
+        data.get('ik', IK_CONFIG),
+        data.get('rotation_limits', ROTATION_LIMITS),
+        bool(data.get('finger_constraints', True)),
+        key=[key, *version],
+    )
+    _presets[key] = (version, preset)
+    return preset
+
+
+def preset_or_default(path, report=None) -> ConstraintPreset:
+    '''Preset from path, the built in one when path is empty or fails to load.
+
+    report is called as report(type, message) to warn about a failed file,
+    Operator.report fits.
+    '''
+    if not path:
+        return default_preset()
+    try:
+        return load_preset(path)
+    except (OSError, ValueError) as e:
+        if report is not None:
+            report({'WARNING'}, f"Could not load constraint preset {path}, using built in one: {e}")
+        return default_preset()
@@ -1,122 +1,165 @@
-from itertools import product
-
 import bpy
 
-from ..config.ik_config import IK_CONFIG
-from ..config.rotation_limits import ROTATION_LIMITS
+from . import profiling
+from .constraint_spec import PARENT, SELF, default_preset
+
+
+class PoseBoneResolver:
+    '''Index of pose bone names for resolving config names like "UpperArm_L".
+
+    Config names match bones by exact name, by "_Name" suffix or by
+    "_Side_Name" suffix, so both renamed and original VRoid names resolve.
+    '''
+
+    def __init__(self, armature):
+        self.armature = armature
+        self.names = set()
+        self.suffixes = dict()
+        self.missing = []
+        self.ambiguous = dict()
+        profiling.count("bones_visited", len(armature.pose.bones))
+        for bone in armature.pose.bones:
+            self.names.add(bone.name)
+            parts = bone.name.split("_")
+            for i in range(1, len(parts)):
+                self.suffixes.setdefault("_".join(parts[i:]), []).append(bone.name)
+
+    def _find_suffix(self, bone_name, suffix):
+        found = self.suffixes.get(suffix)
+        if not found:
+            return None
+        if len(found) > 1:
+            self.ambiguous[bone_name] = found
+        return found[0]
+
+    def resolve_name(self, bone_name):
+        if bone_name in self.names:
+            return bone_name
+        if "_" not in bone_name:
+            return self._find_suffix(bone_name, bone_name)
+        name, _, side = bone_name.rpartition("_")
+        found = None
+        if side not in {"L", "R"}:
+            found = self._find_suffix(bone_name, name)
+        return self._find_suffix(bone_name, f"{side}_{name}") or found
 
-FINGERS = ["Thumb", "Index", "Middle", "Ring", "Little"]
+    def get(self, bone_name):
+        name = self.resolve_name(bone_name)
+        if name is None:
+            self.missing.append(bone_name)
+            return None
+        return self.armature.pose.bones[name]
 
+    def report(self):
+        '''Describe config entries that did not match a single bone'''
+        lines = []
+        if self.missing:
+            lines.append("Bones not found: " + ", ".join(self.missing))
+        for name, found in self.ambiguous.items():
+            lines.append(f"{name} is ambiguous, used {found[0]} of: " + ", ".join(found))
+        return lines
 
-def unique_constraint(bone, t):
-    for constraint in bone.constraints:
-        if constraint.type == t:
-            return constraint
-    constraint = bone.constraints.new(type=t)
-    return constraint
 
-
-def get_pose_bone(bone_name):
-    pose_bones = bpy.context.object.pose.bones
-    bone = None
-    if bone_name in pose_bones:
-        bone = pose_bones[bone_name]
-    elif "_" not in bone_name:
-        for b in pose_bones:
-            if b.name.endswith(f"_{bone_name}"):
-                bone = b
-                break
-    else:
-        name, side = bone_name.split("_")
-        if side not in {"L", "R"}:
-            for b in pose_bones:
-                if b.name.endswith(f"_{name}"):
-                    bone = b
-                    break
-        for b in pose_bones:
-            if b.name.endswith(f"_{side}_{name}"):
-                bone = b
-                break
-    return bone
+def get_pose_bone(bone_name, resolver=None):
+    if resolver is None:
+        resolver = PoseBoneResolver(bpy.context.object)
+    return resolver.get(bone_name)
 
 
 def apply_edit_bones():
     bpy.ops.object.posemode_toggle()  # This lines needed to "apply" bones from edit mode
     bpy.ops.object.editmode_toggle()  # or else constraints won't appear for some reason
-
-
-def setup_ik():
-    apply_edit_bones()
-
-    pose_bones = bpy.context.object.pose.bones
-    for bone_name, params in IK_CONFIG.items():
-
-        bone = get_pose_bone(bone_name)
-        if bone is None:
-            continue
-
-        constraint = unique_constraint(bone, "IK")
-        constraint.chain_count = params.get("chain_count", 0)
-
-        bone.lock_ik_x = params.get("lock_ik_x", False)
-        bone.lock_ik_y = params.get("lock_ik_y", False)
-        bone.lock_ik_z = params.get("lock_ik_z", False)
-
-        bone.use_ik_limit_x = params.get("use_ik_limit_x", False)
-        bone.use_ik_limit_y = params.get("use_ik_limit_y", False)
-        bone.use_ik_limit_z = params.get("use_ik_limit_z", False)
-
-        bone.ik_max_x = params.get("ik_max_x", 3.14159)
-        bone.ik_min_x = params.get("ik_min_x", -3.14159)
-        bone.ik_max_y = params.get("ik_max_y", 3.14159)
-        bone.ik_min_y = params.get("ik_min_y", -3.14159)
-        bone.ik_max_z = params.get("ik_max_z", 3.14159)
-        bone.ik_min_z = params.get("ik_min_z", -3.14159)
-
-
-def add_finger_constraitns():
-    apply_edit_bones()
-    for finger, num, side in product(FINGERS, [2, 3], ["L", "R"]):
-        bone = get_pose_bone(f"{finger}{num}_{side}")
-        if bone is None:
-            continue
-        constraint = unique_constraint(bone, "COPY_ROTATION")
-        constraint.target = bpy.context.object
-        constraint.subtarget = bone.parent.name
-        constraint.mix_mode = "ADD"
-        constraint.target_space = "LOCAL"
-        constraint.owner_space = "LOCAL"
-        constraint.use_y = False
-        if finger == "Thumb":
-            constraint.use_x = False
-        else:
-            constraint.use_z = False
-
-
-def add_rotation_limits():
-    apply_edit_bones()
-    for bone_name, params in ROTATION_LIMITS.items():
-        if bone_name == "<fingers>":
-            for finger, num, side in product(FINGERS, [1], ["L", "R"]):
-                if finger == "Thumb":
-                    continue
-                bone = get_pose_bone(f"{finger}{num}_{side}")
-                if bone is None:
-                    continue
-                constraint = unique_constraint(bone, "LIMIT_ROTATION")
-                constraint.owner_space = "LOCAL"
-                constraint.use_transform_limit = True
-                for p_name, p_value in params.items():
-                    setattr(constraint, p_name, p_value)
-                    axis = p_name.split("_")[1]
-                    setattr(constraint, f"use_limit_{axis}", True)
-        bone = get_pose_bone(bone_name)
+    profiling.count("ops_calls", 2)
+    profiling.count("mode_toggles", 2)
+
+
+class SpecReport:
+    '''What applying a constraint spec changed, counted per constraint'''
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.written = 0
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'written': self.written,
+        }
+
+    def summary(self):
+        return (
+            f"{self.created} constraints created, {self.updated} updated, "
+            f"{self.unchanged} unchanged ({self.written} properties written)"
+        )
+
+
+def _differs(current, value):
+    if isinstance(value, float) or (isinstance(current, float) and not isinstance(value, bool)):
+        # RNA floats are single precision
+        return abs(current - value) > 1e-6 * max(1.0, abs(value))
+    return current != value
+
+
+def _write_properties(owner, values, armature, bone):
+    '''Set only properties that differ, every RNA write tags depsgraph'''
+    written = 0
+    for name, value in values.items():
+        if value == SELF:
+            value = armature
+        elif value == PARENT:
+            value = bone.parent.name if bone.parent else ""
+        if _differs(getattr(owner, name), value):
+            setattr(owner, name, value)
+            written += 1
+    return written
+
+
+def apply_constraint_spec(specs, resolver=None, apply_edits=True) -> SpecReport:
+    '''Bring pose bones in line with compiled bone specs, see constraint_spec'''
+    if apply_edits:
+        apply_edit_bones()
+    if resolver is None:
+        resolver = PoseBoneResolver(bpy.context.object)
+    armature = resolver.armature
+    report = SpecReport(resolver)
+    for bone_name, spec in specs.items():
+        bone = get_pose_bone(bone_name, resolver)
         if bone is None:
             continue
-        constraint = unique_constraint(bone, "LIMIT_ROTATION")
-        constraint.owner_space = "LOCAL"
-        constraint.use_transform_limit = True
-        for p_name, p_value in params.items():
-            setattr(constraint, p_name, p_value)
-            axis = p_name.split("_")[1]
-            setattr(constraint, f"use_limit_{axis}", True)
+        report.written += _write_properties(bone, spec.properties, armature, bone)
+
+        existing = dict()
+        for constraint in bone.constraints:
+            existing.setdefault(constraint.type, constraint)
+        for constraint_type, values in spec.constraints.items():
+            constraint = existing.get(constraint_type)
+            if constraint is None:
+                constraint = bone.constraints.new(type=constraint_type)
+                report.written += _write_properties(constraint, values, armature, bone)
+                report.created += 1
+            elif (written := _write_properties(constraint, values, armature, bone)):
+                report.written += written
+                report.updated += 1
+            else:
+                report.unchanged += 1
+    return report
+
+
+def setup_ik(resolver=None, apply_edits=True, preset=None) -> SpecReport:
+    preset = preset or default_preset()
+    return apply_constraint_spec(preset.specs['ik'], resolver, apply_edits)
+
+
+def add_finger_constraitns(resolver=None, apply_edits=True, preset=None) -> SpecReport:
+    preset = preset or default_preset()
+    return apply_constraint_spec(preset.specs['finger_constraints'], resolver, apply_edits)
+
+
+def add_rotation_limits(resolver=None, apply_edits=True, preset=None) -> SpecReport:
+    preset = preset or default_preset()
+    return apply_constraint_spec(preset.specs['rotation_limits'], resolver, apply_edits)
@@ -0,0 +1,133 @@
+'''Fingerprints of what a stage reads from an armature, to skip unchanged re-runs.
+
+Every stage stores a fingerprint of the armature state it left behind.
+Stages are idempotent, so when the next run finds the same state the
+stage has nothing to do and is skipped. Skipping is per stage, a stage
+whose input changed anywhere runs on the whole armature again.
+'''
+import hashlib
+import json
+
+import numpy as np
+
+from .objects import get_deformed
+from .snapshot import ArmatureSnapshot
+from .weights import mesh_summary
+
+PROPERTY = "vroid_fingerprints"
+PRECISION = 1e-4
+
+# Parts of armature state every stage depends on. Constraint stages (ik,
+# finger_constraints, rotation_limits) aren't listed and always run: their
+# constraints get tuned by hand and apply_constraint_spec only writes what
+# differs, so an unchanged re-run costs next to nothing.
+STAGE_INPUTS = {
+    'rename_bones': ('names',),
+    'bone_chains': ('names', 'parents', 'geometry'),
+    'leaf_tails': ('names', 'parents', 'geometry', 'vertex_groups', 'mesh_geometry'),
+    'cleanup': ('names', 'parents', 'constraints', 'vertex_groups'),
+    'clear_leaf_bones': ('names', 'parents', 'constraints', 'vertex_groups'),
+    'reassign_orphans': ('names', 'geometry', 'vertex_groups'),
+    'limit_influences': ('names', 'vertex_groups'),
+}
+
+
+def _constraints(armature, names):
+    # In edit mode pose bones of deleted bones linger until the edit bones
+    # are flushed, only bones of the snapshot count
+    pose_bones = armature.pose.bones
+    return [
+        (name, [c.type for c in pose_bones[name].constraints] if name in pose_bones else [])
+        for name in names
+    ]
+
+
+def _vertex_groups(armature):
+    # Stages decide from weights, so the per group summary goes in
+    return [
+        (
+            obj.name, len(obj.data.vertices),
+            sorted(
+                (name, round(max_weight / PRECISION), count, round(total / PRECISION))
+                for name, max_weight, count, total in mesh_summary(obj)
+            ),
+        )
+        for obj in get_deformed(armature)
+        if obj.type == 'MESH'
+    ]
+
+
+def _mesh_geometry(armature, digest):
+    # Vertex positions and placement of meshes relative to the armature
+    to_armature = np.array(armature.matrix_world.inverted())
+    for obj in get_deformed(armature):
+        if obj.type != 'MESH':
+            continue
+        co = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+        obj.data.vertices.foreach_get("co", co)
+        digest.update(obj.name.encode())
+        for values in (co, to_armature @ np.array(obj.matrix_world)):
+            digest.update(np.round(values / PRECISION).astype(np.int64).tobytes())
+
+
+def stage_fingerprint(armature, stage, extra=None) -> str:
+    '''Hash of armature state read by stage, extra is any JSON-able stage input'''
+    snapshot = ArmatureSnapshot.capture(armature)
+    digest = hashlib.blake2b(digest_size=16)
+    for part in STAGE_INPUTS[stage]:
+        digest.update(part.encode())
+        if part == 'names':
+            digest.update("\0".join(snapshot.names).encode())
+        elif part == 'parents':
+            digest.update(snapshot.parents.tobytes())
+        elif part == 'geometry':
+            for values in (snapshot.heads, snapshot.tails):
+                digest.update(np.round(values / PRECISION).astype(np.int64).tobytes())
+            digest.update(snapshot.connected.tobytes())
+        elif part == 'constraints':
+            digest.update(json.dumps(_constraints(armature, snapshot.names)).encode())
+        elif part == 'vertex_groups':
+            digest.update(json.dumps(_vertex_groups(armature)).encode())
+        elif part == 'mesh_geometry':
+            _mesh_geometry(armature, digest)
+    if extra is not None:
+        digest.update(json.dumps(extra, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def stored_fingerprints(armature) -> dict:
+    data = armature.get(PROPERTY)
+    return json.loads(data) if data else dict()
+
+
+def is_up_to_date(armature, stage, extra=None) -> bool:
+    '''Whether stage already ran on the armature as it is now'''
+    stored = stored_fingerprints(armature).get(stage)
+    return stored is not None and stored == stage_fingerprint(armature, stage, extra)
+
+
+def mark_done(armature, stage, extra=None):
+    '''Store fingerprint of armature state a stage just produced'''
+    fingerprints = stored_fingerprints(armature)
+    fingerprints[stage] = stage_fingerprint(armature, stage, extra)
+    armature[PROPERTY] = json.dumps(fingerprints)
+
+
+def clear_fingerprints(armature):
+    if PROPERTY in armature:
+        del armature[PROPERTY]
+
+
+def run_stage(armature, stage, func, *args, extra=None, incremental=True, **kwargs):
+    '''Run a stage unless it already ran on unchanged input.
+
+    Stages missing from STAGE_INPUTS always run.
+    Returns (ran, value of func), value is None for skipped stages.
+    '''
+    if stage not in STAGE_INPUTS:
+        return True, func(*args, **kwargs)
+    if incremental and is_up_to_date(armature, stage, extra):
+        return False, None
+    value = func(*args, **kwargs)
+    mark_done(armature, stage, extra)
+    return True, value
@@ -0,0 +1,330 @@
+'''Skeleton preprocessing of .glb/.vrm files without Blender.
+
+Junk joints (no weights in any skinned primitive, nothing else pointing
+at them, whole subtree junk) are removed from the file and the remaining
+joints get the same names simplify_symmetrize_names would give them.
+'''
+import json
+import mmap
+import struct
+
+import numpy as np
+
+from .snapshot import plan_name_renames
+from .vrm import CHUNK_JSON, GLB_MAGIC, name_table_from_gltf
+
+CHUNK_BIN = 0x004E4942
+WEIGHT_THRESHOLD = 0.001  # weights.WEIGHT_THRESHOLD, that module needs bpy
+
+COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+
+
+class GLB:
+    '''Parsed JSON chunk and memory mapped BIN chunk of a binary glTF file'''
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != GLB_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a binary glTF file")
+        self.gltf = None
+        self.bin = memoryview(b"")
+        offset = 12
+        while offset + 8 <= len(self._mmap):
+            length, chunk_type = struct.unpack_from("<II", self._mmap, offset)
+            if chunk_type == CHUNK_JSON:
+                self.gltf = json.loads(self._mmap[offset + 8:offset + 8 + length])
+            elif chunk_type == CHUNK_BIN:
+                self.bin = memoryview(self._mmap)[offset + 8:offset + 8 + length]
+            offset += 8 + length
+        if self.gltf is None:
+            self.close()
+            raise ValueError(f"{path} has no JSON chunk")
+
+    def close(self):
+        self.bin.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def accessor(self, index, buffer=None):
+        '''View accessor data as (count, components) array without copying'''
+        accessor = self.gltf["accessors"][index]
+        if "sparse" in accessor or "bufferView" not in accessor:
+            raise ValueError(f"accessor {index} is sparse or has no buffer view")
+        view = self.gltf["bufferViews"][accessor["bufferView"]]
+        if view.get("buffer", 0) != 0 or "uri" in self.gltf["buffers"][0]:
+            raise ValueError(f"accessor {index} is not stored in the GLB BIN chunk")
+        dtype = np.dtype(COMPONENT_TYPES[accessor["componentType"]])
+        components = TYPE_SIZES[accessor["type"]]
+        stride = view.get("byteStride") or dtype.itemsize * components
+        return np.ndarray(
+            shape=(accessor["count"], components),
+            dtype=dtype,
+            buffer=self.bin if buffer is None else buffer,
+            offset=view.get("byteOffset", 0) + accessor.get("byteOffset", 0),
+            strides=(stride, dtype.itemsize),
+        )
+
+    def weights(self, index, buffer=None):
+        data = self.accessor(index, buffer)
+        accessor = self.gltf["accessors"][index]
+        if accessor.get("normalized") and data.dtype.kind == "u":
+            return data / np.iinfo(data.dtype).max
+        return data.astype(np.float64)
+
+    def write_weights(self, index, values, buffer):
+        '''Store float weights in accessor index of buffer, in its component type'''
+        data = self.accessor(index, buffer)
+        if data.dtype.kind == "u":
+            values = np.rint(values * np.iinfo(data.dtype).max)
+        data[...] = values.astype(data.dtype)
+        accessor = self.gltf["accessors"][index]
+        accessor.pop("min", None)
+        accessor.pop("max", None)
+
+
+def skinned_primitives(gltf):
+    '''Yield (skin index, primitive) for every primitive of skinned mesh nodes'''
+    meshes = gltf.get("meshes", [])
+    for node in gltf.get("nodes", []):
+        if "skin" in node and "mesh" in node:
+            for primitive in meshes[node["mesh"]].get("primitives", []):
+                yield node["skin"], primitive
+
+
+def influence_sets(primitive):
+    '''Pairs of JOINTS_n, WEIGHTS_n accessor indices of a primitive'''
+    attributes = primitive.get("attributes", {})
+    n = 0
+    while f"JOINTS_{n}" in attributes and f"WEIGHTS_{n}" in attributes:
+        yield attributes[f"JOINTS_{n}"], attributes[f"WEIGHTS_{n}"]
+        n += 1
+
+
+def joint_max_weights(glb):
+    '''Max vertex weight of every node used as a joint, streamed per accessor'''
+    gltf = glb.gltf
+    skins = gltf.get("skins", [])
+    max_weights = np.zeros(len(gltf.get("nodes", [])))
+    for skin, primitive in skinned_primitives(gltf):
+        joint_nodes = np.asarray(skins[skin]["joints"])
+        for joints_index, weights_index in influence_sets(primitive):
+            joints = glb.accessor(joints_index).ravel()
+            weights = glb.weights(weights_index).ravel()
+            np.maximum.at(max_weights, joint_nodes[joints], weights)
+    return max_weights
+
+
+def _extension_node_refs(gltf):
+    '''Lists and keys in VRM extensions that hold node indices, as (container, key) pairs'''
+    refs = []
+    extensions = gltf.get("extensions", {})
+    vrm = extensions.get("VRM", {})
+    for bone in vrm.get("humanoid", {}).get("humanBones", []):
+        refs.append((bone, "node"))
+    first_person = vrm.get("firstPerson", {})
+    if "firstPersonBone" in first_person:
+        refs.append((first_person, "firstPersonBone"))
+    secondary = vrm.get("secondaryAnimation", {})
+    for group in secondary.get("boneGroups", []):
+        refs.extend((group["bones"], i) for i in range(len(group.get("bones", []))))
+        if "center" in group:
+            refs.append((group, "center"))
+    for group in secondary.get("colliderGroups", []):
+        refs.append((group, "node"))
+
+    vrmc = extensions.get("VRMC_vrm", {})
+    for bone in vrmc.get("humanoid", {}).get("humanBones", {}).values():
+        refs.append((bone, "node"))
+    spring = extensions.get("VRMC_springBone", {})
+    for collider in spring.get("colliders", []):
+        refs.append((collider, "node"))
+    for chain in spring.get("springs", []):
+        refs.extend((joint, "node") for joint in chain.get("joints", []))
+        if "center" in chain:
+            refs.append((chain, "center"))
+    for node in gltf.get("nodes", []):
+        constraint = node.get("extensions", {}).get("VRMC_node_constraint", {}).get("constraint", {})
+        for source in constraint.values():
+            if isinstance(source, dict) and "source" in source:
+                refs.append((source, "source"))
+    return [(container, key) for container, key in refs if _has_ref(container, key)]
+
+
+def _has_ref(container, key):
+    if isinstance(container, list):
+        return key < len(container) and isinstance(container[key], int)
+    return isinstance(container.get(key), int)
+
+
+def find_junk_joints(glb, threshold=WEIGHT_THRESHOLD):
+    '''Indices of joint nodes whose whole subtree is unweighted and unreferenced'''
+    gltf = glb.gltf
+    nodes = gltf.get("nodes", [])
+    joints = {j for skin in gltf.get("skins", []) for j in skin["joints"]}
+    referenced = {container[key] for container, key in _extension_node_refs(gltf)}
+    referenced.update(skin["skeleton"] for skin in gltf.get("skins", []) if "skeleton" in skin)
+    max_weights = joint_max_weights(glb)
+
+    def _removable(i):
+        node = nodes[i]
+        return (
+            i in joints
+            and i not in referenced
+            and max_weights[i] <= threshold
+            and not any(k in node for k in ("mesh", "skin", "camera"))
+        )
+
+    parents = dict()
+    for i, node in enumerate(nodes):
+        for child in node.get("children", []):
+            parents[child] = i
+    junk = set()
+    roots = [i for i in range(len(nodes)) if i not in parents]
+    stack = [(i, False) for i in roots]
+    while stack:
+        i, visited = stack.pop()
+        children = nodes[i].get("children", [])
+        if not visited:
+            stack.append((i, True))
+            stack.extend((child, False) for child in children)
+        elif _removable(i) and all(child in junk for child in children):
+            junk.add(i)
+    return junk
+
+
+def _remove_nodes(gltf, removed, buffer, glb):
+    '''Drop nodes from the document and remap every node and joint reference'''
+    nodes = gltf["nodes"]
+    remap = np.full(len(nodes), -1, dtype=np.int64)
+    kept = [i for i in range(len(nodes)) if i not in removed]
+    remap[kept] = np.arange(len(kept))
+
+    for container, key in _extension_node_refs(gltf):
+        container[key] = int(remap[container[key]])
+
+    gltf["nodes"] = [nodes[i] for i in kept]
+    for node in gltf["nodes"]:
+        if "children" in node:
+            node["children"] = [int(remap[c]) for c in node["children"] if c not in removed]
+            if not node["children"]:
+                del node["children"]
+    for scene in gltf.get("scenes", []):
+        scene["nodes"] = [int(remap[n]) for n in scene.get("nodes", []) if n not in removed]
+    for animation in gltf.get("animations", []):
+        animation["channels"] = [
+            c for c in animation.get("channels", [])
+            if c.get("target", {}).get("node") not in removed
+        ]
+        for channel in animation["channels"]:
+            if "node" in channel.get("target", {}):
+                channel["target"]["node"] = int(remap[channel["target"]["node"]])
+
+    remapped_accessors = set()
+    for skin_index, skin in enumerate(gltf.get("skins", [])):
+        old_joints = skin["joints"]
+        keep = [k for k, node in enumerate(old_joints) if node not in removed]
+        if len(keep) == len(old_joints):
+            skin["joints"] = [int(remap[n]) for n in old_joints]
+            continue
+        joint_remap = np.zeros(len(old_joints), dtype=np.int64)
+        joint_remap[keep] = np.arange(len(keep))
+        skin["joints"] = [int(remap[old_joints[k]]) for k in keep]
+        if "skeleton" in skin:
+            skin["skeleton"] = int(remap[skin["skeleton"]])
+
+        if "inverseBindMatrices" in skin:
+            index = skin["inverseBindMatrices"]
+            matrices = glb.accessor(index, buffer)
+            matrices[:len(keep)] = matrices[keep].copy()
+            accessor = gltf["accessors"][index]
+            accessor["count"] = len(keep)
+            accessor.pop("min", None)
+            accessor.pop("max", None)
+
+        kept_joints = np.zeros(len(old_joints), dtype=bool)
+        kept_joints[keep] = True
+        for skin_used, primitive in skinned_primitives(gltf):
+            if skin_used != skin_index:
+                continue
+            sets = list(influence_sets(primitive))
+            if any(joints_index in remapped_accessors for joints_index, _ in sets):
+                continue
+            remapped_accessors.update(joints_index for joints_index, _ in sets)
+            _remap_influences(glb, buffer, sets, kept_joints, joint_remap)
+    return len(removed)
+
+
+def _remap_influences(glb, buffer, sets, kept_joints, joint_remap):
+    '''Point influences at remapped joints, zero weights of removed joints and
+    renormalize every vertex over all JOINTS_n/WEIGHTS_n sets of a primitive
+    '''
+    weights = []
+    for joints_index, weights_index in sets:
+        joints = glb.accessor(joints_index, buffer)
+        values = glb.weights(weights_index, buffer)
+        # Removed joints keep up to WEIGHT_THRESHOLD, not nothing
+        values[~kept_joints[joints]] = 0.0
+        weights.append(values)
+        # Their slots now point at joint 0 with zero weight
+        joints[...] = joint_remap[joints].astype(joints.dtype)
+        accessor = glb.gltf["accessors"][joints_index]
+        accessor.pop("min", None)
+        accessor.pop("max", None)
+    totals = sum(values.sum(axis=1) for values in weights)
+    scale = np.divide(1.0, totals, out=np.zeros_like(totals), where=totals > 0)
+    for (_, weights_index), values in zip(sets, weights):
+        glb.write_weights(weights_index, values * scale[:, None], buffer)
+
+
+def rename_joints(gltf):
+    '''Rename joint nodes like simplify_symmetrize_names renames bones'''
+    nodes = gltf.get("nodes", [])
+    joints = sorted({j for skin in gltf.get("skins", []) for j in skin["joints"]})
+    names = [nodes[j].get("name", "") for j in joints]
+    renames = plan_name_renames(names, name_table_from_gltf(gltf))
+    for j in joints:
+        name = nodes[j].get("name")
+        if name in renames:
+            nodes[j]["name"] = renames[name]
+    return renames
+
+
+def _chunk(data, chunk_type, pad):
+    data = bytes(data) + pad * (-len(data) % 4)
+    return struct.pack("<II", len(data), chunk_type) + data
+
+
+def preprocess_glb(source, target, rename=True, strip=True, threshold=WEIGHT_THRESHOLD):
+    '''Write a copy of source with junk joints removed and joints renamed'''
+    with GLB(source) as glb:
+        gltf = glb.gltf
+        buffer = bytearray(glb.bin)
+        removed = find_junk_joints(glb, threshold) if strip else set()
+        removed_names = sorted(gltf["nodes"][i].get("name", str(i)) for i in removed)
+        if removed:
+            _remove_nodes(gltf, removed, buffer, glb)
+        renames = rename_joints(gltf) if rename else dict()
+
+    data = _chunk(json.dumps(gltf, separators=(",", ":")).encode(), CHUNK_JSON, b" ")
+    if buffer:
+        data += _chunk(buffer, CHUNK_BIN, b"\0")
+    with open(target, "wb") as f:
+        f.write(struct.pack("<4sII", GLB_MAGIC, 2, 12 + len(data)))
+        f.write(data)
+    return {"removed": removed_names, "renamed": len(renames)}
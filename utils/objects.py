@@ -1,11 +1,108 @@
+from contextlib import contextmanager
+
 import bpy
 
+from . import profiling
+
+_children = None
+# Armature name to names of objects it deforms, see get_deformed
+_deformed = dict()
+
+
 def get_children(parent):
     if parent is None: return []
+    if _children is not None:
+        return list(_children.get(parent.name, ()))
     l = []
     for obj in bpy.context.scene.objects:
         if obj.name == parent.name: continue
         if obj.parent is None: continue
         if obj.parent.name == parent.name:
             l.append(obj)
-    return l
\ No newline at end of file
+    return l
+
+
+def get_deformed(armature):
+    '''Children of armature and other objects bound to it by an Armature modifier.
+
+    The list is kept until clear_deformed, which depsgraph updates call.
+    '''
+    names = _deformed.get(armature.name)
+    if names is not None:
+        objects = [bpy.data.objects.get(name) for name in names]
+        if all(objects):
+            return objects
+    objects = get_children(armature)
+    bound = set(objects)
+    for obj in bpy.context.scene.objects:
+        if obj in bound or obj == armature:
+            continue
+        if any(m.type == 'ARMATURE' and m.object == armature for m in obj.modifiers):
+            objects.append(obj)
+            bound.add(obj)
+    _deformed[armature.name] = [obj.name for obj in objects]
+    return objects
+
+
+def clear_deformed():
+    _deformed.clear()
+
+
+@contextmanager
+def shared_children():
+    '''Map scene objects to their children once, get_children uses the map in the block'''
+    global _children
+    if _children is not None:
+        yield _children
+        return
+    index = dict()
+    for obj in bpy.context.scene.objects:
+        if obj.parent is not None and obj.parent.name != obj.name:
+            index.setdefault(obj.parent.name, []).append(obj)
+    _children = index
+    try:
+        yield index
+    finally:
+        _children = None
+
+
+def toggle_edit_mode():
+    bpy.ops.object.editmode_toggle()
+    profiling.count("ops_calls")
+    profiling.count("mode_toggles")
+
+
+def target_armatures(context, all_selected=False):
+    '''Active armature, followed by other selected armatures if all_selected'''
+    active = context.active_object
+    if not all_selected:
+        return [active]
+    others = [
+        obj for obj in context.selected_objects
+        if obj.type == 'ARMATURE' and obj != active
+    ]
+    return [active] + sorted(others, key=lambda obj: obj.name)
+
+
+def enter_edit_mode(context, armatures):
+    '''Put all armatures into one multi-object edit mode, return mode to go back to'''
+    mode = context.mode
+    if mode == 'EDIT_ARMATURE':
+        if set(armatures) <= set(context.objects_in_mode):
+            return mode
+        # Armatures selected after entering edit mode join on re-entry
+        toggle_edit_mode()
+    toggle_edit_mode()
+    return mode
+
+
+@contextmanager
+def active_object(context, obj):
+    '''Make obj active for the block, utils work on the active object'''
+    view_layer = context.view_layer
+    previous = view_layer.objects.active
+    view_layer.objects.active = obj
+    try:
+        yield obj
+    finally:
+        view_layer.objects.active = previous
@@ -0,0 +1,147 @@
+from time import perf_counter
+
+import bpy
+
+from . import profiling
+from .fingerprint import run_stage
+from .objects import active_object, shared_children
+from .bones import simplify_symmetrize_names, fix_bones_chains, fix_leaf_tails, remove_junk_bones
+from .weights import clear_cache_if_reloaded, limit_armature_influences, reassign_armature_orphans
+from .constraint_spec import default_preset
+from .constraints import (
+    PoseBoneResolver,
+    apply_edit_bones,
+    setup_ik,
+    add_finger_constraitns,
+    add_rotation_limits,
+)
+
+EDIT_STAGES = ('rename_bones', 'bone_chains', 'leaf_tails', 'cleanup', 'reassign_orphans', 'limit_influences')
+CONSTRAINT_STAGES = ('ik', 'finger_constraints', 'rotation_limits')
+STAGES = EDIT_STAGES + CONSTRAINT_STAGES
+# Stages changing mesh weights or leaf bone geometry only run when asked for
+OPT_IN_STAGES = ('leaf_tails', 'reassign_orphans', 'limit_influences')
+DEFAULT_STAGES = tuple(stage for stage in STAGES if stage not in OPT_IN_STAGES)
+
+
+class SetupResult:
+    '''What a rig setup run did, per stage timings in seconds'''
+
+    def __init__(self):
+        self.timings = dict()
+        self.renamed = dict()
+        self.removed = None
+        self.warnings = []
+        self.skipped = []
+        self.constraints = dict()
+        self.orphans_reassigned = dict()
+        self.influences_removed = dict()
+
+    def as_dict(self):
+        return {
+            'timings': self.timings,
+            'skipped': self.skipped,
+            'bones_renamed': len(self.renamed),
+            'bones_removed': len(self.removed) if self.removed else 0,
+            'removed': sorted(self.removed.bones) if self.removed else [],
+            'constraints': self.constraints,
+            'orphans_reassigned': self.orphans_reassigned,
+            'influences_removed': self.influences_removed,
+            'warnings': self.warnings,
+        }
+
+
+def run_setup(stages=DEFAULT_STAGES, name_table=None, incremental=False, preset=None, **options) -> SetupResult:
+    '''Run enabled setup stages on active armature, which must be in edit mode.
+
+    Edit bones are flushed to pose only once, before the constraint stages.
+    With incremental, stages whose input didn't change since they last ran
+    are skipped.
+    '''
+    armature = bpy.context.object
+    return run_batch_setup([armature], stages, name_table, incremental, preset, **options)[armature.name]
+
+
+def run_batch_setup(armatures, stages=DEFAULT_STAGES, name_table=None, incremental=False, preset=None,
+                    max_influences=4, weight_threshold=0.01, symmetry=False, orphan_neighbors=1) -> dict:
+    '''Run setup stages on armatures sharing one multi-object edit mode.
+
+    All armatures must be in edit mode. Edit stages run rig by rig, then
+    edit bones of all of them are flushed to pose at once, then the
+    constraint stages run with specs of preset, the built in one by default.
+    reassign_orphans shares vertices left without weights between their
+    orphan_neighbors nearest bones, limit_influences keeps max_influences
+    weights above weight_threshold.
+    With symmetry, chains and cleanup mirror left side bones to the right.
+    Returns a SetupResult per armature name.
+    '''
+    clear_cache_if_reloaded()
+    preset = preset or default_preset()
+    # Symmetry changes results, stages run again when it's toggled
+    mirror = True if symmetry else None
+    results = {armature.name: SetupResult() for armature in armatures}
+
+    def _timed(armature, name, func, *args, extra=None, **kwargs):
+        result = results[armature.name]
+        start = perf_counter()
+        with profiling.stage(name):
+            ran, value = run_stage(armature, name, func, *args, extra=extra, incremental=incremental, **kwargs)
+        result.timings[name] = perf_counter() - start
+        if not ran:
+            result.skipped.append(name)
+        return value
+
+    constraint_stages = [
+        (name, stage) for name, stage in (
+            ('ik', setup_ik),
+            ('finger_constraints', add_finger_constraitns),
+            ('rotation_limits', add_rotation_limits),
+        )
+        if name in stages
+    ]
+    pending = dict()
+    with shared_children():
+        for armature in armatures:
+            result = results[armature.name]
+            with active_object(bpy.context, armature):
+                if 'rename_bones' in stages:
+                    result.renamed = _timed(armature, 'rename_bones', simplify_symmetrize_names, name_table, extra=name_table) or dict()
+                if 'bone_chains' in stages:
+                    _timed(armature, 'bone_chains', fix_bones_chains, symmetry, extra=mirror)
+                if 'leaf_tails' in stages:
+                    _timed(armature, 'leaf_tails', fix_leaf_tails)
+                if 'cleanup' in stages:
+                    result.removed = _timed(armature, 'cleanup', remove_junk_bones, symmetry, extra=mirror)
+                if 'reassign_orphans' in stages:
+                    result.orphans_reassigned = _timed(
+                        armature, 'reassign_orphans', reassign_armature_orphans, armature, orphan_neighbors,
+                        extra=orphan_neighbors,
+                    ) or dict()
+                if 'limit_influences' in stages:
+                    result.influences_removed = _timed(
+                        armature, 'limit_influences', limit_armature_influences,
+                        armature, max_influences, weight_threshold,
+                        extra=[max_influences, weight_threshold],
+                    ) or dict()
+
+                if constraint_stages:
+                    pending[armature.name] = armature
+        if not pending:
+            return results
+
+        start = perf_counter()
+        with profiling.stage('apply_edit_bones'):
+            apply_edit_bones()
+        flush_time = (perf_counter() - start) / len(pending)
+        for armature in pending.values():
+            result = results[armature.name]
+            result.timings['apply_edit_bones'] = flush_time
+            with active_object(bpy.context, armature):
+                resolver = PoseBoneResolver(armature)
+                for name, stage in constraint_stages:
+                    report = _timed(armature, name, stage, resolver, apply_edits=False, preset=preset)
+                    if report is not None:
+                        for key, value in report.as_dict().items():
+                            result.constraints[key] = result.constraints.get(key, 0) + value
+            result.warnings = resolver.report()
+    return results
@@ -0,0 +1,107 @@
+import json
+from contextlib import contextmanager
+from time import perf_counter
+
+PROPERTY = "vroid_profile"
+COUNTERS = ("bones_visited", "bones_mirrored", "vertices_scanned", "meshes_cached", "ops_calls", "mode_toggles")
+
+_active = None
+
+
+class Profiler:
+    '''Wall time and work counters of every stage of an operator run'''
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = []
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.time = 0.0
+        self._stack = []
+        self._start = perf_counter()
+
+    def count(self, counter, n=1):
+        self.totals[counter] += n
+        if self._stack:
+            self._stack[-1][counter] += n
+
+    @contextmanager
+    def stage(self, name, resume=False):
+        '''Time the block, resume adds to the last stage if it has the same name'''
+        if resume and self.stages and self.stages[-1]["name"] == name and self.stages[-1] not in self._stack:
+            record = self.stages[-1]
+        else:
+            record = {"name": name, "time": 0.0, **dict.fromkeys(COUNTERS, 0)}
+            self.stages.append(record)
+        self._stack.append(record)
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            record["time"] += perf_counter() - start
+            self._stack.pop()
+
+    def finish(self):
+        self.time = perf_counter() - self._start
+
+    def as_dict(self):
+        return {"name": self.name, "time": self.time, "totals": self.totals, "stages": self.stages}
+
+    def summary(self):
+        stages = ", ".join(f"{s['name']} {s['time'] * 1000:.0f}ms" for s in self.stages)
+        return f"{self.name} took {self.time:.2f}s ({stages})"
+
+
+def count(counter, n=1):
+    '''Add to a counter of the stage being profiled, does nothing outside a run'''
+    if _active is not None:
+        _active.count(counter, n)
+
+
+@contextmanager
+def stage(name, resume=False):
+    if _active is None:
+        yield None
+        return
+    with _active.stage(name, resume) as record:
+        yield record
+
+
+@contextmanager
+def activate(profiler):
+    '''Profile the block into an existing profiler, for runs split over modal ticks'''
+    global _active
+    previous, _active = _active, profiler
+    try:
+        yield profiler
+    finally:
+        _active = previous
+
+
+def store(profiler, armature, log_file=""):
+    '''Finish profiler and store results on armature.
+
+    Results go to the armature's custom property and, if given, are
+    appended to log_file as a JSON line.
+    '''
+    profiler.finish()
+    data = json.dumps(profiler.as_dict())
+    armature[PROPERTY] = data
+    if log_file:
+        with open(log_file, "a") as f:
+            f.write(data + "\n")
+
+
+@contextmanager
+def profile_run(armature, name, log_file=""):
+    '''Profile everything inside the block, then store results on armature'''
+    profiler = Profiler(name)
+    try:
+        with activate(profiler):
+            yield profiler
+    finally:
+        store(profiler, armature, log_file)
+
+
+def last_profile(armature):
+    data = armature.get(PROPERTY) if armature else None
+    return json.loads(data) if data else None
@@ -0,0 +1,612 @@
+import re
+
+import numpy as np
+
+from . import profiling
+from .symmetry import MIRROR, MirrorMap, mirror_name
+
+J_SEC_REGEX = re.compile(r"J_Sec_((?P<side>R|L)_)?(?P<name>[a-zA-Z]+)(?P<order>\d{1,2})?_(?P<leaf>end_)?(?P<id>\d{2})")
+J_BIP_REGEX = re.compile(r"J_Bip_(?P<side>R|L|C)_(?P<name>\w+)")
+# Leaf bones whose tails plan_bones_chains already places
+SPECIAL_LEAF_REGEX = re.compile(r"((Thumb|Index|Middle|Ring|Little)3|ToeBase)_(R|L)")
+# Secondary bones after simplify_symmetrize_names, i.e. Name##_##_Side
+SEC_NAME_REGEX = re.compile(r"(?P<name>[a-zA-Z]+)(?P<id>\d{2})(_(?P<order>\d{1,2}))?(_(?P<side>R|L))?(\.\d{3})?$")
+
+
+class ArmatureSnapshot:
+    '''Plain copy of armature edit bones that planning functions work on.
+
+    Bones are stored in edit bones order, parents as indices (-1 for none),
+    heads and tails as (n, 3) arrays.
+    '''
+
+    def __init__(self, names, parents, heads, tails, connected,
+                 head_radius=None, tail_radius=None, weighted=None, constrained=None,
+                 selected=None):
+        n = len(names)
+        self.names = list(names)
+        self.parents = np.asarray(parents, dtype=np.int32)
+        self.heads = np.asarray(heads, dtype=np.float64).reshape(n, 3)
+        self.tails = np.asarray(tails, dtype=np.float64).reshape(n, 3)
+        self.connected = np.asarray(connected, dtype=bool)
+        self.head_radius = np.full(n, 0.1) if head_radius is None else np.asarray(head_radius, dtype=np.float64)
+        self.tail_radius = np.full(n, 0.05) if tail_radius is None else np.asarray(tail_radius, dtype=np.float64)
+        self.weighted = np.zeros(n, dtype=bool) if weighted is None else np.asarray(weighted, dtype=bool)
+        self.constrained = np.zeros(n, dtype=bool) if constrained is None else np.asarray(constrained, dtype=bool)
+        self.selected = np.zeros(n, dtype=bool) if selected is None else np.asarray(selected, dtype=bool)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.children = [[] for _ in range(n)]
+        for i, parent in enumerate(self.parents):
+            if parent >= 0:
+                self.children[parent].append(i)
+
+    @classmethod
+    def capture(cls, armature, weights=None):
+        '''Read edit bones of armature, weights is a WeightIndex'''
+        bones = armature.data.edit_bones
+        n = len(bones)
+        profiling.count("bones_visited", n)
+        names = [b.name for b in bones]
+        index = {name: i for i, name in enumerate(names)}
+        parents = [index[b.parent.name] if b.parent else -1 for b in bones]
+
+        def _read(prop, size, dtype=np.float32):
+            data = np.empty(n * size, dtype=dtype)
+            bones.foreach_get(prop, data)
+            return data
+
+        weighted = [weights.has_effect(name) for name in names] if weights else None
+        constrained = {b.name for b in armature.pose.bones if b.constraints} if armature.pose else set()
+        return cls(
+            names, parents,
+            _read("head", 3), _read("tail", 3), _read("use_connect", 1, bool),
+            _read("head_radius", 1), _read("tail_radius", 1),
+            weighted, [name in constrained for name in names],
+            _read("select", 1, bool),
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def is_junk(self, i):
+        return not self.constrained[i] and not self.weighted[i]
+
+    def renamed(self, renames):
+        '''Copy of snapshot with bones renamed'''
+        return ArmatureSnapshot(
+            [renames.get(name, name) for name in self.names], self.parents,
+            self.heads, self.tails, self.connected,
+            self.head_radius, self.tail_radius, self.weighted, self.constrained,
+            self.selected,
+        )
+
+
+def _unique_name(name, taken):
+    '''Name blender gives a bone when name is already taken'''
+    if name not in taken:
+        return name
+    base = re.sub(r"\.\d{3}$", "", name)
+    n = 1
+    while f"{base}.{n:03d}" in taken:
+        n += 1
+    return f"{base}.{n:03d}"
+
+
+def plan_renames(snapshot, name_table=None) -> dict:
+    '''Map VRoid bone names to simplified blender symmetry names'''
+    return plan_name_renames(snapshot.names, name_table)
+
+
+def plan_name_renames(names, name_table=None) -> dict:
+    '''Map VRoid names to simplified blender symmetry names.
+
+    Names found in name_table (e.g. from the VRM humanoid map) are taken
+    from it, the rest are matched against VRoid naming conventions.
+    '''
+    renames = dict()
+    taken = set(names)
+    name_table = name_table or dict()
+    for original_name in names:
+        if original_name in name_table:
+            new_name = name_table[original_name]
+        elif (rematch := J_SEC_REGEX.match(original_name)):
+            name = rematch.group('name')
+            id = rematch.group('id')
+            order = rematch.group('order')
+            order = f"_{order}" if order else ""
+            side = rematch.group("side")
+            side = f"_{side}" if side else ""
+            new_name = f'{name}{id}{order}{side}'
+        elif (rematch := J_BIP_REGEX.match(original_name)):
+            name = rematch.group('name')
+            side = rematch.group('side')
+            side = f'_{side}' if side != 'C' else ''
+            new_name = f'{name}{side}'
+        else:
+            continue
+        if new_name == original_name:
+            continue
+        taken.discard(original_name)
+        new_name = _unique_name(new_name, taken)
+        taken.add(new_name)
+        renames[original_name] = new_name
+    return renames
+
+
+class JunkPlan:
+    '''Bones planned for deletion with the reason each one is removed'''
+
+    LEAF = 'unweighted leaf'
+    CHAIN = 'unweighted chain'
+
+    def __init__(self):
+        self.reasons = dict()
+
+    def add(self, name, reason):
+        self.reasons[name] = reason
+
+    @property
+    def bones(self):
+        return set(self.reasons)
+
+    def counts(self):
+        counts = dict()
+        for reason in self.reasons.values():
+            counts[reason] = counts.get(reason, 0) + 1
+        return counts
+
+    def summary(self):
+        if not self.reasons:
+            return "No junk bones found"
+        counts = ", ".join(f"{n} {reason}" for reason, n in sorted(self.counts().items()))
+        return f"Removed {len(self.reasons)} bones ({counts})"
+
+    def __len__(self):
+        return len(self.reasons)
+
+
+def _mirror_junk(plan, snapshot, mirror):
+    '''Remove mirrored right bones whose left twins are removed'''
+    if mirror is None:
+        return plan
+    names = snapshot.names
+    for j, i in mirror.sources.items():
+        reason = plan.reasons.get(names[j])
+        if reason is not None:
+            plan.add(names[i], reason)
+    return plan
+
+
+def analyze_junk_bones(snapshot, mirror=None) -> JunkPlan:
+    """Find every bone whose whole subtree is junk in one post-order pass.
+
+    With a MirrorMap, mirrored right subtrees are skipped and take the
+    result of their left twins.
+    """
+    plan = JunkPlan()
+    twins = mirror.twins if mirror is not None else dict()
+    subtree_junk = np.zeros(len(snapshot), dtype=bool)
+    stack = [(i, False) for i in np.flatnonzero(snapshot.parents < 0) if i not in twins]
+    while stack:
+        i, visited = stack.pop()
+        if not visited:
+            stack.append((i, True))
+            stack.extend((child, False) for child in snapshot.children[i] if child not in twins)
+            continue
+        children = snapshot.children[i]
+        # Twin of a skipped child is its sibling, already visited
+        for child in children:
+            if child in twins:
+                subtree_junk[child] = subtree_junk[twins[child]]
+        junk = snapshot.is_junk(i) and all(subtree_junk[c] for c in children)
+        subtree_junk[i] = junk
+        if junk:
+            plan.add(snapshot.names[i], JunkPlan.CHAIN if children else JunkPlan.LEAF)
+    return _mirror_junk(plan, snapshot, mirror)
+
+
+def find_junk_leaves(snapshot, mirror=None) -> JunkPlan:
+    '''Find leaf bones that have no weights and no constraints'''
+    plan = JunkPlan()
+    twins = mirror.twins if mirror is not None else dict()
+    for i, name in enumerate(snapshot.names):
+        if i not in twins and not snapshot.children[i] and snapshot.is_junk(i):
+            plan.add(name, JunkPlan.LEAF)
+    return _mirror_junk(plan, snapshot, mirror)
+
+
+class PrunePlan:
+    '''Bones to remove, each mapped to the surviving ancestor getting its weights'''
+
+    def __init__(self):
+        self.targets = dict()
+
+    @property
+    def bones(self):
+        return set(self.targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def summary(self):
+        return f"Pruned {len(self.targets)} bones into {len(set(self.targets.values()))} ancestors"
+
+
+def plan_prune(snapshot, influence, mode='THRESHOLD', threshold=0.05, budget=0) -> PrunePlan:
+    '''Pick bones to prune and the nearest surviving ancestor of each.
+
+    mode is SELECTED (selected bones), THRESHOLD (influence below threshold)
+    or BUDGET (least influential bones until at most budget bones are left).
+    Root bones and bones with constraints are never pruned.
+    '''
+    candidates = [
+        i for i in range(len(snapshot))
+        if snapshot.parents[i] >= 0 and not snapshot.constrained[i]
+    ]
+    if mode == 'SELECTED':
+        pruned = {i for i in candidates if snapshot.selected[i]}
+    elif mode == 'THRESHOLD':
+        pruned = {i for i in candidates if influence[i] < threshold}
+    elif mode == 'BUDGET':
+        excess = max(0, len(snapshot) - budget)
+        pruned = set(sorted(candidates, key=lambda i: influence[i])[:excess])
+    else:
+        raise ValueError(f"Unknown prune mode {mode}")
+
+    plan = PrunePlan()
+    for i in pruned:
+        target = snapshot.parents[i]
+        while target in pruned:
+            target = snapshot.parents[target]
+        plan.targets[snapshot.names[i]] = snapshot.names[target]
+    return plan
+
+
+def parse_secondary(name):
+    '''Chain key (name, id, side) and order of a secondary bone, None for others.
+
+    Understands both VRoid (J_Sec_*) and simplified names, chain end bones
+    have no order.
+    '''
+    rematch = J_SEC_REGEX.fullmatch(name) or SEC_NAME_REGEX.match(name)
+    if rematch is None:
+        return None
+    order = rematch.group('order')
+    return (rematch.group('name'), rematch.group('id'), rematch.group('side')), int(order) if order else None
+
+
+def secondary_chains(snapshot):
+    '''Lists of bone indices from root to tip of every secondary chain'''
+    parsed = [parse_secondary(name) for name in snapshot.names]
+    chains = []
+    for i, info in enumerate(parsed):
+        if info is None:
+            continue
+        parent = snapshot.parents[i]
+        if parent >= 0 and parsed[parent] is not None and parsed[parent][0] == info[0]:
+            continue
+        chain = [i]
+        while True:
+            following = [
+                c for c in snapshot.children[chain[-1]]
+                if parsed[c] is not None and parsed[c][0] == info[0]
+            ]
+            if not following:
+                break
+            # End bones have no order and come last
+            chain.append(min(following, key=lambda c: (parsed[c][1] is None, parsed[c][1] or 0)))
+        chains.append(chain)
+    return chains
+
+
+class DecimatePlan(PrunePlan):
+    '''Chain bones to remove, with new tails and connections of the kept ones'''
+
+    def __init__(self):
+        super().__init__()
+        self.tails = dict()
+        self.connected = dict()
+        self.chains = 0
+
+    def summary(self):
+        if not self.targets:
+            return "No secondary chains to decimate"
+        return f"Decimated {self.chains} chains, removed {len(self.targets)} bones"
+
+
+def _keep_by_length(snapshot, chain, length):
+    '''Positions of bones whose heads are closest to evenly spaced points along the chain'''
+    points = np.vstack([snapshot.heads[chain], snapshot.tails[chain[-1]]])
+    distance = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))])
+    samples = np.arange(length) * distance[-1] / length
+    keep = np.abs(distance[:-1, None] - samples[None, :]).argmin(axis=0)
+    return set(keep.tolist()) | {0}
+
+
+def plan_decimation(snapshot, step=2, length=0) -> DecimatePlan:
+    '''Thin out secondary chains (hair, skirts, sleeves...).
+
+    Keeps every step-th bone of a chain, or with length given, that many
+    bones spread evenly along the chain so its curve keeps its shape.
+    Removed bones give their weights to the kept bone above them. Chain
+    roots and bones with constraints are always kept.
+    '''
+    plan = DecimatePlan()
+    names = snapshot.names
+    for chain in secondary_chains(snapshot):
+        if length:
+            if len(chain) <= length:
+                continue
+            keep = _keep_by_length(snapshot, chain, length)
+        else:
+            keep = set(range(0, len(chain), max(1, step)))
+        keep |= {k for k, i in enumerate(chain) if snapshot.constrained[i]}
+        if len(keep) == len(chain):
+            continue
+
+        plan.chains += 1
+        kept = sorted(keep)
+        for k, i in enumerate(chain):
+            if k not in keep:
+                plan.targets[names[i]] = names[chain[max(p for p in kept if p < k)]]
+        for n, k in enumerate(kept):
+            i = chain[k]
+            if n + 1 < len(kept):
+                plan.tails[names[i]] = snapshot.heads[chain[kept[n + 1]]].copy()
+            else:
+                plan.tails[names[i]] = snapshot.tails[chain[-1]].copy()
+            if n:
+                plan.connected[names[i]] = bool(snapshot.connected[i])
+    return plan
+
+
+def _normalized(v):
+    length = np.linalg.norm(v)
+    return v / length if length else v * 0.0
+
+
+class ChainPlan:
+    '''Edit bone geometry and connections computed by plan_bones_chains.'''
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.heads = snapshot.heads.copy()
+        self.tails = snapshot.tails.copy()
+        self.connected = snapshot.connected.copy()
+        self.head_radius = snapshot.head_radius.copy()
+        self.targets = dict()
+        # Bone index to the direction its Z axis should face once the tail
+        # moved, None keeps Z as close to the old one as the new direction allows
+        self.roll_axes = dict()
+        # With a MirrorMap, changes of mirrored left bones are logged for their twins
+        self.mirror = None
+        self._log = []
+
+    def length(self, i):
+        return np.linalg.norm(self.tails[i] - self.heads[i])
+
+    def _record(self, change, i, value):
+        if self.mirror is not None and i in self.mirror.sources:
+            self._log.append((change, i, value))
+
+    def move_tail(self, i, tail):
+        '''Move tail of a bone, heads of connected children follow it'''
+        self._record('tail', i, tail)
+        self.tails[i] = tail
+        for child in self.snapshot.children[i]:
+            if self.connected[child]:
+                self.heads[child] = tail
+
+    def set_connected(self, i, connected):
+        self._record('connect', i, connected)
+        self.connected[i] = connected
+        if connected:
+            parent = self.snapshot.parents[i]
+            self.heads[i] = self.tails[parent]
+            self.head_radius[i] = self.snapshot.tail_radius[parent]
+
+    def replay_mirrored(self):
+        '''Repeat logged changes of left bones on their mirrored right twins'''
+        mirror, self.mirror = self.mirror, None
+        if mirror is None:
+            return
+        names = self.snapshot.names
+        for change, i, value in self._log:
+            if change == 'tail':
+                self.move_tail(mirror.sources[i], value * MIRROR)
+            else:
+                self.set_connected(mirror.sources[i], value)
+        for i, j in mirror.twins.items():
+            if names[j] in self.targets:
+                self.targets[names[i]] = mirror_name(self.targets[names[j]])
+        self._log = []
+
+    def changed(self):
+        '''Indices of bones whose geometry or connection changed'''
+        s = self.snapshot
+        moved = np.any(self.heads != s.heads, axis=1) | np.any(self.tails != s.tails, axis=1)
+        return np.flatnonzero(moved | (self.connected != s.connected) | (self.head_radius != s.head_radius))
+
+
+def plan_bones_chains(snapshot, mirror=None) -> ChainPlan:
+    '''Compute where every bone tail goes and which bones get connected.
+
+    With a MirrorMap, mirrored right bones are not planned, they copy what
+    happened to their left twins instead.
+    '''
+    # Regex patterns for identifying special bone types
+    finger_last_re = re.compile(r"(?P<finger>Thumb|Index|Middle|Ring|Little)3_(?P<side>R|L)")
+    toe_base_re = re.compile(r"ToeBase_(?P<side>L|R)")
+
+    # List of bone names that should be excluded from automatic connection
+    exceptions = ['Sleeve','Skirt','Bust','FaceEye','HairJoint','Tops','Food','Hood']
+
+    # Mapping of limb bone prefixes to their natural child prefixes
+    limb_hierarchy = {'UpperLeg':'LowerLeg','LowerLeg':'Foot','UpperArm':'LowerArm','LowerArm':'Hand'}
+
+    names = snapshot.names
+    plan = ChainPlan(snapshot)
+
+    def _get_target_child(i):
+        """Determine which child bone should be connected to the current bone."""
+        name = names[i]
+        children = snapshot.children[i]
+        # Skip processing for Head bone or bones without children
+        if name == "Head" or not children:
+            return None
+
+        # Limb hierarchy handling - find matching child bone based on naming convention
+        for prefix, child_prefix in limb_hierarchy.items():
+            if name.startswith(prefix):
+                for child in children:
+                    if names[child].startswith(child_prefix):
+                        return child
+                return children[0]  # Fallback to first child if no match
+
+        # Default to first child when no special cases apply
+        target = children[0]
+
+        # Handle cases where bone has multiple children
+        if len(children) > 1:
+            for child in children:
+                # Skip children that match exception patterns
+                if not any(ex in names[child] for ex in exceptions):
+                    target = child
+                    break
+                # Disconnect any exception bones
+                plan.set_connected(child, False)
+        return target
+
+    def _plan_bone_chain(i):
+        """Plan connection of an individual bone to its appropriate child."""
+        target = _get_target_child(i)
+        if target is None:
+            return
+        plan.targets[names[i]] = names[target]
+
+        # Move current bone's tail to match target's head position
+        plan.move_tail(i, plan.heads[target])
+
+        # Special handling for root bone - adjust its tail downward
+        if names[i].lower() == 'root':
+            plan.move_tail(i, plan.tails[i] + (0, 0, -plan.length(i) * 0.8))
+            return
+
+        # Establish parent-child connection between bones
+        plan.set_connected(target, True)
+
+    def _plan_special_bones():
+        """Plan special adjustments to finger and toe bones."""
+        for i in planned:
+            # Only process bones with exactly one child
+            if len(snapshot.children[i]) != 1:
+                continue
+
+            child = snapshot.children[i][0]
+            direction = plan.tails[i] - plan.heads[i]
+            # Adjust finger tip bones to extend in same direction as parent
+            if finger_last_re.match(names[child]):
+                direction = _normalized(direction)
+                plan.move_tail(child, plan.heads[child] + direction * plan.length(child))
+            # Adjust toe base bones to extend horizontally from parent
+            elif toe_base_re.match(names[child]):
+                direction = _normalized(direction * (1.0, 1.0, 0.0))
+                plan.move_tail(child, plan.heads[child] + (direction * plan.length(child)) / 2)
+
+    planned = range(len(snapshot))
+    if mirror is not None:
+        plan.mirror = mirror
+        planned = [i for i in planned if not mirror.is_mirrored(i)]
+    for i in planned:
+        _plan_bone_chain(i)
+    _plan_special_bones()
+    plan.replay_mirrored()
+    return plan
+
+
+def plan_leaf_tails(snapshot, sums, centroids, covariances, min_elongation=1.5) -> ChainPlan:
+    '''Point tails of weighted leaf bones along the vertices they deform.
+
+    sums, centroids and covariances are weight moments per bone in
+    snapshot order, see WeightMoments. The tail goes along the principal
+    axis, away from the head, and the bone spans the weighted vertices: a
+    uniform strand starting at the head gets exactly its length. Leaves
+    whose vertices spread about evenly (shorter than min_elongation times
+    their width, like eyes) keep their tails, as do finger tips and toes
+    handled by plan_bones_chains.
+
+    Moved bones get roll axes: X runs along the second axis, across a flat
+    strand like a hair card, and Z faces away from it. Strands about as
+    thick as wide keep their old Z as far as the new direction allows.
+    '''
+    plan = ChainPlan(snapshot)
+    leaves = np.array([
+        i for i, name in enumerate(snapshot.names)
+        if not snapshot.children[i] and sums[i] > 0 and not SPECIAL_LEAF_REGEX.match(name)
+    ], dtype=np.int64)
+    if not len(leaves):
+        return plan
+
+    values, vectors = np.linalg.eigh(covariances[leaves])
+    axes = vectors[:, :, 2]
+    major = np.maximum(values[:, 2], 0.0)
+    heads = plan.heads[leaves]
+    along = np.einsum("ij,ij->i", centroids[leaves] - heads, axes)
+    current = np.einsum("ij,ij->i", plan.tails[leaves] - heads, axes)
+    # Eigenvectors have no sign, point them from the head to the vertices
+    sign = np.where(np.abs(along) > 1e-9, np.sign(along), np.where(current < 0, -1.0, 1.0))
+    axes *= sign[:, None]
+    lengths = np.abs(along) + np.sqrt(3.0 * major)
+
+    elongated = major >= min_elongation ** 2 * np.maximum(values[:, 1], 0.0)
+    flat = values[:, 1] >= min_elongation ** 2 * np.maximum(values[:, 0], 0.0)
+    # Z of a bone with X along the width, the sign is picked when applied
+    normals = np.cross(vectors[:, :, 1], axes)
+    for k in np.flatnonzero(elongated):
+        i = leaves[k]
+        if lengths[k] > 1e-4:
+            plan.move_tail(i, plan.heads[i] + axes[k] * lengths[k])
+            plan.roll_axes[i] = normals[k] if flat[k] else None
+    return plan
+
+
+class ArmatureDiff:
+    '''Everything a fix would change: renames, chain geometry, removed bones'''
+
+    def __init__(self, renames=None, chains=None, junk=None):
+        self.renames = renames or dict()
+        self.chains = chains
+        self.junk = junk
+
+    def describe_counts(self):
+        '''Number of renamed, moved and removed bones'''
+        moved = len(self.chains.changed()) if self.chains is not None else 0
+        removed = len(self.junk) if self.junk is not None else 0
+        return len(self.renames), moved, removed
+
+    def describe(self):
+        lines = [f"{len(self.renames)} bones renamed"]
+        lines += [f"  {old} -> {new}" for old, new in self.renames.items()]
+        if self.chains is not None:
+            changed = self.chains.changed()
+            lines.append(f"{len(changed)} bones moved or connected")
+            names = self.chains.snapshot.names
+            lines += [f"  {names[i]}" for i in changed]
+        if self.junk is not None:
+            lines.append(self.junk.summary())
+            lines += [f"  {name}: {reason}" for name, reason in sorted(self.junk.reasons.items())]
+        return lines
+
+
+def plan_fix(snapshot, rename=True, chains=True, leaves=True, name_table=None, symmetry=False) -> ArmatureDiff:
+    '''Plan the whole "Fix Armature" run without touching the armature'''
+    diff = ArmatureDiff()
+    if rename:
+        diff.renames = plan_renames(snapshot, name_table)
+        snapshot = snapshot.renamed(diff.renames)
+    mirror = MirrorMap(snapshot) if symmetry else None
+    if chains:
+        diff.chains = plan_bones_chains(snapshot, mirror)
+    if leaves:
+        diff.junk = find_junk_leaves(snapshot, mirror)
+    return diff
@@ -0,0 +1,142 @@
+'''Left/right bone pairs of symmetric rigs, so one side can be planned and mirrored.
+
+Rigs are mirrored along the armature's X axis. In local bone space
+mirroring keeps rotations around X and flips the sign of rotations around
+Y and Z, bone rolls of blender's symmetric names are mirrored that way.
+'''
+import re
+
+import numpy as np
+
+SIDE_REGEX = re.compile(r"_(?P<side>L|R)(?P<suffix>\.\d{3})?$")
+MIRROR = np.array([-1.0, 1.0, 1.0])
+# Constraint and pose bone properties holding angles around Y and Z
+MIRRORED_LIMITS = (
+    ("min_y", "max_y"), ("min_z", "max_z"),
+    ("ik_min_y", "ik_max_y"), ("ik_min_z", "ik_max_z"),
+)
+
+
+def side(name):
+    '''"L", "R" or None for center bones'''
+    rematch = SIDE_REGEX.search(name)
+    return rematch.group('side') if rematch else None
+
+
+def mirror_name(name):
+    '''Name of the twin bone on the other side, same name for center bones'''
+    rematch = SIDE_REGEX.search(name)
+    if not rematch:
+        return name
+    twin = "R" if rematch.group('side') == "L" else "L"
+    return f"{name[:rematch.start()]}_{twin}{rematch.group('suffix') or ''}"
+
+
+def mirror_values(values):
+    '''Mirror a dict of constraint or pose bone properties from one side to the other'''
+    values = dict(values)
+    for low, high in MIRRORED_LIMITS:
+        if low in values or high in values:
+            values[low], values[high] = 0.0 - values.get(high, 0.0), 0.0 - values.get(low, 0.0)
+    for key, value in values.items():
+        if key == "subtarget" and isinstance(value, str):
+            values[key] = mirror_name(value)
+    return values
+
+
+def mirror_specs(specs):
+    '''Add the twin of every left side spec that has no spec of its own.
+
+    Specs are BoneSpecs by bone name, explicit right side entries win so
+    asymmetric limits stay possible.
+    '''
+    for name in [name for name in specs if side(name) == "L"]:
+        twin = mirror_name(name)
+        if twin in specs:
+            continue
+        spec = specs[name]
+        mirrored = type(spec)()
+        mirrored.properties = mirror_values(spec.properties)
+        mirrored.constraints = {kind: mirror_values(values) for kind, values in spec.constraints.items()}
+        specs[twin] = mirrored
+    return specs
+
+
+class MirrorMap:
+    '''Right side bones of a snapshot that mirror their left twin exactly.
+
+    twins maps indices of mirrored right bones to their left twin. A pair
+    only counts when heads and tails mirror within tolerance, connection,
+    weights and constraints flags match, parents correspond, and all
+    children of the right bone are mirrored too, so every mirrored bone
+    starts a mirrored subtree, and its parent is a center or mirrored bone.
+    Everything else is processed per side.
+    '''
+
+    def __init__(self, snapshot, tolerance=1e-4):
+        self.snapshot = snapshot
+        self.twins = dict()
+        self.unmatched = []
+        index = snapshot.index
+        candidates = dict()
+        for i, name in enumerate(snapshot.names):
+            if side(name) == "R":
+                j = index.get(mirror_name(name))
+                if j is None:
+                    self.unmatched.append(name)
+                else:
+                    candidates[i] = j
+
+        s = snapshot
+
+        def _matches(i, j):
+            if np.abs(s.heads[i] - s.heads[j] * MIRROR).max() > tolerance:
+                return False
+            if np.abs(s.tails[i] - s.tails[j] * MIRROR).max() > tolerance:
+                return False
+            if (s.connected[i], s.weighted[i], s.constrained[i]) != (s.connected[j], s.weighted[j], s.constrained[j]):
+                return False
+            pi, pj = s.parents[i], s.parents[j]
+            return pi == pj or candidates.get(pi) == pj
+
+        # Children first, a bone is mirrored only if its whole subtree is
+        order = _post_order(s)
+        for i in order:
+            j = candidates.get(i)
+            if j is None:
+                continue
+            children = s.children[i]
+            if (_matches(i, j) and len(children) == len(s.children[j])
+                    and all(c in self.twins for c in children)):
+                self.twins[i] = j
+            else:
+                self.unmatched.append(s.names[i])
+        # Parents first, mirrored subtrees hang off center bones or mirrored bones
+        for i in reversed(order):
+            parent = s.parents[i]
+            if i in self.twins and parent >= 0 and side(s.names[parent]) == "R" and parent not in self.twins:
+                del self.twins[i]
+                self.unmatched.append(s.names[i])
+        self.sources = {j: i for i, j in self.twins.items()}
+
+    def __len__(self):
+        return len(self.twins)
+
+    def is_mirrored(self, i):
+        return i in self.twins
+
+    def summary(self):
+        return f"{len(self.twins)} bones mirrored, {len(self.unmatched)} right side bones processed separately"
+
+
+def _post_order(snapshot):
+    order = []
+    stack = [(i, False) for i in np.flatnonzero(snapshot.parents < 0)]
+    while stack:
+        i, visited = stack.pop()
+        if visited:
+            order.append(i)
+            continue
+        stack.append((i, True))
+        stack.extend((child, False) for child in snapshot.children[i])
+    return order
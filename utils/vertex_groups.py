@@ -0,0 +1,73 @@
+from .objects import get_deformed
+from .weights import cached_summary, update_cached_groups
+
+
+class VertexGroupPlan:
+    '''Vertex group renames and removals for one mesh'''
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.renames = dict()
+        self.removals = []
+
+    def __bool__(self):
+        return bool(self.renames or self.removals)
+
+
+def plan_vertex_groups(obj, renames=None, removed=(), bone_names=None, weights=None):
+    '''Plan renames and removals of obj's vertex groups in one pass.
+
+    Groups of removed bones are removed. When bone_names and weights are
+    given, groups matching no bone and having no weights are purged too.
+    '''
+    plan = VertexGroupPlan(obj)
+    renames = renames or dict()
+    removed = set(removed)
+    for vg in obj.vertex_groups:
+        name = vg.name
+        new_name = renames.get(name, name)
+        if new_name != name:
+            plan.renames[name] = new_name
+        if name in removed or new_name in removed:
+            plan.removals.append(name)
+        elif bone_names is not None and weights is not None and new_name not in bone_names:
+            if weights.mesh_count(obj.name, name) == 0:
+                plan.removals.append(name)
+    return plan
+
+
+def apply_vertex_group_plan(plan):
+    summary = cached_summary(plan.obj) if plan.obj.type == 'MESH' else None
+    groups = plan.obj.vertex_groups
+    by_name = {vg.name: vg for vg in groups}
+    removals = [by_name[name] for name in plan.removals]
+    # Removing from the end leaves less group indices to shift
+    for vg in sorted(removals, key=lambda vg: vg.index, reverse=True):
+        groups.remove(vg)
+    removed = set(plan.removals)
+    for name, new_name in plan.renames.items():
+        if name not in removed:
+            by_name[name].name = new_name
+    if summary is not None:
+        update_cached_groups(plan.obj, summary, plan.renames, removed)
+
+
+def update_vertex_groups(armature, renames=None, removed=(), weights=None):
+    '''Rename and remove vertex groups of every mesh armature deforms.
+
+    Passing weights (a WeightIndex) also purges groups without a bone and weights.
+    Returns number of renamed and removed groups per mesh.
+    '''
+    bone_names = None
+    if weights is not None:
+        bones = armature.data.edit_bones if armature.mode == 'EDIT' else armature.data.bones
+        bone_names = {b.name for b in bones}
+    stats = dict()
+    for obj in get_deformed(armature):
+        if not getattr(obj, 'vertex_groups', None):
+            continue
+        plan = plan_vertex_groups(obj, renames, removed, bone_names, weights)
+        if plan:
+            apply_vertex_group_plan(plan)
+        stats[obj.name] = (len(plan.renames), len(plan.removals))
+    return stats
@@ -0,0 +1,104 @@
+import json
+import mmap
+import os
+import re
+import struct
+
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+
+# VRM 0.x and 1.0 names of finger segments, mapped to segment numbers
+FINGER_SEGMENTS = {
+    "Metacarpal": 1,
+    "Proximal": 1,
+    "Intermediate": 2,
+    "Distal": 3,
+}
+THUMB_SEGMENTS_V1 = {"Metacarpal": 1, "Proximal": 2, "Distal": 3}
+BONE_ALIASES = {"Toes": "ToeBase", "Eye": "FaceEye"}
+
+_finger_re = re.compile(r"(?P<finger>Thumb|Index|Middle|Ring|Little)(?P<segment>[A-Z][a-z]+)")
+
+_name_tables = dict()
+
+
+def read_gltf_json(path):
+    '''Parse only the JSON chunk of a .glb/.vrm file, plain .gltf is read whole'''
+    with open(path, "rb") as f:
+        if f.read(4) != GLB_MAGIC:
+            f.seek(0)
+            return json.load(f)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            chunk_length, chunk_type = struct.unpack_from("<II", mm, 12)
+            if chunk_type != CHUNK_JSON:
+                raise ValueError(f"{path} does not start with a JSON chunk")
+            return json.loads(mm[20:20 + chunk_length])
+
+
+def humanoid_nodes(gltf):
+    '''Map node indices to VRM humanoid bone names, VRM 0.x and 1.0'''
+    extensions = gltf.get("extensions", {})
+    if "VRMC_vrm" in extensions:
+        human_bones = extensions["VRMC_vrm"].get("humanoid", {}).get("humanBones", {})
+        return {bone["node"]: name for name, bone in human_bones.items() if "node" in bone}, 1
+    if "VRM" in extensions:
+        human_bones = extensions["VRM"].get("humanoid", {}).get("humanBones", [])
+        return {bone["node"]: bone["bone"] for bone in human_bones if "node" in bone and "bone" in bone}, 0
+    return dict(), None
+
+
+def humanoid_to_bone_name(humanoid, version=0):
+    '''Convert VRM humanoid bone name like "leftUpperArm" to "UpperArm_L"'''
+    side = ""
+    for prefix, suffix in (("left", "_L"), ("right", "_R")):
+        if humanoid.startswith(prefix):
+            humanoid = humanoid[len(prefix):]
+            side = suffix
+            break
+    name = humanoid[:1].upper() + humanoid[1:]
+    if (finger := _finger_re.fullmatch(name)):
+        segments = THUMB_SEGMENTS_V1 if version == 1 and finger["finger"] == "Thumb" else FINGER_SEGMENTS
+        name = f"{finger['finger']}{segments.get(finger['segment'], finger['segment'])}"
+    return BONE_ALIASES.get(name, name) + side
+
+
+def load_name_table(path):
+    '''Old to new bone names from the humanoid map of a .vrm file.
+
+    Tables are cached per file and reread only when the file changes.
+    '''
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    cached = _name_tables.get(key)
+    if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    table = name_table_from_gltf(read_gltf_json(path))
+    _name_tables[key] = ((stat.st_mtime_ns, stat.st_size), table)
+    return table
+
+
+def name_table_or_none(path, report=None):
+    '''Name table of path, None when path is empty or can't be read.
+
+    report is called as report(type, message) to warn about a failed file,
+    Operator.report fits.
+    '''
+    if not path:
+        return None
+    try:
+        return load_name_table(path)
+    except (OSError, ValueError) as e:
+        if report is not None:
+            report({'WARNING'}, f"Could not read humanoid bones from {path}: {e}")
+        return None
+
+
+def name_table_from_gltf(gltf):
+    '''Old to new bone names from the humanoid map of parsed glTF JSON'''
+    nodes = gltf.get("nodes", [])
+    humanoid, version = humanoid_nodes(gltf)
+    table = dict()
+    for node, bone in humanoid.items():
+        if node < len(nodes) and "name" in nodes[node]:
+            table[nodes[node]["name"]] = humanoid_to_bone_name(bone, version)
+    return table
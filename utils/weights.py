@@ -0,0 +1,580 @@
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from mathutils.kdtree import KDTree
+from . import profiling
+from .objects import clear_deformed, get_deformed
+
+WEIGHT_THRESHOLD = 0.001
+# Vertices read per step of a WeightIndexBuilder
+CHUNK_SIZE = 5000
+
+# Points sampled along every bone of a BoneSegments tree
+SEGMENT_SAMPLES = 8
+# Reassigned weights are rounded to 1 / WEIGHT_STEPS, so they take few add calls
+WEIGHT_STEPS = 256
+
+# Mesh object name to (signature, vertex group summary), see mesh_summary
+_summaries = dict()
+# session_uid of the scene the caches were filled in, see clear_cache_if_reloaded
+_scene_uid = None
+
+
+class WeightIndex:
+    '''Summary of vertex group weights of all meshes attached to an armature.'''
+
+    def __init__(self):
+        self.max_weights = dict()
+        self.counts = dict()
+        self.totals = dict()
+        self.mesh_counts = dict()
+
+    def add(self, name, max_weight, count, mesh=None, total=0.0):
+        self.max_weights[name] = max(self.max_weights.get(name, 0.0), max_weight)
+        self.counts[name] = self.counts.get(name, 0) + count
+        self.totals[name] = self.totals.get(name, 0.0) + total
+        if mesh is not None:
+            self.mesh_counts.setdefault(mesh, dict())[name] = count
+
+    def max_weight(self, name):
+        return self.max_weights.get(name, 0.0)
+
+    def count(self, name):
+        '''Number of vertices influenced by vertex group with given name'''
+        return self.counts.get(name, 0)
+
+    def total(self, name):
+        '''Sum of all vertex weights of vertex group with given name'''
+        return self.totals.get(name, 0.0)
+
+    def has_effect(self, name, threshold=WEIGHT_THRESHOLD):
+        return self.max_weight(name) > threshold
+
+    def mesh_count(self, mesh, name):
+        '''Influenced vertex count of a group in one mesh, None if mesh was not indexed'''
+        counts = self.mesh_counts.get(mesh)
+        return None if counts is None else counts.get(name, 0)
+
+
+def read_mesh_weights(obj, start=0, stop=None):
+    '''Read vertex weights of a mesh object in a single pass.
+
+    start and stop limit the read to a range of vertices.
+    Returns arrays of vertex indices, vertex group indices and weights.
+    '''
+    vertices = obj.data.vertices
+    if start or stop is not None:
+        vertices = vertices[start:stop]
+    profiling.count("vertices_scanned", len(vertices))
+    data = [
+        (v.index, g.group, g.weight)
+        for v in vertices
+        for g in v.groups
+    ]
+    if not data:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0)
+    data = np.array(data)
+    return data[:, 0].astype(np.int32), data[:, 1].astype(np.int32), data[:, 2]
+
+
+def _summarize(obj, groups, weights):
+    '''(name, max weight, count, total) of every vertex group of obj'''
+    group_count = len(obj.vertex_groups)
+    max_weights = np.zeros(group_count)
+    np.maximum.at(max_weights, groups, weights)
+    counts = np.bincount(groups[weights > 0], minlength=group_count)
+    totals = np.bincount(groups, weights, minlength=group_count)
+    return [
+        (vg.name, float(max_weights[vg.index]), int(counts[vg.index]), float(totals[vg.index]))
+        for vg in obj.vertex_groups
+    ]
+
+
+def _signature(obj):
+    return obj.data.name, len(obj.data.vertices), tuple(vg.name for vg in obj.vertex_groups)
+
+
+def cached_summary(obj):
+    '''Vertex group summary of obj from the cache, None if it has to be scanned'''
+    cached = _summaries.get(obj.name)
+    if cached is None or cached[0] != _signature(obj):
+        return None
+    profiling.count("meshes_cached")
+    return cached[1]
+
+
+def _store_summary(obj, groups, weights):
+    summary = _summarize(obj, groups, weights)
+    _summaries[obj.name] = (_signature(obj), summary)
+    return summary
+
+
+def mesh_summary(obj):
+    '''Vertex group summary of obj, scanned only when its mesh changed since the last scan'''
+    summary = cached_summary(obj)
+    if summary is None:
+        _, groups, weights = read_mesh_weights(obj)
+        summary = _store_summary(obj, groups, weights)
+    return summary
+
+
+def _index_mesh(index, obj, summary):
+    for name, max_weight, count, total in summary:
+        index.add(name, max_weight, count, obj.name, total)
+
+
+def forget_mesh(obj):
+    '''Drop cached summary of obj, for code changing its weights'''
+    _summaries.pop(obj.name, None)
+
+
+def update_cached_groups(obj, summary, renames, removed):
+    '''Cache summary taken before obj's vertex groups were renamed or removed, weights are the same'''
+    summary = [(renames.get(name, name), *values) for name, *values in summary if name not in removed]
+    _summaries[obj.name] = (_signature(obj), summary)
+
+
+def _weighted_meshes(armature):
+    return [obj for obj in get_deformed(armature) if obj.type == 'MESH' and obj.vertex_groups]
+
+
+def build_weight_index(armature):
+    '''Build weight index for every vertex group of meshes armature deforms.'''
+    clear_cache_if_reloaded()
+    index = WeightIndex()
+    for obj in _weighted_meshes(armature):
+        _index_mesh(index, obj, mesh_summary(obj))
+    return index
+
+
+class WeightIndexBuilder:
+    '''Build the same index as build_weight_index a chunk of vertices at a time.
+
+    Call step until it returns True, done and total count vertices of
+    meshes that are not cached and have to be scanned.
+    '''
+
+    def __init__(self, armature, chunk_size=CHUNK_SIZE):
+        self.index = WeightIndex()
+        self.meshes = []
+        for obj in _weighted_meshes(armature):
+            summary = cached_summary(obj)
+            if summary is None:
+                self.meshes.append(obj)
+            else:
+                _index_mesh(self.index, obj, summary)
+        self.total = sum(len(obj.data.vertices) for obj in self.meshes)
+        self.done = 0
+        self.chunk_size = chunk_size
+        self._mesh = 0
+        self._start = 0
+        self._parts = []
+
+    @property
+    def finished(self):
+        return self._mesh >= len(self.meshes)
+
+    def step(self) -> bool:
+        '''Scan the next chunk, a mesh is indexed once all its chunks are read'''
+        if self.finished:
+            return True
+        obj = self.meshes[self._mesh]
+        count = len(obj.data.vertices)
+        stop = min(self._start + self.chunk_size, count)
+        self._parts.append(read_mesh_weights(obj, self._start, stop))
+        self.done += stop - self._start
+        self._start = stop
+        if stop >= count:
+            groups = np.concatenate([part[1] for part in self._parts])
+            weights = np.concatenate([part[2] for part in self._parts])
+            _index_mesh(self.index, obj, _store_summary(obj, groups, weights))
+            self._mesh += 1
+            self._start = 0
+            self._parts = []
+        return self.finished
+
+
+class WeightMoments:
+    '''Weight sums, weighted centroids and covariances of vertex positions per bone.
+
+    Positions are in armature space. Every mesh is added in one pass with a
+    bincount per moment, so the cost is linear in vertex count no matter
+    how many bones there are.
+    '''
+
+    def __init__(self, names):
+        self.index = {name: i for i, name in enumerate(names)}
+        n = len(self.index)
+        self.sums = np.zeros(n)
+        self.first = np.zeros((n, 3))
+        self.second = np.zeros((n, 3, 3))
+
+    def add_mesh(self, obj, matrix):
+        '''Add weighted vertices of obj, matrix (4x4 array) maps them to armature space'''
+        vertices, groups, weights = read_mesh_weights(obj)
+        if not len(vertices):
+            return
+        bone_of_group = np.array([self.index.get(vg.name, -1) for vg in obj.vertex_groups], dtype=np.int64)
+        bones = bone_of_group[groups]
+        mask = (bones >= 0) & (weights > 0)
+        co = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+        obj.data.vertices.foreach_get("co", co)
+        co = co.reshape(-1, 3).astype(np.float64) @ matrix[:3, :3].T + matrix[:3, 3]
+
+        positions, bones, weights = co[vertices[mask]], bones[mask], weights[mask]
+        n = len(self.sums)
+        self.sums += np.bincount(bones, weights, minlength=n)
+        for k in range(3):
+            self.first[:, k] += np.bincount(bones, weights * positions[:, k], minlength=n)
+            for m in range(k, 3):
+                total = np.bincount(bones, weights * positions[:, k] * positions[:, m], minlength=n)
+                self.second[:, k, m] += total
+                if m != k:
+                    self.second[:, m, k] += total
+
+    def centroids(self):
+        return self.first / np.where(self.sums > 0, self.sums, 1.0)[:, None]
+
+    def covariances(self):
+        centroids = self.centroids()
+        second = self.second / np.where(self.sums > 0, self.sums, 1.0)[:, None, None]
+        return second - centroids[:, :, None] * centroids[:, None, :]
+
+
+def weight_moments(armature, names) -> WeightMoments:
+    '''Weight moments of bones with given names over all of armature's child meshes'''
+    moments = WeightMoments(names)
+    to_armature = armature.matrix_world.inverted()
+    for obj in _weighted_meshes(armature):
+        moments.add_mesh(obj, np.array(to_armature @ obj.matrix_world))
+    return moments
+
+
+def write_mesh_weights(obj, vertices, groups, weights):
+    '''Write weights with one vertex_groups add call per distinct group and weight'''
+    if not len(vertices):
+        return
+    forget_mesh(obj)
+    pairs, inverse = np.unique(np.stack([groups, weights]), axis=1, return_inverse=True)
+    order = np.argsort(inverse.ravel(), kind="stable")
+    splits = np.flatnonzero(np.diff(inverse.ravel()[order])) + 1
+    for (group, weight), ids in zip(pairs.T, np.split(vertices[order], splits)):
+        obj.vertex_groups[int(group)].add(ids.tolist(), float(weight), 'REPLACE')
+
+
+def set_mesh_weights(obj, vertices, positions, weights):
+    '''Overwrite weights of existing elements, positions index into each vertex's groups.
+
+    Entries must be sorted by vertex. There is no bulk weight API, setting
+    elements in place beats one vertex_groups add call per distinct weight.
+    '''
+    forget_mesh(obj)
+    mesh_vertices = obj.data.vertices
+    current = -1
+    elements = None
+    for v, p, w in zip(vertices.tolist(), positions.tolist(), weights.tolist()):
+        if v != current:
+            elements = mesh_vertices[v].groups
+            current = v
+        elements[p].weight = w
+
+
+def limit_influences(obj, max_influences=4, threshold=0.01, deform_names=None) -> int:
+    '''Keep the strongest max_influences weights of every vertex and renormalize.
+
+    Weights below threshold are dropped too, but a vertex always keeps its
+    strongest one. Only groups named in deform_names are touched, all
+    groups when None. Returns number of removed influences.
+    '''
+    vertices, groups, weights = read_mesh_weights(obj)
+    if not len(vertices):
+        return 0
+    group_count = len(obj.vertex_groups)
+    if deform_names is None:
+        deform = np.ones(group_count, dtype=bool)
+    else:
+        deform = np.array([vg.name in deform_names for vg in obj.vertex_groups], dtype=bool)
+    is_deform = deform[groups]
+
+    # Rank entries of every vertex, deform groups first, strongest first
+    order = np.lexsort((-weights, ~is_deform, vertices))
+    sorted_vertices = vertices[order]
+    starts = np.flatnonzero(np.r_[True, sorted_vertices[1:] != sorted_vertices[:-1]])
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+
+    keep = ((ranks < max_influences) & (weights >= threshold)) | (ranks == 0)
+    removed = is_deform & ~keep
+    kept = is_deform & keep
+
+    totals = np.bincount(vertices[kept], weights[kept], minlength=vertices.max() + 1)
+    new_weights = weights / np.where(totals > 0, totals, 1.0)[vertices]
+    changed = kept & (np.abs(new_weights - weights) > 1e-6)
+    # Entries are read vertex by vertex, position is the offset from vertex's first entry
+    positions = np.arange(len(vertices)) - np.searchsorted(vertices, vertices)
+    set_mesh_weights(obj, vertices[changed], positions[changed], np.minimum(new_weights[changed], 1.0))
+
+    forget_mesh(obj)
+    for group in np.unique(groups[removed]):
+        obj.vertex_groups[int(group)].remove(vertices[removed & (groups == group)].tolist())
+    return int(removed.sum())
+
+
+def limit_armature_influences(armature, max_influences=4, threshold=0.01) -> dict:
+    '''Limit influences of every child mesh to the armature's bones.
+
+    Returns number of removed influences per mesh name.
+    '''
+    clear_cache_if_reloaded()
+    bones = armature.data.edit_bones if armature.mode == 'EDIT' else armature.data.bones
+    bone_names = {b.name for b in bones}
+    stats = dict()
+    for obj in get_deformed(armature):
+        if obj.type == 'MESH' and obj.vertex_groups:
+            stats[obj.name] = limit_influences(obj, max_influences, threshold, bone_names)
+    return stats
+
+
+def merge_weights(obj, targets, deform_names=None):
+    '''Add weights of vertex groups to other groups and renormalize.
+
+    targets maps source group names to target group names, missing targets
+    are created. Weights of affected vertices are renormalized over groups
+    named in deform_names. Source groups are left for the caller to remove.
+    Returns number of affected vertices.
+    '''
+    vgs = obj.vertex_groups
+    indices = {vg.name: vg.index for vg in vgs}
+    sources = {indices[name]: target for name, target in targets.items() if name in indices}
+    if not sources:
+        return 0
+    forget_mesh(obj)
+    for target in set(sources.values()):
+        if target not in indices:
+            indices[target] = vgs.new(name=target).index
+
+    group_count = len(vgs)
+    remap = np.arange(group_count)
+    is_source = np.zeros(group_count, dtype=bool)
+    for source, target in sources.items():
+        remap[source] = indices[target]
+        is_source[source] = True
+
+    vertices, groups, weights = read_mesh_weights(obj)
+    affected = np.unique(vertices[is_source[groups] & (weights > 0)])
+    if not len(affected):
+        return 0
+    mask = np.isin(vertices, affected)
+    keys = vertices[mask].astype(np.int64) * group_count + remap[groups[mask]]
+    keys, inverse = np.unique(keys, return_inverse=True)
+    weights = np.bincount(inverse.ravel(), weights[mask])
+    vertices, groups = keys // group_count, keys % group_count
+
+    if deform_names is not None:
+        deform = np.zeros(group_count, dtype=bool)
+        deform[[i for name, i in indices.items() if name in deform_names]] = True
+        deform_mask = deform[groups]
+        totals = np.bincount(vertices[deform_mask], weights[deform_mask], minlength=vertices.max() + 1)
+        scale = np.where(totals > 0, 1.0 / np.where(totals > 0, totals, 1.0), 1.0)
+        weights = np.where(deform_mask, weights * scale[vertices], weights)
+
+    write_mesh_weights(obj, vertices, groups, np.minimum(weights, 1.0))
+    return len(affected)
+
+
+class BoneSegments:
+    '''Nearest bones of positions by distance to the bone segments, in armature space.
+
+    A single KD-tree holds points sampled along every bone. Queries take
+    enough nearest points to cover more bones than asked for, then exact
+    distances to those segments pick the nearest ones.
+    '''
+
+    def __init__(self, names, heads, tails, samples=SEGMENT_SAMPLES):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.heads = np.asarray(heads, dtype=np.float64).reshape(-1, 3)
+        self.axes = np.asarray(tails, dtype=np.float64).reshape(-1, 3) - self.heads
+        self.samples = samples
+        t = np.linspace(0.0, 1.0, samples)
+        points = (self.heads[:, None] + self.axes[:, None] * t[None, :, None]).reshape(-1, 3)
+        self.tree = KDTree(max(len(points), 1))
+        for i, co in enumerate(points.tolist()):
+            self.tree.insert(co, i)
+        self.tree.balance()
+
+    def __len__(self):
+        return len(self.names)
+
+    def distances(self, positions, bones):
+        '''Distances of positions (m, 3) to segments of bones (m, n)'''
+        offsets = positions[:, None] - self.heads[bones]
+        axes = self.axes[bones]
+        lengths = np.einsum('mnk,mnk->mn', axes, axes)
+        t = np.einsum('mnk,mnk->mn', offsets, axes) / np.where(lengths > 0, lengths, 1.0)
+        return np.linalg.norm(offsets - axes * np.clip(t, 0.0, 1.0)[..., None], axis=2)
+
+    def nearest(self, positions, neighbors=1):
+        '''Indices of the nearest bones of every position and their weights, both (m, k).
+
+        Weights of a position fall off with inverse square distance and sum
+        to one, k is neighbors or the bone count when there are less bones.
+        '''
+        k = min(neighbors, len(self))
+        n = min((k + 1) * self.samples, len(self) * self.samples)
+        points = np.empty((len(positions), n), dtype=np.int64)
+        for row, co in enumerate(positions.tolist()):
+            points[row] = [index for _, index, _ in self.tree.find_n(co, n)]
+        bones = points // self.samples
+        distances = self.distances(positions, bones)
+
+        # Points of one bone share its distance, keep only the first of them
+        order = np.lexsort((bones, distances), axis=-1)
+        bones = np.take_along_axis(bones, order, axis=1)
+        distances = np.take_along_axis(distances, order, axis=1)
+        distances[:, 1:][bones[:, 1:] == bones[:, :-1]] = np.inf
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        bones = np.take_along_axis(bones, order, axis=1)
+        falloff = 1.0 / (np.square(np.take_along_axis(distances, order, axis=1)) + 1e-12)
+        return bones, falloff / falloff.sum(axis=1, keepdims=True)
+
+
+def reassign_orphans(obj, segments, matrix, neighbors=1) -> int:
+    '''Weight vertices without weights of any bone in segments to their nearest bones.
+
+    matrix (4x4) maps vertices of obj to armature space, neighbors is
+    the number of nearest bones a vertex is shared between. Vertices at the
+    same position are looked up once. Returns number of reassigned vertices.
+    '''
+    count = len(obj.data.vertices)
+    if not count or not len(segments):
+        return 0
+    vertices, groups, weights = read_mesh_weights(obj)
+    deform = np.array([vg.name in segments.index for vg in obj.vertex_groups], dtype=bool)
+    influenced = np.zeros(count, dtype=bool)
+    influenced[vertices[deform[groups] & (weights > 0)]] = True
+    orphans = np.flatnonzero(~influenced)
+    if not len(orphans):
+        return 0
+
+    matrix = np.array(matrix)
+    co = np.empty(count * 3, dtype=np.float32)
+    obj.data.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)[orphans].astype(np.float64) @ matrix[:3, :3].T + matrix[:3, 3]
+    positions, inverse = np.unique(co, axis=0, return_inverse=True)
+    bones, bone_weights = segments.nearest(positions, neighbors)
+    bones, bone_weights = bones[inverse.ravel()], bone_weights[inverse.ravel()]
+
+    bone_weights = np.round(bone_weights * WEIGHT_STEPS) / WEIGHT_STEPS
+    keep = bone_weights > 0
+    vgs = obj.vertex_groups
+    indices = {vg.name: vg.index for vg in vgs}
+    group_of_bone = np.full(len(segments), -1, dtype=np.int64)
+    for bone in np.unique(bones[keep]).tolist():
+        name = segments.names[bone]
+        if name not in indices:
+            indices[name] = vgs.new(name=name).index
+        group_of_bone[bone] = indices[name]
+    vertices = np.repeat(orphans, bones.shape[1]).reshape(bones.shape)
+    write_mesh_weights(obj, vertices[keep], group_of_bone[bones[keep]], bone_weights[keep])
+    return len(orphans)
+
+
+def bone_segments(armature, weights=None) -> BoneSegments:
+    '''BoneSegments of armature's deforming bones that have weights, weights is a WeightIndex'''
+    if weights is None:
+        weights = build_weight_index(armature)
+    if armature.mode == 'EDIT':
+        bones = [(b.name, b.head, b.tail) for b in armature.data.edit_bones if b.use_deform]
+    else:
+        bones = [(b.name, b.head_local, b.tail_local) for b in armature.data.bones if b.use_deform]
+    bones = [(name, tuple(head), tuple(tail)) for name, head, tail in bones if weights.has_effect(name)]
+    names, heads, tails = zip(*bones) if bones else ((), (), ())
+    return BoneSegments(names, heads, tails)
+
+
+def reassign_armature_orphans(armature, neighbors=1) -> dict:
+    '''Give vertices of child meshes left without deforming weights to the nearest bones.
+
+    One bone_segments tree serves every mesh. Returns number of reassigned
+    vertices per mesh name, meshes without orphans are left out.
+    '''
+    segments = bone_segments(armature)
+    stats = dict()
+    to_armature = armature.matrix_world.inverted()
+    for obj in _weighted_meshes(armature):
+        reassigned = reassign_orphans(obj, segments, to_armature @ obj.matrix_world, neighbors)
+        if reassigned:
+            stats[obj.name] = reassigned
+    return stats
+
+
+def clear_cache():
+    _summaries.clear()
+    clear_deformed()
+
+
+def clear_cache_if_reloaded():
+    '''Clear the cache when another file was loaded since it was filled.
+
+    load_post does the same once register_handlers ran, scripts loading
+    files without the addon registered rely on this check. Loaded files
+    get new session_uids, so same named meshes of the last one don't match.
+    '''
+    global _scene_uid
+    scene_uid = bpy.context.scene.session_uid
+    if scene_uid != _scene_uid:
+        clear_cache()
+        _scene_uid = scene_uid
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    '''Drop summaries of edited meshes and forget which objects armatures deform.
+
+    Only updates of mesh data itself (weight paint, edit mode, vertex group
+    changes) drop summaries, posing only re-evaluates deformed geometry.
+    '''
+    meshes = set()
+    objects_changed = False
+    for update in depsgraph.updates:
+        data = update.id.original
+        if isinstance(data, bpy.types.Mesh):
+            meshes.add(data.name)
+        elif isinstance(data, (bpy.types.Object, bpy.types.Collection, bpy.types.Scene)):
+            objects_changed = True
+    if meshes:
+        for name in [name for name, (signature, _) in _summaries.items() if signature[0] in meshes]:
+            del _summaries[name]
+    if objects_changed:
+        clear_deformed()
+
+
+@persistent
+def on_reload(*args):
+    '''Undo, redo and loading a file replace data the cache was read from'''
+    clear_cache()
+
+
+HANDLERS = (
+    ('depsgraph_update_post', on_depsgraph_update),
+    ('undo_post', on_reload),
+    ('redo_post', on_reload),
+    ('load_post', on_reload),
+)
+
+
+def register_handlers():
+    for name, handler in HANDLERS:
+        handlers = getattr(bpy.app.handlers, name)
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister_handlers():
+    for name, handler in HANDLERS:
+        handlers = getattr(bpy.app.handlers, name)
+        if handler in handlers:
+            handlers.remove(handler)
+    clear_cache()